@@ -0,0 +1,80 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Callable, List, Optional
+from matrix import Matrix
+from particles import ParticleSystem
+
+
+class Animation:
+    """Base class for non-blocking animations.  Advanced one game tick at a time by the game loop,
+    which keeps drawing frames and pumping events meanwhile."""
+
+    def __init__(self, on_finished: Optional[Callable[[], None]] = None) -> None:
+        """Class constructor.  The callback is run by finish(), once the animation is done."""
+        self.__on_finished: Optional[Callable[[], None]] = on_finished
+        self.__ticks: int = 0
+        self.__done: bool = False
+
+    @property
+    def ticks(self) -> int:
+        """Returns number of ticks run."""
+        return self.__ticks
+
+    @property
+    def done(self) -> bool:
+        """Returns true once the animation has run to the end."""
+        return self.__done
+
+    def update(self) -> bool:
+        """Advances the animation by one tick.  Returns true once done."""
+        if not self.__done:
+            self.__ticks += 1
+            self.__done = self._step(self.__ticks)
+        return self.__done
+
+    def finish(self) -> None:
+        """Runs the finished callback."""
+        if self.__on_finished is not None:
+            self.__on_finished()
+
+    def _step(self, ticks: int) -> bool:
+        """Runs one tick of the animation.  Returns true when done.  Overridden by each animation."""
+        raise NotImplementedError()
+
+
+class EraseAnimation(Animation):
+    """Erases filled rows column by column, left to right."""
+
+    def __init__(self, matrix: Matrix, rows: List[int], on_finished: Optional[Callable[[], None]] = None, columns_per_tick: int = 2,
+                 on_erase: Optional[Callable[[List[int], int, int], None]] = None) -> None:
+        """Class constructor.  The on_erase callback is given the rows and columns about to be erased each tick, for effects."""
+        super().__init__(on_finished)
+        self.__matrix: Matrix = matrix
+        self.__rows: List[int] = rows
+        self.__columns_per_tick: int = columns_per_tick
+        self.__on_erase: Optional[Callable[[List[int], int, int], None]] = on_erase
+
+    def _step(self, ticks: int) -> bool:
+        """Erases the next columns.  Done once all are erased."""
+        last_column = self.__matrix.width - 2
+        x_from = ((ticks - 1) * self.__columns_per_tick) + 1
+        x_to = min(ticks * self.__columns_per_tick, last_column)
+        if self.__on_erase is not None:
+            self.__on_erase(self.__rows, x_from, x_to)
+        self.__matrix.erase_spaces(self.__rows, x_from, x_to)
+        return x_to >= last_column
+
+
+class ExplodeAnimation(Animation):
+    """Game over.  Waits for the exploding spaces (particles, advanced by the game loop) to leave the screen."""
+
+    def __init__(self, particles: ParticleSystem, on_finished: Optional[Callable[[], None]] = None) -> None:
+        """Class constructor."""
+        super().__init__(on_finished)
+        self.__particles: ParticleSystem = particles
+
+    def _step(self, ticks: int) -> bool:
+        """Done once all particles are off screen."""
+        return len(self.__particles) == 0
@@ -0,0 +1,276 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Any, List, Optional, Sequence
+from brick import SHAPES, KICKS
+from piece_generator import PieceGenerator, create_generator
+from game_engine import GameEngine, Action
+from matrix import MATRIX_HEIGHT, MATRIX_WIDTH, empty_row_mask, full_row_mask
+try:
+    import numpy as np
+except ImportError:     # optional, install with the "sim" extra
+    np = None           # type: ignore
+
+
+class BatchEngine:
+    """Many games stepped in lockstep, for large-scale simulation.  Follows the same rules as GameEngine
+    (Matrix and Brick), and for the same seeds and actions gives the same boards and scores, but holds every
+    board as one (count, MATRIX_HEIGHT) array of row bitmasks, so each step is a handful of NumPy operations over all
+    boards instead of a Python loop per board.  Colors, replays and high scores are not kept.  Needs NumPy."""
+
+    def __init__(self, count: int, mode: str = "uniform", drop_intervals: Optional[Sequence[float]] = None,
+                 line_scores: Optional[Sequence[int]] = None, block_size: int = 256, kicks: str = "legacy") -> None:
+        """Class constructor.  Gravity intervals and line scores are as GameEngine's, bricks rotate with the named
+        kick table.  Shapes are drawn from one piece generator per board, block_size at a time."""
+        if np is None:
+            raise ImportError("BatchEngine needs NumPy, install bricker[sim]")
+        rules = GameEngine(drop_intervals=drop_intervals, line_scores=line_scores)
+        self.__count: int = count
+        self.__level_drop_ticks: Any = np.array([max(1, round(x * rules.ticks_per_second)) for x in rules.level_drop_intervals], np.int64)
+        self.__line_scores: Any = np.array(rules.line_scores, np.int64)
+        self.__masks: Any = np.zeros((len(SHAPES), 4, 4), np.int32)     # [shape][rotation][row], padded to 4 rows
+        for s, shape in enumerate(SHAPES):
+            for r, rotation in enumerate(shape.rotations):
+                self.__masks[s, r, :shape.size] = rotation.masks
+        if kicks not in KICKS:
+            raise ValueError(f"Unknown kick table '{kicks}'")
+        tests = max(len(offsets) for shape_kicks in KICKS[kicks] for offsets in shape_kicks)
+        self.__kicks: Any = np.zeros((len(SHAPES), 4, tests, 2), np.int32)     # [shape][rotation before][test], padded by repeating the last
+        for s, shape_kicks in enumerate(KICKS[kicks]):
+            for r, offsets in enumerate(shape_kicks):
+                self.__kicks[s, r] = list(offsets) + [offsets[-1]] * (tests - len(offsets))
+        self.__spawn_x: Any = np.array([(MATRIX_WIDTH - shape.size) // 2 for shape in SHAPES], np.int32)
+        self.__spawn_y: Any = np.array([1 - shape.rotations[0].top_space for shape in SHAPES], np.int32)
+        self.__generators: List[PieceGenerator] = [create_generator(mode) for _ in range(count)]
+        self.__sequence: Any = np.zeros((count, 2 * block_size), np.int8)     # shape numbers - 1, ring of the last two blocks drawn
+        self.__drawn: Any = np.zeros(count, np.int64)                         # shapes drawn into each board's ring
+        self.__rows: Any = np.zeros((count, MATRIX_HEIGHT), np.int32)
+        self.__shape: Any = np.zeros(count, np.int32)
+        self.__rotation: Any = np.zeros(count, np.int32)
+        self.__x: Any = np.zeros(count, np.int32)
+        self.__y: Any = np.zeros(count, np.int32)
+        self.__pieces: Any = np.zeros(count, np.int64)
+        self.__score: Any = np.zeros(count, np.int64)
+        self.__lines: Any = np.zeros(count, np.int64)
+        self.__level: Any = np.ones(count, np.int64)
+        self.__ticks: Any = np.zeros(count, np.int64)
+        self.__drop_ticks: Any = np.zeros(count, np.int64)
+        self.__game_over: Any = np.ones(count, np.bool_)
+
+    @property
+    def count(self) -> int:
+        """Returns number of boards."""
+        return self.__count
+
+    @property
+    def rows(self) -> Any:
+        """Returns row bitmasks of every board, [board][y], including border rows, as Matrix.rows."""
+        return self.__rows
+
+    @property
+    def shape_nums(self) -> Any:
+        """Returns the live brick's shape number on each board."""
+        return self.__shape + 1
+
+    @property
+    def next_shape_nums(self) -> Any:
+        """Returns the next brick's shape number on each board."""
+        return self.__sequence[np.arange(self.__count), (self.__pieces + 1) % self.__sequence.shape[1]] + 1
+
+    @property
+    def rotations(self) -> Any:
+        """Returns the live brick's rotation index (0-3) on each board."""
+        return self.__rotation
+
+    @property
+    def x(self) -> Any:
+        """Returns X position of the live brick on each board."""
+        return self.__x
+
+    @property
+    def y(self) -> Any:
+        """Returns Y position of the live brick on each board."""
+        return self.__y
+
+    @property
+    def pieces(self) -> Any:
+        """Returns number of bricks locked on each board."""
+        return self.__pieces
+
+    @property
+    def scores(self) -> Any:
+        """Returns current score of each board."""
+        return self.__score
+
+    @property
+    def lines(self) -> Any:
+        """Returns lines cleared on each board."""
+        return self.__lines
+
+    @property
+    def levels(self) -> Any:
+        """Returns current level of each board."""
+        return self.__level
+
+    @property
+    def ticks(self) -> Any:
+        """Returns ticks since game start on each board."""
+        return self.__ticks
+
+    @property
+    def game_over(self) -> Any:
+        """Returns true for each board whose game has ended."""
+        return self.__game_over
+
+    def new_game(self, seeds: Sequence[int]) -> None:
+        """Starts a new game on every board, one seed per board."""
+        if len(seeds) != self.__count:
+            raise ValueError(f"Need {self.__count} seeds, got {len(seeds)}.")
+        for generator, seed in zip(self.__generators, seeds):
+            generator.reset(seed)
+        self.__drawn[:] = 0
+        self.__rows[:] = empty_row_mask(MATRIX_WIDTH)
+        self.__rows[:, 0] = full_row_mask(MATRIX_WIDTH)
+        self.__rows[:, MATRIX_HEIGHT - 1] = full_row_mask(MATRIX_WIDTH)
+        self.__pieces[:] = -1
+        self.__score[:] = 0
+        self.__lines[:] = 0
+        self.__level[:] = 1
+        self.__ticks[:] = 0
+        self.__game_over[:] = False
+        self.__spawn(np.arange(self.__count))
+
+    def step(self, actions: Any) -> Any:
+        """Applies one action per board, as GameEngine.step(), including any resulting brick hits.
+        Boards whose game has ended are left alone.  Returns the game over flags."""
+        actions = np.asarray(actions)
+        live = ~self.__game_over
+        hits = []
+        boards = np.flatnonzero(live & (actions == Action.TICK))
+        if len(boards) > 0:
+            self.__ticks[boards] += 1
+            self.__drop_ticks[boards] += 1
+            due = self.__drop_ticks[boards] >= self.__level_drop_ticks[np.minimum(self.__level[boards], len(self.__level_drop_ticks)) - 1]
+            boards = boards[due]
+            hits.append(boards[self.__move_down(boards)])
+        boards = np.flatnonzero(live & (actions == Action.LEFT))
+        self.__move_across(boards, -1)
+        boards = np.flatnonzero(live & (actions == Action.RIGHT))
+        self.__move_across(boards, 1)
+        boards = np.flatnonzero(live & (actions == Action.DOWN))
+        self.__move_down(boards)
+        boards = np.flatnonzero(live & (actions == Action.ROTATE))
+        self.__rotate(boards)
+        boards = np.flatnonzero(live & (actions == Action.LEVEL_UP))
+        self.__level[boards] = np.minimum(self.__level[boards] + 1, len(self.__level_drop_ticks))
+        boards = np.flatnonzero(live & (actions == Action.LEVEL_DOWN))
+        self.__level[boards] = np.maximum(self.__level[boards] - 1, 1)
+        boards = np.flatnonzero(live & (actions == Action.DROP))
+        if len(boards) > 0:
+            falling = boards
+            while len(falling) > 0:
+                falling = falling[~self.__move_down(falling)]
+            self.__score[boards] += 2
+            hits.append(boards)
+        boards = np.concatenate(hits) if len(hits) > 0 else boards[:0]
+        if len(boards) > 0:
+            self.__brick_hit(boards)
+        return self.__game_over
+
+    def __collision(self, boards: Any, rotation: Any, x: Any, y: Any) -> Any:
+        """Returns true for each board whose live brick would collide at the given rotation and position.
+        Columns shifted off the left edge and rows off the top or bottom collide, as in Brick.collision_at()."""
+        masks = self.__masks[self.__shape[boards], rotation]
+        shift_left = np.maximum(x, 0)[:, None]
+        shift_right = np.maximum(-x, 0)[:, None]
+        placed = (masks << shift_left) >> shift_right
+        lost = masks & ((1 << shift_right) - 1)
+        rows_y = y[:, None] + np.arange(4)
+        inside = (rows_y >= 0) & (rows_y < MATRIX_HEIGHT)
+        board_rows = self.__rows[boards[:, None], np.clip(rows_y, 0, MATRIX_HEIGHT - 1)]
+        return ((masks != 0) & (~inside | (lost != 0) | ((placed & board_rows) != 0))).any(axis=1)
+
+    def __move_across(self, boards: Any, dx: int) -> None:
+        """Moves the live brick one column, where it does not collide."""
+        if len(boards) > 0:
+            x = self.__x[boards] + dx
+            free = ~self.__collision(boards, self.__rotation[boards], x, self.__y[boards])
+            self.__x[boards[free]] = x[free]
+
+    def __move_down(self, boards: Any) -> Any:
+        """Moves the live brick down, resets gravity.  Returns true for each board whose brick hit bottom, which scores a point."""
+        self.__drop_ticks[boards] = 0
+        y = self.__y[boards] + 1
+        hit = self.__collision(boards, self.__rotation[boards], self.__x[boards], y)
+        self.__y[boards[~hit]] = y[~hit]
+        self.__score[boards[hit]] += 1
+        return hit
+
+    def __rotate(self, boards: Any) -> None:
+        """Rotates the live brick clockwise, moved to the first free offset of its kick table, as Brick.rotate().
+        Where none is free the rotation is undone."""
+        if len(boards) > 0:
+            kicks = self.__kicks[self.__shape[boards], self.__rotation[boards]]
+            rotation = (self.__rotation[boards] + 1) & 3
+            for test in range(kicks.shape[1]):
+                x = self.__x[boards] + kicks[:, test, 0]
+                y = self.__y[boards] + kicks[:, test, 1]
+                free = ~self.__collision(boards, rotation, x, y)
+                self.__rotation[boards[free]] = rotation[free]
+                self.__x[boards[free]] = x[free]
+                self.__y[boards[free]] = y[free]
+                boards = boards[~free]
+                rotation = rotation[~free]
+                kicks = kicks[~free]
+                if len(boards) == 0:
+                    break
+
+    def __brick_hit(self, boards: Any) -> None:
+        """Locks each board's resting brick, clears and scores solid rows, then spawns the next brick."""
+        masks = self.__masks[self.__shape[boards], self.__rotation[boards]]
+        x = self.__x[boards][:, None]
+        placed = (masks << np.maximum(x, 0)) >> np.maximum(-x, 0)
+        rows_y = self.__y[boards][:, None] + np.arange(4)
+        solid = masks != 0
+        self.__rows[np.broadcast_to(boards[:, None], solid.shape)[solid], rows_y[solid]] |= placed[solid]
+        empty_row = empty_row_mask(MATRIX_WIDTH)
+        inner = self.__rows[boards, 1:MATRIX_HEIGHT - 1]
+        full = inner == full_row_mask(MATRIX_WIDTH)
+        cleared = full.sum(axis=1)
+        scoring = cleared > 0
+        if scoring.any():
+            cleared = cleared[scoring]
+            scored = boards[scoring]
+            self.__lines[scored] += cleared
+            self.__level[scored] = (self.__lines[scored] // 20) + 1
+            self.__score[scored] += self.__line_scores[cleared]
+            inner = inner[scoring]
+            inner[full[scoring]] = empty_row
+            order = np.argsort(inner != empty_row, axis=1, kind="stable")
+            self.__rows[scored, 1:MATRIX_HEIGHT - 1] = np.take_along_axis(inner, order, axis=1)
+        self.__spawn(boards)
+
+    def __spawn(self, boards: Any) -> None:
+        """Spawns each board's next brick, ending the game where it collides."""
+        self.__pieces[boards] += 1
+        drawing = boards[self.__pieces[boards] + 2 > self.__drawn[boards]]
+        while len(drawing) > 0:
+            self.__extend_sequence(drawing)
+            drawing = drawing[self.__pieces[drawing] + 2 > self.__drawn[drawing]]
+        self.__shape[boards] = self.__sequence[boards, self.__pieces[boards] % self.__sequence.shape[1]]
+        self.__rotation[boards] = 0
+        self.__x[boards] = self.__spawn_x[self.__shape[boards]]
+        self.__y[boards] = self.__spawn_y[self.__shape[boards]]
+        self.__drop_ticks[boards] = 0
+        self.__game_over[boards] = self.__collision(boards, self.__rotation[boards], self.__x[boards], self.__y[boards])
+
+    def __extend_sequence(self, boards: Any) -> None:
+        """Draws another block of shapes from each board's generator, into its ring over the block before last.
+        Boards only draw when down to their next shape, so only shapes already spawned are overwritten."""
+        size = self.__sequence.shape[1]
+        block_size = size // 2
+        block = np.array([self.__generators[board].generate(block_size) for board in boards.tolist()], np.int8).reshape(len(boards), block_size)
+        columns = (self.__drawn[boards, None] + np.arange(block_size)) % size
+        self.__sequence[boards[:, None], columns] = block - 1
+        self.__drawn[boards] += block_size
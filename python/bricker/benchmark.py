@@ -0,0 +1,298 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from time import perf_counter
+from random import Random
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+from brick import Brick
+from matrix import Matrix, snapshot_matrix
+from piece_generator import create_generator
+from game_engine import GameEngine, Action
+from particles import ParticleSystem
+from batch_engine import BatchEngine
+import batch_engine
+from color import Colors
+
+
+def measure(run: Callable[[], Any], number: int, repeat: int, setup: Optional[Callable[[], Any]] = None) -> float:
+    """Returns the best time of one call to run, in seconds, over repeat rounds of number calls.
+    When a setup function is given it is called (untimed) before every call.  A first, untimed round
+    warms up caches, and as with timeit the garbage collector is off while timing."""
+    best = float("inf")
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        for round_num in range(0, repeat + 1):
+            if setup is None:
+                start_time = perf_counter()
+                for _ in range(0, number):
+                    run()
+                elapsed = perf_counter() - start_time
+            else:
+                elapsed = 0.0
+                for _ in range(0, number):
+                    setup()
+                    start_time = perf_counter()
+                    run()
+                    elapsed += perf_counter() - start_time
+            if round_num > 0:
+                best = min(best, elapsed / number)
+    finally:
+        if collecting:
+            gc.enable()
+    return best
+
+
+def create_engine(seed: int) -> GameEngine:
+    """Returns an engine with a new game started from a fixed seed."""
+    engine = GameEngine(Matrix(create_generator("uniform", seed)))
+    engine.new_game(seed=seed)
+    return engine
+
+
+def place_brick(engine: GameEngine, rng: Random) -> bool:
+    """Rotates and shifts the live brick at random, then drops it.  Returns true on game over."""
+    actions = [Action.ROTATE] * rng.randint(0, 3)
+    shift = rng.randint(-5, 5)
+    actions += [Action.LEFT if shift < 0 else Action.RIGHT] * abs(shift)
+    actions.append(Action.DROP)
+    return engine.run(actions)
+
+
+def build_stack(seed: int, pieces: int = 14) -> GameEngine:
+    """Returns an engine partway through a game, with a ragged stack of resting spaces."""
+    engine = create_engine(seed)
+    rng = Random(seed)
+    for _ in range(0, pieces):
+        if place_brick(engine, rng):
+            break
+    return engine
+
+
+def simulate_game(seed: int, max_pieces: int = 1000) -> int:
+    """Plays one game to the end, with gravity ticks between randomly placed drops.  Returns number of steps taken."""
+    engine = create_engine(seed)
+    rng = Random(seed)
+    steps = 0
+    for _ in range(0, max_pieces):
+        for _ in range(0, rng.randint(0, 20)):
+            steps += 1
+            if engine.step(Action.TICK):
+                return steps
+        steps += 1
+        if place_brick(engine, rng):
+            break
+    return steps
+
+
+def bench_collision(seed: int, repeat: int) -> float:
+    """Brick.collision() against a ragged stack."""
+    matrix = build_stack(seed).matrix
+    brick = matrix.brick
+    assert brick is not None
+    rows = matrix.rows
+    return measure(lambda: brick.collision(rows), 100000, repeat)
+
+
+def bench_rotate(seed: int, repeat: int) -> float:
+    """Brick.rotate() of a long brick against the left wall, running through the wall kick loops."""
+    rows = build_stack(seed).matrix.rows
+    brick = Brick(1)
+    for _ in range(0, 6):
+        brick.move_left(rows)
+    return measure(lambda: brick.rotate(rows), 20000, repeat)
+
+
+def bench_identify_solid_rows(seed: int, repeat: int) -> float:
+    """Matrix.identify_solid_rows() with a ragged stack."""
+    matrix = build_stack(seed).matrix
+    return measure(matrix.identify_solid_rows, 100000, repeat)
+
+
+def bench_drop_grid(seed: int, repeat: int) -> float:
+    """GameEngine.drop_grid() after erasing two rows from the middle of a ragged stack."""
+    engine = build_stack(seed)
+    matrix = engine.matrix
+    filled = [y for y in range(1, matrix.height - 1) if any(matrix.matrix[x][y] for x in range(1, matrix.width - 1))]
+    rows_to_erase = filled[len(filled) // 2:(len(filled) // 2) + 2]
+    saved = snapshot_matrix(matrix)
+
+    def setup() -> None:
+        """Restores the stack (rows, colors and column tops) and erases the rows."""
+        matrix.restore(saved)
+        matrix.erase_spaces(rows_to_erase)
+
+    return measure(engine.drop_grid, 2000, repeat, setup)
+
+
+def bench_draw_frame(seed: int, repeat: int) -> float:
+    """Renderer.draw_frame() of a game in progress, on the SDL dummy video driver."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from pygame.time import Clock
+    from renderer import Renderer
+    pygame.init()
+    screen_size = (1000, 700)
+    screen = pygame.display.set_mode(screen_size)
+    renderer = Renderer("benchmark", screen_size, screen, Clock())
+    engine = build_stack(seed)
+    return measure(lambda: renderer.draw_frame(engine.matrix, engine.stats, None), 200, repeat)
+
+
+def bench_score_panel(seed: int, repeat: int) -> float:
+    """Renderer.draw_current_score() with the score changing every call, as during a soft drop."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from pygame.time import Clock
+    from renderer import Renderer
+    pygame.init()
+    screen_size = (1000, 700)
+    screen = pygame.display.set_mode(screen_size)
+    renderer = Renderer("benchmark", screen_size, screen, Clock())
+    stats = build_stack(seed).stats
+    stats.increment_score(123456)
+
+    def run() -> None:
+        """Scores a point and redraws the panel."""
+        stats.increment_score(1)
+        renderer.draw_current_score(stats)
+
+    return measure(run, 2000, repeat)
+
+
+def bench_particles(seed: int, repeat: int) -> float:
+    """ParticleSystem.update() of two thousand slow sparks, none culled."""
+    particles = ParticleSystem((1000, 700), Random(seed))
+    for _ in range(0, 10):
+        particles.burst(500.0, 350.0, Colors.TuftsBlue, 200, 1.0, 0.0)
+    return measure(lambda: particles.update(1.0 / 60.0), 200, repeat)
+
+
+def bench_games(seed: int, repeat: int) -> float:
+    """Whole games simulated through the engine, gravity ticks and random placements."""
+    seeds = iter(range(seed, seed + 1000000))
+    return measure(lambda: simulate_game(next(seeds)), 20, repeat)
+
+
+def bench_batch_step(seed: int, repeat: int) -> float:
+    """BatchEngine.step() of a thousand boards, random moves between gravity ticks.  All boards restart once half have ended."""
+    engine = BatchEngine(1000)
+    engine.new_game(range(seed, seed + 1000))
+    rng = Random(seed)
+    choices = [Action.TICK] * 6 + [Action.LEFT, Action.RIGHT, Action.ROTATE, Action.DOWN]
+    steps = [[rng.choice(choices) for _ in range(0, 1000)] for _ in range(0, 64)]
+    count = [0]
+
+    def run() -> None:
+        engine.step(steps[count[0] & 63])
+        count[0] += 1
+
+    def setup() -> None:
+        if engine.game_over.sum() > 500:
+            engine.new_game(range(seed + count[0], seed + count[0] + 1000))
+
+    return measure(run, 200, repeat, setup)
+
+
+# benchmarks by name, seconds per call
+BENCHMARKS: Dict[str, Callable[[int, int], float]] = {
+    "collision": bench_collision,
+    "rotate": bench_rotate,
+    "identify_solid_rows": bench_identify_solid_rows,
+    "drop_grid": bench_drop_grid,
+    "draw_frame": bench_draw_frame,
+    "score_panel": bench_score_panel,
+    "particles": bench_particles,
+    "games": bench_games
+}
+if batch_engine.np is not None:
+    BENCHMARKS["batch_step"] = bench_batch_step
+
+
+def run_benchmarks(names: List[str], seed: int, repeat: int) -> Dict[str, Any]:
+    """Runs the named benchmarks.  Returns results in their machine-readable form."""
+    results = {}
+    for name in names:
+        seconds = BENCHMARKS[name](seed, repeat)
+        results[name] = {"seconds": seconds, "per_second": 1.0 / seconds}
+    return {
+        "seed": seed,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Tuple[str, float]]:
+    """Returns (name, slowdown ratio) of every benchmark more than threshold slower than baseline."""
+    regressions = []
+    for name, result in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is not None:
+            ratio = result["seconds"] / base["seconds"]
+            if ratio > 1.0 + threshold:
+                regressions.append((name, ratio))
+    return regressions
+
+
+def confirm(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float, retries: int, repeat: int) -> List[Tuple[str, float]]:
+    """Compares results against baseline, running any benchmark that looks slower again, with twice the rounds, up to
+    retries times.  A short benchmark can lose a round to a noisy neighbour or a frequency change, so only a slowdown
+    that persists is returned.  The best time of all runs is kept in results."""
+    regressions = compare(results, baseline, threshold)
+    for _ in range(0, retries):
+        if len(regressions) == 0:
+            break
+        rerun = run_benchmarks([name for name, _ in regressions], results["seed"], repeat * 2)
+        for name, result in rerun["results"].items():
+            if result["seconds"] < results["results"][name]["seconds"]:
+                results["results"][name] = result
+        regressions = compare(results, baseline, threshold)
+    return regressions
+
+
+def main() -> None:
+    """Command line entry point.  Exits with status 1 if any benchmark regressed against the baseline."""
+    parser = argparse.ArgumentParser(description="Benchmarks Bricker's engine and rendering hot paths.")
+    parser.add_argument("names", nargs="*", metavar="name", help=f"benchmarks to run, default all: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--seed", type=int, default=2020, help="seed for generated games")
+    parser.add_argument("--repeat", type=int, default=5, help="rounds per benchmark, the best is kept")
+    parser.add_argument("--output", metavar="JSON", help="write results to this file")
+    parser.add_argument("--baseline", metavar="JSON", help="compare results against this earlier output, such as benchmark_baseline.json")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown against baseline flagged as regression, 0.2 = 20%%")
+    parser.add_argument("--retries", type=int, default=2, help="times a flagged benchmark is run again before it counts as a regression")
+    args = parser.parse_args()
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark '{name}'")
+    results = run_benchmarks(args.names or list(BENCHMARKS), args.seed, args.repeat)
+    baseline = None
+    regressions: List[Tuple[str, float]] = []
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = confirm(results, baseline, args.threshold, args.retries, args.repeat)
+    for name, result in results["results"].items():
+        line = f"{name:<20}{result['seconds'] * 1e6:>14.3f} us{result['per_second']:>16,.1f} /s"
+        if (baseline is not None) and (name in baseline["results"]):
+            line += f"{(result['seconds'] / baseline['results'][name]['seconds']) - 1.0:>+10.1%}"
+        print(line)
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    for name, ratio in regressions:
+        print(f"REGRESSION {name}: {ratio:.2f}x baseline time")
+    if len(regressions) > 0:
+        sys.exit(1)
+
+
+# start main function
+if __name__ == "__main__":
+    main()
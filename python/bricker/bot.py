@@ -0,0 +1,154 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from brick import Brick, BrickState
+from matrix import Matrix, clear_rows, column_tops, empty_row_mask, full_row_mask
+from game_engine import GameEngine, Action
+
+
+class Weights(NamedTuple):
+    """Heuristic weights, per unit of each board feature.  Negative weights penalize, positive reward."""
+    holes: float = -0.35663
+    aggregate_height: float = -0.510066
+    bumpiness: float = -0.184483
+    lines: float = 0.760666
+
+
+class Placement(NamedTuple):
+    """A reachable resting place for a brick, and the matrix it leaves behind."""
+    rotations: int              # clockwise rotations from spawn
+    start_x: int                # brick X after rotating (wall kicks can move it)
+    x: int                      # brick X at rest
+    y: int                      # brick Y at rest
+    rows: Tuple[int, ...]       # matrix row bitmasks after locking and clearing lines
+    lines: int                  # lines cleared
+
+
+class Bot:
+    """Computer player.  Lists every placement reachable from where the brick is (rotations, then sideways moves,
+    then a drop), scores the board each leaves with a weighted heuristic, and looks one brick ahead using the
+    next brick.  Works directly on the matrix row bitmasks, nothing is copied but the rows.  The matrix size comes from
+    the matrix being played, and locking and clearing lines use the matrix's own rules."""
+
+    def __init__(self, weights: Optional[Weights] = None, lookahead: bool = True, beam: int = 10) -> None:
+        """Class constructor.  With lookahead, the beam best placements of the current brick are tried
+        against every placement of the next brick."""
+        self.__weights: Weights = weights if weights is not None else Weights()
+        self.__lookahead: bool = lookahead
+        self.__beam: int = beam
+
+    @property
+    def weights(self) -> Weights:
+        """Returns heuristic weights."""
+        return self.__weights
+
+    def placements(self, rows: List[int], width: int, shape_num: int, kicks: str = "legacy", start: Optional[BrickState] = None) -> List[Placement]:
+        """Returns every distinct placement of a brick on the given matrix rows, of a matrix width wide, rotating with
+        the named kick table.  The brick starts from the given state, or newly spawned."""
+        brick = Brick(shape_num, kicks)
+        if start is not None:
+            brick.restore(start)
+        if brick.collision(rows):
+            return []
+        rows = list(rows)
+        tops = column_tops(rows, width)
+        placements: Dict[Tuple[int, ...], Placement] = {}
+        for rotations in range(0, 4):
+            if rotations > 0:
+                if not brick.rotate(rows):
+                    break
+            start_x, y = brick.x, brick.y
+            left = start_x
+            while not brick.collision_at(rows, left - 1, y):
+                left -= 1
+            right = start_x
+            while not brick.collision_at(rows, right + 1, y):
+                right += 1
+            for x in range(left, right + 1):
+                landing = brick.landing(rows, tops, x, y)
+                result, lines = self.__lock(rows, width, brick.rotation_data.masks, x, landing)
+                if result not in placements:
+                    placements[result] = Placement(rotations, start_x, x, landing, result, lines)
+        return list(placements.values())
+
+    def best_placement(self, matrix: Matrix) -> Optional[Placement]:
+        """Returns the best placement of the live brick, or none if it cannot be placed."""
+        if matrix.brick is None:
+            return None
+        width = matrix.width
+        first = self.placements(matrix.rows, width, matrix.brick.shape_num, matrix.kicks, matrix.brick.snapshot())
+        if len(first) == 0:
+            return None
+        scored = sorted(((self.evaluate(placement.rows, width, placement.lines), placement) for placement in first), key=lambda item: item[0], reverse=True)
+        if (not self.__lookahead) or (matrix.next_brick is None):
+            return scored[0][1]
+        best = scored[0][1]
+        best_score = float("-inf")
+        next_shape = matrix.next_brick.shape_num
+        for _, placement in scored[:self.__beam]:
+            second = self.placements(list(placement.rows), width, next_shape, matrix.kicks)
+            if len(second) == 0:
+                continue
+            score = max(self.evaluate(after.rows, width, placement.lines + after.lines) for after in second)
+            if score > best_score:
+                best_score = score
+                best = placement
+        return best
+
+    def actions(self, matrix: Matrix) -> List[Action]:
+        """Returns the actions that play the best placement of the live brick, from where it is now."""
+        placement = self.best_placement(matrix)
+        if placement is None:
+            return [Action.DROP]
+        shift = placement.x - placement.start_x
+        return ([Action.ROTATE] * placement.rotations) + ([Action.LEFT if shift < 0 else Action.RIGHT] * abs(shift)) + [Action.DROP]
+
+    def play(self, engine: GameEngine, max_pieces: Optional[int] = None) -> bool:
+        """Plays the engine's game, one placement per brick, until game over or max_pieces placed.  Returns true on game over."""
+        pieces = 0
+        while (not engine.game_over) and ((max_pieces is None) or (pieces < max_pieces)):
+            engine.run(self.actions(engine.matrix))
+            pieces += 1
+        return engine.game_over
+
+    def evaluate(self, rows: Tuple[int, ...], width: int, lines: int) -> float:
+        """Scores a matrix, width wide, by the weighted sum of its holes, aggregate column height, bumpiness and lines
+        cleared.  Rows are walked top to bottom once, tracking which columns have been covered so far."""
+        inner = full_row_mask(width) ^ empty_row_mask(width)
+        bottom = len(rows) - 1
+        heights = [0] * width
+        covered = 0
+        holes = 0
+        aggregate_height = 0
+        for y in range(1, bottom):
+            row = rows[y] & inner
+            if covered:
+                holes += bin(covered & ~row).count("1")
+            new = row & ~covered
+            if new:
+                height = bottom - y
+                covered |= new
+                while new:
+                    bit = new & -new
+                    heights[bit.bit_length() - 1] = height
+                    aggregate_height += height
+                    new ^= bit
+        bumpiness = sum(abs(heights[x] - heights[x + 1]) for x in range(1, width - 2))
+        weights = self.__weights
+        return (weights.holes * holes) + (weights.aggregate_height * aggregate_height) + (weights.bumpiness * bumpiness) + (weights.lines * lines)
+
+    @staticmethod
+    def __lock(rows: List[int], width: int, masks: Tuple[int, ...], x: int, y: int) -> Tuple[Tuple[int, ...], int]:
+        """Returns the rows after locking a brick at (x, y) and clearing any filled lines, and the number of lines."""
+        result = list(rows)
+        full_row = full_row_mask(width)
+        full = False
+        for i, mask in enumerate(masks):
+            if mask:
+                result[y + i] |= (mask << x) if x >= 0 else (mask >> -x)
+                full = full or (result[y + i] == full_row)
+        if not full:
+            return tuple(result), 0
+        return clear_rows(result, width)
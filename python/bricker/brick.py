@@ -2,121 +2,205 @@
 Copyright (C) 2017-2020  John Hyland
 GNU GENERAL PUBLIC LICENSE Version 3"""
 
-from typing import List
-from time import perf_counter
+from typing import Dict, List, NamedTuple, Tuple
 from color import Colors, Color
 
 
+class BrickRotation(NamedTuple):
+    """A single precomputed rotation state of a brick shape.  Shared and never modified."""
+    grid: Tuple[Tuple[int, ...], ...]       # [x][y], 1 where solid
+    masks: Tuple[int, ...]                  # row bitmasks, top to bottom, bit X set when column X is solid
+    cells: Tuple[Tuple[int, int], ...]      # solid (x, y) cells
+    columns: Tuple[Tuple[int, int], ...]    # (x, bottom y) of each solid column
+    top_space: int
+    bottom_space: int
+    left_space: int
+    right_space: int
+
+
+class BrickState(NamedTuple):
+    """Everything that distinguishes one live brick from another.  Immutable, so it can be kept as a snapshot."""
+    shape_num: int
+    rotation: int
+    x: int
+    y: int
+
+
+class BrickShape(NamedTuple):
+    """One of the seven basic shapes, with all four of its rotation states."""
+    shape_num: int
+    size: int
+    color: Color
+    rotations: Tuple[BrickRotation, ...]
+
+
+def build_rotation(size: int, cells: List[Tuple[int, int]]) -> BrickRotation:
+    """Builds a rotation state from a list of solid cells."""
+    grid = tuple(tuple(1 if (x, y) in cells else 0 for y in range(size)) for x in range(size))
+    masks = tuple(sum(1 << x for x in range(size) if grid[x][y] == 1) for y in range(size))
+    solid_rows = [y for y in range(size) if masks[y] != 0]
+    solid_columns = [x for x in range(size) if any(grid[x])]
+    return BrickRotation(
+        grid=grid,
+        masks=masks,
+        cells=tuple(sorted(cells, key=lambda cell: (cell[1], cell[0]))),
+        columns=tuple((x, max(y for y in range(size) if grid[x][y] == 1)) for x in solid_columns),
+        top_space=solid_rows[0],
+        bottom_space=(size - 1) - solid_rows[-1],
+        left_space=solid_columns[0],
+        right_space=(size - 1) - solid_columns[-1])
+
+
+def build_shape(shape_num: int, size: int, color: Color, cells: List[Tuple[int, int]]) -> BrickShape:
+    """Builds a shape and its four clockwise rotation states."""
+    rotations = []
+    for _ in range(0, 4):
+        rotations.append(build_rotation(size, cells))
+        cells = [((size - 1) - y, x) for x, y in cells]
+    return BrickShape(shape_num, size, color, tuple(rotations))
+
+
+# all shapes, indexed by shape number - 1, computed once at import
+SHAPES: Tuple[BrickShape, ...] = (
+    build_shape(1, 4, Colors.SilverPink, [(0, 2), (1, 2), (2, 2), (3, 2)]),
+    build_shape(2, 3, Colors.TuftsBlue, [(0, 1), (0, 2), (1, 2), (2, 2)]),
+    build_shape(3, 3, Colors.ChromeYellow, [(2, 1), (0, 2), (1, 2), (2, 2)]),
+    build_shape(4, 2, Colors.Independence, [(0, 0), (0, 1), (1, 0), (1, 1)]),
+    build_shape(5, 3, Colors.ForestGreen, [(1, 0), (2, 0), (0, 1), (1, 1)]),
+    build_shape(6, 3, Colors.Byzantine, [(1, 1), (0, 2), (1, 2), (2, 2)]),
+    build_shape(7, 3, Colors.Coquelicot, [(0, 0), (1, 0), (1, 1), (2, 1)]))
+
+
+# wall kicks: (x, y) offsets tried in turn after a clockwise rotation, the first free one wins, [shape number - 1][rotation before]
+KickTable = Tuple[Tuple[Tuple[Tuple[int, int], ...], ...], ...]
+
+
+def build_kicks(offsets: Dict[int, Tuple[Tuple[Tuple[int, int], ...], ...]], default: Tuple[Tuple[Tuple[int, int], ...], ...]) -> KickTable:
+    """Builds a kick table from per-transition offsets of the shapes that have their own, the default for the rest."""
+    return tuple(offsets.get(shape.shape_num, default) for shape in SHAPES)
+
+
+# the original game's search: two rows down, two up, two columns left, two right, the same for every shape
+LEGACY_KICKS: KickTable = build_kicks({}, tuple(((0, 0), (0, 1), (0, 2), (0, -1), (0, -2), (-1, 0), (-2, 0), (1, 0), (2, 0)) for _ in range(4)))
+
+# Super Rotation System clockwise kick tests, Y down, for each transition from rotation 0 (spawn), R, 2 and L
+SRS_TESTS: Dict[str, Tuple[Tuple[Tuple[int, int], ...], ...]] = {
+    "I": (((0, 0), (-2, 0), (1, 0), (-2, 1), (1, -2)),
+          ((0, 0), (-1, 0), (2, 0), (-1, -2), (2, 1)),
+          ((0, 0), (2, 0), (-1, 0), (2, -1), (-1, 2)),
+          ((0, 0), (1, 0), (-2, 0), (1, 2), (-2, -1))),
+    "JLSTZ": (((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+              ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+              ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+              ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)))
+}
+
+# SRS spawn state of each shape that kicks, (tests, solid cells) in its SRS bounding box, by shape number
+SRS_SPAWNS: Dict[int, Tuple[str, List[Tuple[int, int]]]] = {
+    1: ("I", [(0, 1), (1, 1), (2, 1), (3, 1)]),
+    2: ("JLSTZ", [(0, 0), (0, 1), (1, 1), (2, 1)]),
+    3: ("JLSTZ", [(2, 0), (0, 1), (1, 1), (2, 1)]),
+    5: ("JLSTZ", [(1, 0), (2, 0), (0, 1), (1, 1)]),
+    6: ("JLSTZ", [(1, 0), (0, 1), (1, 1), (2, 1)]),
+    7: ("JLSTZ", [(0, 0), (1, 0), (1, 1), (2, 1)])
+}
+
+
+def cell_origin(cells: Tuple[Tuple[int, int], ...]) -> Tuple[int, int]:
+    """Returns the top-left corner of the box around some cells."""
+    return min(x for x, _ in cells), min(y for _, y in cells)
+
+
+def build_srs_kicks(shape: BrickShape) -> Tuple[Tuple[Tuple[int, int], ...], ...]:
+    """Builds the SRS kicks of a shape, in this game's own rotation states.  Both rotate about the centre of the same
+    size box, but this game's bricks sit lower in it (J, L and T flat side and the I brick in the bottom rows), so each
+    rotation state is an SRS state shifted by a fixed offset.  Adding the change of that offset to every test makes the
+    brick land on the cells SRS would put it on, and a full turn in open space brings it back where it started."""
+    if shape.shape_num not in SRS_SPAWNS:
+        return tuple(((0, 0),) for _ in range(4))
+    tests, cells = SRS_SPAWNS[shape.shape_num]
+    srs = build_shape(shape.shape_num, shape.size, shape.color, cells)
+    shifts = []
+    for own, standard in zip(shape.rotations, srs.rotations):
+        own_x, own_y = cell_origin(own.cells)
+        standard_x, standard_y = cell_origin(standard.cells)
+        shifts.append((own_x - standard_x, own_y - standard_y))
+    kicks = []
+    for before in range(4):
+        after = (before + 1) & 3
+        shift_x = shifts[before][0] - shifts[after][0]
+        shift_y = shifts[before][1] - shifts[after][1]
+        kicks.append(tuple((x + shift_x, y + shift_y) for x, y in SRS_TESTS[tests][before]))
+    return tuple(kicks)
+
+
+# Super Rotation System kicks, for the I brick, none for O and shared by the rest, moved onto this game's rotation states
+SRS_KICKS: KickTable = tuple(build_srs_kicks(shape) for shape in SHAPES)
+
+# kick tables by name
+KICKS: Dict[str, KickTable] = {
+    "legacy": LEGACY_KICKS,
+    "srs": SRS_KICKS
+}
+
+
 class Brick:
     """Represents a live, moving brick that has not yet joined the static game matrix.
-    It will do so once it's hit bottom and come to rest."""
-
-    def __init__(self, shape_num: int) -> None:
-        """Class constructor.  Creates one of seven basic shapes."""
-        self.__shape_num: int = shape_num
-        if shape_num == 1:
-            self.__width: int = 4
-            self.__height: int = 4
-            self.__grid: List[List[int]] = [[0 for x in range(self.__height)] for y in range(self.__width)]
-            self.__grid[0][2] = 1
-            self.__grid[1][2] = 1
-            self.__grid[2][2] = 1
-            self.__grid[3][2] = 1
-            self.__color = Colors.SilverPink
-        elif shape_num == 2:
-            self.__width = 3
-            self.__height = 3
-            self.__grid = [[0 for x in range(self.__height)] for y in range(self.__width)]
-            self.__grid[0][1] = 1
-            self.__grid[0][2] = 1
-            self.__grid[1][2] = 1
-            self.__grid[2][2] = 1
-            self.__color = Colors.TuftsBlue
-        elif shape_num == 3:
-            self.__width = 3
-            self.__height = 3
-            self.__grid = [[0 for x in range(self.__height)] for y in range(self.__width)]
-            self.__grid[2][1] = 1
-            self.__grid[0][2] = 1
-            self.__grid[1][2] = 1
-            self.__grid[2][2] = 1
-            self.__color = Colors.ChromeYellow
-        elif shape_num == 4:
-            self.__width = 2
-            self.__height = 2
-            self.__grid = [[0 for x in range(self.__height)] for y in range(self.__width)]
-            self.__grid[0][0] = 1
-            self.__grid[0][1] = 1
-            self.__grid[1][0] = 1
-            self.__grid[1][1] = 1
-            self.__color = Colors.Independence
-        elif shape_num == 5:
-            self.__width = 3
-            self.__height = 3
-            self.__grid = [[0 for x in range(self.__height)] for y in range(self.__width)]
-            self.__grid[1][0] = 1
-            self.__grid[2][0] = 1
-            self.__grid[0][1] = 1
-            self.__grid[1][1] = 1
-            self.__color = Colors.ForestGreen
-        elif shape_num == 6:
-            self.__width = 3
-            self.__height = 3
-            self.__grid = [[0 for x in range(self.__height)] for y in range(self.__width)]
-            self.__grid[1][1] = 1
-            self.__grid[0][2] = 1
-            self.__grid[1][2] = 1
-            self.__grid[2][2] = 1
-            self.__color = Colors.Byzantine
-        elif shape_num == 7:
-            self.__width = 3
-            self.__height = 3
-            self.__grid = [[0 for x in range(self.__height)] for y in range(self.__width)]
-            self.__grid[0][0] = 1
-            self.__grid[1][0] = 1
-            self.__grid[1][1] = 1
-            self.__grid[2][1] = 1
-            self.__color = Colors.Coquelicot
-        self.__top_space: int = self.__get_top_space()
-        self.__bottom_space: int = self.__get_bottom_space()
-        self.__x: int = int((12 - self.__width) / 2)
-        self.__y: int = 1 - self.__top_space
-        self.__last_drop_time: float = perf_counter()
+    It will do so once it's hit bottom and come to rest.  All shape data comes from the
+    shared rotation and kick tables, so a brick is just its shape, rotation and position."""
+
+    def __init__(self, shape_num: int, kicks: str = "legacy") -> None:
+        """Class constructor.  Creates one of seven basic shapes, rotating with the named kick table."""
+        if kicks not in KICKS:
+            raise ValueError(f"Unknown kick table '{kicks}'")
+        self.__shape: BrickShape = SHAPES[shape_num - 1]
+        self.__kicks_name: str = kicks
+        self.__kicks: Tuple[Tuple[Tuple[int, int], ...], ...] = KICKS[kicks][shape_num - 1]
+        self.__rotation_num: int = 0
+        self.__rotation: BrickRotation = self.__shape.rotations[0]
+        self.__x: int = (12 - self.__shape.size) // 2
+        self.__y: int = 1 - self.__rotation.top_space
+
+    @property
+    def shape(self) -> BrickShape:
+        """Returns the shape definition."""
+        return self.__shape
 
     @property
     def shape_num(self) -> int:
         """Returns the shape number."""
-        return self.__shape_num
+        return self.__shape.shape_num
+
+    @property
+    def kicks(self) -> str:
+        """Returns name of the kick table used when rotating."""
+        return self.__kicks_name
+
+    @property
+    def rotation(self) -> int:
+        """Returns the rotation index (0-3)."""
+        return self.__rotation_num
 
     @property
     def width(self) -> int:
         """Returns brick width."""
-        return self.__width
+        return self.__shape.size
 
     @property
     def height(self) -> int:
         """Returns brick height."""
-        return self.__height
+        return self.__shape.size
 
     @property
-    def grid(self) -> List[List[int]]:
-        """Returns brick grid."""
-        return self.__grid
+    def rotation_data(self) -> BrickRotation:
+        """Returns the current rotation state: grid, row bitmasks, solid cells and columns, and the
+        non-solid spaces around them.  Shared by every brick of the shape, never modify."""
+        return self.__rotation
 
     @property
     def color(self) -> Color:
         """Returns brick color."""
-        return self.__color
-
-    @property
-    def top_space(self) -> int:
-        """Returns non-solid spaces at top of brick grid."""
-        return self.__top_space
-
-    @property
-    def bottom_space(self) -> int:
-        """Returns non-solid spaces at bottom of brick grid."""
-        return self.__bottom_space
+        return self.__shape.color
 
     @property
     def x(self) -> int:
@@ -128,111 +212,101 @@ class Brick:
         """Returns Y position of brick."""
         return self.__y
 
-    def __get_top_space(self) -> int:
-        """Calculates non-solid spaces at top of brick grid."""
-        top_space = 0
-        for y in range(0, self.__height):
-            empty = True
-            for x in range(0, self.__width):
-                if self.__grid[x][y] == 1:
-                    empty = False
-            if empty:
-                top_space += 1
-            else:
-                break
-        return top_space
-
-    def __get_bottom_space(self) -> int:
-        """Calculates non-solid spaces at bottom of brick grid."""
-        bottom_space = 0
-        for y in reversed(range(0, self.__height)):
-            empty = True
-            for x in range(0, self.__width):
-                if self.__grid[x][y] == 1:
-                    empty = False
-            if empty:
-                bottom_space += 1
-            else:
-                break
-        return bottom_space
-
-    def collision(self, matrix) -> bool:
-        """Returns true on brick collision."""
-        for x in range(0, self.__width):
-            for y in range(0, self.__height):
-                matrix_x = x + self.__x
-                matrix_y = y + self.__y
-                if (self.__grid[x][y] == 1) and (matrix[matrix_x][matrix_y] == 1):
+    def snapshot(self) -> BrickState:
+        """Returns the brick's state, to restore later."""
+        return BrickState(self.__shape.shape_num, self.__rotation_num, self.__x, self.__y)
+
+    def restore(self, state: BrickState) -> None:
+        """Puts the brick back to a saved state."""
+        self.__shape = SHAPES[state.shape_num - 1]
+        self.__kicks = KICKS[self.__kicks_name][state.shape_num - 1]
+        self.__rotation_num = state.rotation
+        self.__rotation = self.__shape.rotations[state.rotation]
+        self.__x = state.x
+        self.__y = state.y
+
+    def clone(self) -> 'Brick':
+        """Returns a copy of the brick, free to move independently."""
+        brick = Brick(self.__shape.shape_num, self.__kicks_name)
+        brick.restore(self.snapshot())
+        return brick
+
+    def collision(self, rows: List[int]) -> bool:
+        """Returns true on brick collision, given the matrix row bitmasks."""
+        return self.collision_at(rows, self.__x, self.__y)
+
+    def collision_at(self, rows: List[int], x: int, top: int) -> bool:
+        """Returns true if brick would collide at the given position, given the matrix row bitmasks."""
+        bottom = len(rows)
+        for i, mask in enumerate(self.__rotation.masks):
+            if mask:
+                y = top + i
+                if (y < 0) or (y >= bottom):
+                    return True
+                if x >= 0:
+                    if (mask << x) & rows[y]:
+                        return True
+                elif (mask & ((1 << -x) - 1)) or ((mask >> -x) & rows[y]):
                     return True
         return False
 
-    def move_left(self, matrix) -> None:
+    def landing(self, rows: List[int], tops: List[int], x: int, top: int) -> int:
+        """Returns the Y the brick would come to rest at, dropped straight down from the given position.  Given the
+        top solid row of each column, this is found in one pass over the brick's columns when the brick is above all
+        of them.  Otherwise (under an overhang) the brick is stepped down until it collides."""
+        drop = -1
+        for column, column_bottom in self.__rotation.columns:
+            distance = tops[x + column] - (top + column_bottom) - 1
+            if distance < 0:
+                drop = -1
+                break
+            if (drop < 0) or (distance < drop):
+                drop = distance
+        if drop >= 0:
+            return top + drop
+        while not self.collision_at(rows, x, top + 1):
+            top += 1
+        return top
+
+    def drop(self, rows: List[int], tops: List[int]) -> int:
+        """Moves brick straight down to where it comes to rest.  Returns number of rows dropped."""
+        y = self.landing(rows, tops, self.__x, self.__y)
+        dropped = y - self.__y
+        self.__y = y
+        return dropped
+
+    def move_left(self, rows: List[int]) -> None:
         """Moves brick left, prevents collision."""
         self.__x -= 1
-        if self.collision(matrix):
+        if self.collision(rows):
             self.__x += 1
 
-    def move_right(self, matrix) -> None:
+    def move_right(self, rows: List[int]) -> None:
         """Moves brick right, prevents collision."""
         self.__x += 1
-        if self.collision(matrix):
+        if self.collision(rows):
             self.__x -= 1
 
-    def move_down(self, matrix) -> bool:
+    def move_down(self, rows: List[int]) -> bool:
         """Moves brick down, prevents collision.  Returns true if move would have hit bottom."""
-        self.__last_drop_time = perf_counter()
         self.__y += 1
-        if self.collision(matrix):
+        if self.collision(rows):
             self.__y -= 1
             return True
         return False
 
-    def is_drop_time(self, interval) -> bool:
-        """Returns true if its time to drop brick (gravity)."""
-        now = perf_counter()
-        elapsed = now - self.__last_drop_time
-        drop_time = elapsed >= interval
-        return drop_time
-
-    def rotate(self, matrix) -> None:
-        """Rotates brick."""
-
-        new_grid = [[0 for x in range(self.__width)] for y in range(self.__height)]
-        for x1 in range(0, self.__width):
-            for y1 in range(0, self.__height):
-                x2 = -y1 + (self.__height - 1)
-                y2 = x1
-                new_grid[x2][y2] = self.__grid[x1][y1]
-        self.__grid = new_grid
-
-        steps = 0
-        while self.collision(matrix):
-            self.__y += 1
-            steps += 1
-            if steps >= 3:
-                self.__y -= 3
-                break
-
-        steps = 0
-        while self.collision(matrix):
-            self.__y -= 1
-            steps += 1
-            if steps >= 3:
-                self.__y += 3
-                break
-
-        steps = 0
-        while self.collision(matrix):
-            self.__x -= 1
-            steps += 1
-            if steps >= 3:
-                self.__x += 3
-                break
-
-        steps = 0
-        while self.collision(matrix):
-            self.__x += 1
-            steps += 1
-            if steps >= 3:
-                self.__x -= 3
-                break
+    def rotate(self, rows: List[int]) -> bool:
+        """Rotates brick clockwise, moved to the first free offset of its kick table.  If none is free the
+        rotation is undone.  Returns true if rotated."""
+        rotation_num = (self.__rotation_num + 1) & 3
+        rotation = self.__shape.rotations[rotation_num]
+        current = self.__rotation
+        self.__rotation = rotation
+        for x, y in self.__kicks[self.__rotation_num]:
+            if not self.collision_at(rows, self.__x + x, self.__y + y):
+                self.__rotation_num = rotation_num
+                self.__x += x
+                self.__y += y
+                return True
+        self.__rotation = current
+        return False
@@ -2,46 +2,103 @@
 Copyright (C) 2017-2020  John Hyland
 GNU GENERAL PUBLIC LICENSE Version 3"""
 
-from typing import Tuple, List
-from time import perf_counter
+from typing import Tuple, List, Optional
+from time import strftime
+from threading import Event, Thread
+from random import Random
+import argparse
+import os.path
 import pygame
 from pygame import Surface
 from pygame.time import Clock
-from matrix import Matrix
-from color import Colors
-from renderer import Renderer
+from renderer import Renderer, load_font_file, load_version
 from game_stats import GameStats
-from exploding_space import ExplodingSpace
+from score_store import shared_store
+from game_engine import GameEngine, Action
+from piece_generator import random_seed
+from particles import ParticleSystem
+from bot import Bot
+from brick import Brick, BrickState
+from profiler import FrameProfiler
+from scheduler import Scheduler
+from animation import Animation, EraseAnimation, ExplodeAnimation
 
 
 class Bricker:
-    """Contains main game logic and entry point."""
+    """Contains main game loop and entry point.  Game rules live in the headless GameEngine,
+    this class handles input, animation and rendering around it."""
 
-    def __init__(self) -> None:
-        """Class constructor."""
+    def __init__(self, replay_dir: Optional[str] = None, profile_path: Optional[str] = None, max_fps: int = 60, bot: Optional[Bot] = None) -> None:
+        """Class constructor.  Each game is recorded to the replay directory, if given.  Frame timings
+        are written to the profile CSV file on exit, if given.  Game frames are drawn at most max_fps
+        times per second, game speed does not depend on it.  If a bot is given it plays every game,
+        starting a new one after each game over."""
 
         # load version
-        try:
-            with open("version", "r") as file:
-                version = file.readline().strip()
-        except Exception:
-            version = "1.0"
-
-        # init pygame framework
+        version = load_version()
+
+        # read the font and open high scores in the background, starting while the display opens;
+        # the splash frame waits for the font, the game for the scores only when it first needs them
+        self.__profiler: FrameProfiler = FrameProfiler()
+        self.__font_data: Optional[bytes] = None
+        self.__font_loaded: Event = Event()
+        self.__loader: Thread = Thread(target=self.__load, name="loader", daemon=True)
+        self.__loader.start()
+        self.__loaded: bool = False
+
+        # init pygame framework, show splash frame as soon as the display opens
+        start_time = self.__profiler.time()
         pygame.init()
-
-        # define class vars
         self.__screen_size: Tuple[int, int] = (1000, 700)
         self.__screen: Surface = pygame.display.set_mode(self.__screen_size)
         self.__clock: Clock = Clock()
-        self.__renderer: Renderer = Renderer(version, self.__screen_size, self.__screen, self.__clock)
-        self.__matrix: Matrix = Matrix()
-        self.__stats: GameStats = GameStats()
-        self.__level_drop_intervals: List[float] = []
-        interval = 2.0
-        for _ in range(0, 10):
-            interval *= 0.8
-            self.__level_drop_intervals.append(interval)
+        start_time = self.__profiler.startup_phase("display", start_time)
+        self.__renderer: Renderer = Renderer(version, self.__screen_size, self.__screen, self.__clock, self.__profiler, self.__font_file)
+        self.__renderer.draw_splash()
+        self.__profiler.startup_phase("splash", start_time)
+        self.__profiler.startup_mark("first_frame")
+
+        # define class vars
+        self.__engine: GameEngine = GameEngine(stats=GameStats([]))
+        self.__scheduler: Scheduler = Scheduler(self.__clock, self.__engine.ticks_per_second, max_fps)
+        self.__animation: Optional[Animation] = None
+        self.__pending_events: List[pygame.event.Event] = []
+        self.__effects_random: Random = Random()
+        self.__particles: ParticleSystem = ParticleSystem(self.__screen_size, self.__effects_random)
+        self.__replay_dir: Optional[str] = replay_dir
+        self.__profile_path: Optional[str] = profile_path
+        self.__bot: Optional[Bot] = bot
+        self.__bot_brick: Optional[Brick] = None
+        self.__bot_state: Optional[BrickState] = None
+        self.__bot_actions: List[Action] = []
+
+
+    def __load(self) -> None:
+        """Loading thread.  Reads the font file, then opens the shared high score store (a new database is created,
+        an old scores file imported)."""
+        start_time = self.__profiler.time()
+        try:
+            self.__font_data = load_font_file()
+            start_time = self.__profiler.startup_phase("font", start_time)
+        finally:
+            self.__font_loaded.set()
+        shared_store()
+        self.__profiler.startup_phase("scores", start_time)
+
+
+    def __font_file(self) -> bytes:
+        """Returns the font file read by the loading thread, waiting for it if need be.  Read here if the thread failed to."""
+        self.__font_loaded.wait()
+        return self.__font_data if self.__font_data is not None else load_font_file()
+
+
+    def __finish_loading(self, wait: bool) -> None:
+        """Shows the loaded high scores once the loading thread is done.  Waits for it if asked, otherwise only checks."""
+        if (not self.__loaded) and (wait or not self.__loader.is_alive()):
+            self.__loader.join()
+            self.__engine.stats = GameStats()
+            self.__loaded = True
+            self.__profiler.startup_mark("ready")
 
 
     def main(self) -> None:
@@ -49,27 +106,41 @@ class Bricker:
 
         # vars
         in_game = False
+        game_over = False
 
         # program loop
         while True:
 
-            # get menu selection
-            menu_selection = self.menu_loop(in_game)
+            # get menu selection, bot goes straight to a new game after game over
+            if (self.__bot is not None) and game_over:
+                menu_selection = 2
+            else:
+                menu_selection = self.menu_loop(in_game)
 
             # resume, run game loop
             if menu_selection == 1:
                 in_game = self.game_loop()
+                game_over = not in_game
 
             # start new game, run game loop
             elif menu_selection == 2:
                 self.new_game()
                 in_game = self.game_loop()
+                game_over = not in_game
 
             # quit program
             elif menu_selection == 3:
-                self.explode_spaces()
+                self.play_animation(self.explode_spaces())
                 break
 
+        # let the loading thread finish any high score import before exiting
+        self.__loader.join()
+
+        # save frame timings
+        if self.__profile_path is not None:
+            self.__profiler.save_csv(self.__profile_path)
+            self.__profiler.save_startup_csv(os.path.splitext(self.__profile_path)[0] + "_startup.csv")
+
 
     def menu_loop(self, in_game: bool) -> int:
         """The main menu loop."""
@@ -112,8 +183,9 @@ class Bricker:
                 elif event.type == pygame.KEYDOWN and (event.key == pygame.K_SPACE or event.key == pygame.K_RETURN):
                     return menu_selection
 
-            # draw menu
-            self.__renderer.draw_menu(self.__matrix, self.__stats, menu_selection, in_game)
+            # draw menu, high scores appear once loaded
+            self.__finish_loading(False)
+            self.__renderer.draw_menu(self.__engine.matrix, self.__engine.stats, menu_selection, in_game)
 
 
     def high_score_loop(self) -> None:
@@ -150,30 +222,40 @@ class Bricker:
                         done = True
 
             # draw frame
-            self.__renderer.draw_initials_input(self.__matrix, self.__stats, chars)
+            self.__renderer.draw_initials_input(self.__engine.matrix, self.__engine.stats, chars)
 
         # add new high score
         initials = "".join(chars).lower()
-        self.__stats.add_high_score(initials)
+        self.__engine.stats.add_high_score(initials)
 
 
     def game_loop(self) -> bool:
-        """The main game loop.  Returns true if still in game (menu opened)."""
+        """The main game loop.  Returns true if still in game (menu opened).  Game time advances in fixed
+        ticks from the scheduler, input is handled and a frame is drawn once per loop."""
 
         # vars
-        game_over = False
-
-        # event loop
-        while not game_over:
-
-            # reset hit flag
-            hit = False
-
-            # limit fps
-            self.__clock.tick(60)
-
-            # handle user events
-            for event in pygame.event.get():
+        engine = self.__engine
+        profiler = self.__profiler
+        scheduler = self.__scheduler
+        scheduler.reset()
+
+        # event loop, until game over and its explosion has played out
+        while not (engine.game_over and (self.__animation is None)):
+
+            # wait for next frame, limits fps
+            ticks = scheduler.next_frame()
+            profiler.begin_frame()
+            start_time = profiler.time()
+
+            # handle user events, held back while an animation runs (brick is not under player control)
+            events = self.__pending_events + pygame.event.get()
+            self.__pending_events = []
+            for i, event in enumerate(events):
+
+                # animation started, keep remaining events for later
+                if self.__animation is not None:
+                    self.__pending_events = events[i:]
+                    break
 
                 # left
                 if event.type == pygame.KEYDOWN and event.key == pygame.K_LEFT:
@@ -194,7 +276,6 @@ class Bricker:
                 # drop
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
                     self.drop_brick_to_bottom()
-                    hit = True
 
                 # menu
                 elif event.type == pygame.KEYDOWN and (event.key == pygame.K_ESCAPE or event.key == pygame.K_q):
@@ -203,193 +284,206 @@ class Bricker:
                 # level up
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_PAGEUP:
                     if self.__renderer.debug:
-                        self.__stats.level += 1
-                        if self.__stats.level > 10:
-                            self.__stats.level = 10
+                        engine.change_level(1)
 
                 # level down
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_PAGEDOWN:
                     if self.__renderer.debug:
-                        self.__stats.level -= 1
-                        if self.__stats.level < 1:
-                            self.__stats.level = 1
+                        engine.change_level(-1)
 
                 # debug toggle
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_d:
                     self.__renderer.debug = not self.__renderer.debug
 
-            # drop brick timer?
-            if self.is_drop_time():    # add drop interval
-                hit = self.move_brick_down()
+                # ghost piece toggle
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_g:
+                    self.__renderer.ghost = not self.__renderer.ghost
 
-            # brick hit bottom?
-            if hit:
-                game_over = self.brick_hit()
+            # computer player
+            if self.__bot is not None:
+                self.bot_step()
+
+            start_time = profiler.stop("events", start_time)
+
+            # advance game time, runs animations and drops brick when due
+            for _ in range(0, ticks):
+                self.update()
+            profiler.stop("logic", start_time)
 
             # draw frame
-            self.__renderer.update_frame(self.__matrix, self.__stats, None)
+            self.draw_frame()
+            profiler.end_frame()
 
-        # game over
-        self.explode_spaces()
-        if self.__stats.is_high_score():
+        # game over, bot games are not saved so they can't take the players' places on the board
+        if (self.__bot is None) and engine.stats.is_high_score():
             self.high_score_loop()
         return False
 
 
+    def bot_step(self) -> None:
+        """Plays the bot's next action, one per frame.  Plans a placement for each new brick, using the next brick as lookahead,
+        and plans again from where the brick is whenever it isn't where the last action left it (gravity moved it, or a move failed)."""
+        matrix = self.__engine.matrix
+        if (self.__bot is None) or (self.__animation is not None) or (matrix.brick is None) or self.__engine.game_over:
+            return
+        if (matrix.brick is not self.__bot_brick) or (matrix.brick.snapshot() != self.__bot_state):
+            self.__bot_brick = matrix.brick
+            self.__bot_actions = self.__bot.actions(matrix)
+        if len(self.__bot_actions) > 0:
+            action = self.__bot_actions.pop(0)
+            if action == Action.LEFT:
+                self.move_brick_left()
+            elif action == Action.RIGHT:
+                self.move_brick_right()
+            elif action == Action.ROTATE:
+                self.rotate_brick()
+            elif action == Action.DROP:
+                self.drop_brick_to_bottom()
+            self.__bot_state = matrix.brick.snapshot() if matrix.brick is not None else None
+
+
+    def update(self) -> None:
+        """Advances the game by one tick.  Runs the current animation, if any, otherwise game time (gravity).
+        Particle effects always run.  The gravity step and brick hits are profiled as stages of their own."""
+        self.__particles.update(self.__scheduler.tick_interval)
+        animation = self.__animation
+        if animation is not None:
+            if animation.update():
+                self.__animation = None
+                animation.finish()
+        elif not self.__engine.game_over:
+            start_time = self.__profiler.time()
+            hit = self.__engine.tick()
+            self.__profiler.stop("gravity", start_time)
+            if hit:
+                self.brick_hit()
+
+
+    def draw_frame(self) -> None:
+        """Draws the current game frame, with particles positioned between ticks."""
+        self.__particles.interpolate(self.__scheduler.alpha * self.__scheduler.tick_interval)
+        self.__renderer.update_frame(self.__engine.matrix, self.__engine.stats, self.__particles)
+
+
+    def play_animation(self, animation: Animation) -> None:
+        """Runs an animation to the end, outside the game loop."""
+        self.__animation = animation
+        self.__scheduler.reset()
+        while self.__animation is not None:
+            ticks = self.__scheduler.next_frame()
+            self.__renderer.event_pump()
+            for _ in range(0, ticks):
+                self.update()
+            self.draw_frame()
+
+
     def new_game(self) -> None:
-        """Resets state and starts a new game."""
-        self.__stats = GameStats()
-        self.__matrix.new_game()
+        """Resets state and starts a new game.  High scores must be loaded by now."""
+        self.__finish_loading(True)
+        self.__engine.new_game(GameStats(), random_seed(), self.__replay_dir is not None)
 
 
     def move_brick_left(self) -> None:
         """Moves brick left."""
-        self.__matrix.move_brick_left()
+        self.__engine.move_brick_left()
 
 
     def move_brick_right(self) -> None:
         """Moves brick right."""
-        self.__matrix.move_brick_right()
+        self.__engine.move_brick_right()
 
 
     def move_brick_down(self) -> bool:
         """Moves brick down.  Returns true if brick hits bottom."""
-        hit = self.__matrix.move_brick_down()
-        if hit:
-            self.__stats.increment_score(1)
-        return hit
+        return self.__engine.move_brick_down()
 
 
     def rotate_brick(self) -> None:
         """Rotates brick."""
-        self.__matrix.rotate_brick()
+        self.__engine.rotate_brick()
 
 
     def drop_brick_to_bottom(self) -> None:
-        """Animates a brick dropping to bottom of screen."""
-        hit = False
-        while not hit:
-            self.__renderer.clock.tick(30)
-            for _ in range(0, 3):
-                hit = self.move_brick_down()
-                if hit:
-                    break
-            self.__renderer.event_pump()
-            self.__renderer.update_frame(self.__matrix, self.__stats, None)
-        self.__stats.increment_score(2)
-
+        """Drops brick straight to bottom of screen, at once, and locks it."""
+        self.__engine.drop_brick_to_bottom()
+        self.brick_hit()
 
-    def is_drop_time(self) -> bool:
-        """Returns true if it's time for brick to drop."""
-        if self.__matrix.brick is not None:
-            drop_interval = self.__level_drop_intervals[self.__stats.level - 1]
-            return self.__matrix.brick.is_drop_time(drop_interval)
-        return False
 
-
-    def brick_hit(self) -> bool:
-        """Executed when brick hits bottom and comes to rest.  Spawns new brick.  Returns true on new brick collision (game over)."""
-        self.__matrix.add_brick_to_matrix()
-        rows_to_erase = self.__matrix.identify_solid_rows()
+    def brick_hit(self) -> None:
+        """Executed when brick hits bottom and comes to rest.  Starts erasing any filled rows, else spawns new brick."""
+        start_time = self.__profiler.time()
+        rows_to_erase = self.__engine.lock_brick()
         if len(rows_to_erase) > 0:
-            rows = len(rows_to_erase)
-            self.__stats.add_lines(rows)
-            points = 40
-            if rows == 2:
-                points = 100
-            elif rows == 3:
-                points = 300
-            elif rows == 4:
-                points = 1200
-            self.__stats.increment_score(points)
-            self.erase_filled_rows(rows_to_erase)
-            self.drop_grid()
-            self.__renderer.event_pump()
-            self.__renderer.update_frame(self.__matrix, self.__stats, None)
-        collision = self.__matrix.spawn_brick()
-        return collision
-
-
-    def erase_filled_rows(self, rows_to_erase: List[int]) -> None:
-        """Animates erasure of filled rows."""
-        for x in range(1, 11):
-            for y in rows_to_erase:
-                self.__matrix.matrix[x][y] = 0
-                self.__matrix.color[x][y] = Colors.Black
-            if (x % 2) == 0:
-                self.__renderer.event_pump()
-                self.__renderer.update_frame(self.__matrix, self.__stats, None)
-
-
-    def drop_grid(self) -> None:
-        """Drops hanging pieces to resting place."""
-        while self.drop_grid_once():
-            pass
-
-
-    def drop_grid_once(self) -> bool:
-        """Drops hanging pieces, bottom-most row."""
-        top_filled_row = 0
-        for row in range(1, 21):
-            empty = True
-            for x in range(1, 11):
-                if self.__matrix.matrix[x][row] == 1:
-                    empty = False
-                    break
-            if not empty:
-                top_filled_row = row
-                break
-        if top_filled_row == 0:
-            return False
-        bottom_empty_row = 0
-        for row in range(20, (top_filled_row - 1), -1):
-            empty = True
-            for x in range(1, 11):
-                if self.__matrix.matrix[x][row] == 1:
-                    empty = False
-                    break
-            if empty:
-                bottom_empty_row = row
-                break
-        if bottom_empty_row == 0:
-            return False
-        for y in range(bottom_empty_row, 1, -1):
-            for x in range(1, 11):
-                self.__matrix.matrix[x][y] = self.__matrix.matrix[x][y - 1]
-                self.__matrix.color[x][y] = self.__matrix.color[x][y - 1]
-        for x in range(1, 11):
-            self.__matrix.matrix[x][1] = 0
-            self.__matrix.color[x][1] = Colors.Black
-        return True
-
-
-    def explode_spaces(self) -> None:
-        """Explodes matrix spaces outwards on game over."""
-        self.__matrix.add_brick_to_matrix()
-        spaces: List[ExplodingSpace] = []
+            self.__animation = EraseAnimation(self.__engine.matrix, rows_to_erase, self.__rows_erased, on_erase=self.__burst_spaces)
+        else:
+            self.spawn_brick()
+        self.__profiler.stop("brick_hit", start_time)
+
+
+    def __rows_erased(self) -> None:
+        """Executed when filled rows have been erased.  Drops hanging pieces and spawns new brick."""
+        start_time = self.__profiler.time()
+        self.__engine.drop_grid()
+        self.spawn_brick()
+        self.__profiler.stop("brick_hit", start_time)
+
+
+    def spawn_brick(self) -> None:
+        """Spawns new brick.  On collision the game is over, the replay is saved and spaces explode."""
+        if self.__engine.spawn_brick():
+            self.save_replay()
+            self.__animation = self.explode_spaces()
+
+
+    def save_replay(self) -> None:
+        """Saves the finished game to the replay directory, if recording."""
+        replay = self.__engine.replay
+        if (self.__replay_dir is not None) and (replay is not None):
+            os.makedirs(self.__replay_dir, exist_ok=True)
+            path = os.path.join(self.__replay_dir, f"{strftime('%Y%m%d-%H%M%S')}-{replay.seed}.rpl")
+            replay.save(path)
+
+
+    def __burst_spaces(self, rows: List[int], x_from: int, x_to: int) -> None:
+        """Throws sparks from matrix spaces about to be erased."""
+        matrix = self.__engine.matrix
+        for y in rows:
+            for x in range(x_from, x_to + 1):
+                space_x = (((x - 1) * 33) + 17) + ((self.__renderer.screen_size[0] - 333) // 2)
+                space_y = (((y - 1) * 33) + 17) + ((self.__renderer.screen_size[1] - 663) // 2)
+                if (matrix.rows[y] >> x) & 1:
+                    self.__particles.burst(space_x, space_y, matrix.color[x][y], 12, 400.0)
+
+
+    def explode_spaces(self) -> ExplodeAnimation:
+        """Returns an animation exploding matrix spaces outwards, on game over.  Each space flies off in
+        a random direction, speeding up as it goes."""
+        self.__engine.matrix.add_brick_to_matrix()
+        rng = self.__effects_random
         for x in range(1, 11):
             for y in range(1, 21):
-                if self.__matrix.matrix[x][y] == 1:
+                if (self.__engine.matrix.rows[y] >> x) & 1:
                     space_x = (((x - 1) * 33) + 2) + ((self.__renderer.screen_size[0] - 333) // 2) - 1
                     space_y = (((y - 1) * 33) + 2) + ((self.__renderer.screen_size[1] - 663) // 2) - 1
-                    spaces.append(ExplodingSpace(space_x, space_y, self.__matrix.color[x][y]))
-                    self.__matrix.matrix[x][y] = 0
-                    self.__matrix.color[x][y] = Colors.Black
-        start_time = perf_counter()
-        have_spaces = True
-        while have_spaces:
-            seconds = perf_counter() - start_time
-            have_spaces = False
-            for space in spaces:
-                space.x += space.x_motion * seconds
-                space.y += space.y_motion * seconds
-                if (space.x > 0) and (space.x < 1000) and (space.y > 0) and (space.y < 700):
-                    have_spaces = True
-            self.__clock.tick(30)
-            self.__renderer.update_frame(self.__matrix, self.__stats, spaces)
+                    x_motion = (float(rng.randint(0, 3000)) / 10.0) + 50.0
+                    y_motion = (float(rng.randint(0, 3000)) / 10.0) + 50.0
+                    if rng.randint(0, 1) == 1:
+                        x_motion = -x_motion
+                    if rng.randint(0, 1) == 1:
+                        y_motion = -y_motion
+                    color = self.__engine.matrix.color[x][y]
+                    self.__particles.emit(space_x, space_y, 0.5 * x_motion, 0.5 * y_motion, color, 30.0 * x_motion, 30.0 * y_motion, True)
+        self.__engine.matrix.erase_spaces(list(range(1, 21)))
+        return ExplodeAnimation(self.__particles)
 
 
 # start main function
 if __name__ == "__main__":
-    bricker = Bricker()
+    parser = argparse.ArgumentParser(description="A Tetris-like brick game.")
+    parser.add_argument("--record", metavar="DIR", help="record a replay of each game to this directory")
+    parser.add_argument("--profile", metavar="CSV", help="write per-frame stage timings to this file on exit")
+    parser.add_argument("--fps", type=int, default=60, help="frame rate cap, game speed is unaffected")
+    parser.add_argument("--bot", action="store_true", help="let the computer play, game after game, without saving its scores")
+    args = parser.parse_args()
+    bricker = Bricker(args.record, args.profile, args.fps, Bot() if args.bot else None)
     bricker.main()
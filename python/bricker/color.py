@@ -2,17 +2,41 @@
 Copyright (C) 2017-2020  John Hyland
 GNU GENERAL PUBLIC LICENSE Version 3"""
 
-from typing import Tuple
+from typing import Dict, Tuple
 
 
 class Color:
-    """Stores RGB color information."""
+    """Stores RGB color information.  An immutable value: equal colors hash alike, so any color can be
+    used as a dictionary key or looked up in the palette."""
+
+    __slots__ = ("__r", "__g", "__b")
+    __r: int
+    __g: int
+    __b: int
 
     def __init__(self, r: int, g: int, b: int) -> None:
         """Class constructor."""
-        self.__r = r
-        self.__g = g
-        self.__b = b
+        object.__setattr__(self, "_Color__r", r)
+        object.__setattr__(self, "_Color__g", g)
+        object.__setattr__(self, "_Color__b", b)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        """Colors are immutable."""
+        raise AttributeError("Color is immutable")
+
+    def __eq__(self, other: object) -> bool:
+        """Returns true if other is a color with the same RGB values."""
+        if not isinstance(other, Color):
+            return NotImplemented
+        return self.value == other.value
+
+    def __hash__(self) -> int:
+        """Returns hash of the RGB values."""
+        return hash((self.__r, self.__g, self.__b))
+
+    def __repr__(self) -> str:
+        """Returns the color as constructed."""
+        return f"Color({self.__r}, {self.__g}, {self.__b})"
 
     @property
     def r(self) -> int:
@@ -34,6 +58,11 @@ class Color:
         """Returns the RGB values as a Tuple, needed for pygame."""
         return self.__r, self.__g, self.__b
 
+    @property
+    def index(self) -> int:
+        """Returns the color's index in the palette.  Raises KeyError if it is not a palette color."""
+        return PALETTE_INDEX[self]
+
 
 class Colors:
     """Contains some static RGB color definitions."""
@@ -54,3 +83,10 @@ class Colors:
     ForestGreen = Color(54, 137, 38)
     TuftsBlue = Color(74, 125, 219)
     TestBack = Color(25, 0, 0)
+
+
+# every color by palette index, as stored in the game matrix, black (an empty space) first
+PALETTE: Tuple[Color, ...] = tuple(dict.fromkeys(value for value in vars(Colors).values() if isinstance(value, Color)))
+
+# palette index of each color
+PALETTE_INDEX: Dict[Color, int] = {color: index for index, color in enumerate(PALETTE)}
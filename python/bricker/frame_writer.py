@@ -0,0 +1,114 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Any, IO, Optional, Tuple
+import os
+import os.path
+import shlex
+import subprocess
+import pygame
+from pygame import Surface
+
+
+class FrameWriter:
+    """Base class for writing rendered frames out, rather than to a display.  Frames are scaled to
+    the output size if it differs from the rendered size.  Used in a with block, the writer is closed at its end."""
+
+    def __init__(self, size: Optional[Tuple[int, int]] = None) -> None:
+        """Class constructor.  Frames are written at their rendered size unless an output size is given."""
+        self.__size: Optional[Tuple[int, int]] = size
+        self.__scaled: Optional[Surface] = None
+        self.__count: int = 0
+
+    @property
+    def size(self) -> Optional[Tuple[int, int]]:
+        """Returns output width/height, none for the rendered size."""
+        return self.__size
+
+    @property
+    def count(self) -> int:
+        """Returns number of frames written."""
+        return self.__count
+
+    def write(self, frame: Surface) -> None:
+        """Writes a frame, scaling it to the output size first if needed."""
+        if (self.__size is not None) and (frame.get_size() != self.__size):
+            if self.__scaled is None:
+                self.__scaled = Surface(self.__size, 0, frame)
+            frame = pygame.transform.smoothscale(frame, self.__size, self.__scaled)
+        self._write(frame, self.__count)
+        self.__count += 1
+
+    def close(self) -> None:
+        """Finishes writing."""
+
+    def __enter__(self) -> 'FrameWriter':
+        """Returns the writer, for a with block."""
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Closes the writer at the end of a with block."""
+        self.close()
+
+    def _write(self, frame: Surface, frame_num: int) -> None:
+        """Writes one frame at output size.  Overridden by each writer."""
+        raise NotImplementedError()
+
+
+class PngWriter(FrameWriter):
+    """Writes each frame to a numbered PNG file in a directory, for snapshots and image sequences."""
+
+    def __init__(self, directory: str, size: Optional[Tuple[int, int]] = None, prefix: str = "frame_") -> None:
+        """Class constructor.  The directory is created if needed."""
+        super().__init__(size)
+        self.__directory: str = directory
+        self.__prefix: str = prefix
+        os.makedirs(directory, exist_ok=True)
+
+    def _write(self, frame: Surface, frame_num: int) -> None:
+        """Saves a frame as frame_000000.png, frame_000001.png, ..."""
+        pygame.image.save(frame, os.path.join(self.__directory, f"{self.__prefix}{frame_num:06d}.png"))
+
+
+class RawVideoWriter(FrameWriter):
+    """Writes frames as a raw RGB24 stream (width * height * 3 bytes per frame, no header), to a file
+    or the standard input of an encoder process.  For example, with pipe():
+        ffmpeg -f rawvideo -pix_fmt rgb24 -s {width}x{height} -r {fps} -i - clip.mp4"""
+
+    def __init__(self, stream: IO[bytes], size: Optional[Tuple[int, int]] = None, process: Optional[subprocess.Popen] = None,
+                 close_stream: bool = False) -> None:
+        """Class constructor.  If the stream is an encoder process's input, closing the writer waits for the process.
+        Otherwise the stream is left open, unless close_stream is set."""
+        super().__init__(size)
+        self.__stream: IO[bytes] = stream
+        self.__process: Optional[subprocess.Popen] = process
+        self.__close_stream: bool = close_stream or (process is not None)
+
+    @staticmethod
+    def pipe(command: str, size: Tuple[int, int], fps: int) -> 'RawVideoWriter':
+        """Starts an encoder command, {width}, {height} and {fps} filled in, and returns a writer feeding its standard input."""
+        args = [arg.format(width=size[0], height=size[1], fps=fps) for arg in shlex.split(command)]
+        process = subprocess.Popen(args, stdin=subprocess.PIPE)     # pylint: disable=consider-using-with
+        assert process.stdin is not None
+        return RawVideoWriter(process.stdin, size, process)
+
+    @staticmethod
+    def open(path: str, size: Optional[Tuple[int, int]] = None) -> 'RawVideoWriter':
+        """Returns a writer to a new raw video file.  The writer owns the file, closing it when closed."""
+        return RawVideoWriter(open(path, "wb"), size, close_stream=True)     # pylint: disable=consider-using-with
+
+    def _write(self, frame: Surface, frame_num: int) -> None:
+        """Writes a frame's pixels."""
+        self.__stream.write(pygame.image.tostring(frame, "RGB"))
+
+    def close(self) -> None:
+        """Flushes the stream, and for an encoder process, closes its input and waits for it to finish.
+        Raises an error if the encoder failed."""
+        self.__stream.flush()
+        if self.__close_stream:
+            self.__stream.close()
+        if self.__process is not None:
+            code = self.__process.wait()
+            if code != 0:
+                raise RuntimeError(f"Encoder exited with status {code}")
@@ -0,0 +1,233 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Iterable, List, Optional, Sequence
+from enum import IntEnum
+from matrix import Matrix
+from game_stats import GameStats
+from replay import Replay
+
+
+class Action(IntEnum):
+    """Actions accepted by the game engine."""
+    TICK = 0
+    LEFT = 1
+    RIGHT = 2
+    DOWN = 3
+    ROTATE = 4
+    DROP = 5
+    LEVEL_UP = 6        # debug keys
+    LEVEL_DOWN = 7
+
+
+class GameEngine:
+    """Headless game rules.  Advances game state from a stream of actions, with no display,
+    wall-clock time or animation.  Time is counted in ticks, sixty per second of game time."""
+
+    def __init__(self, matrix: Optional[Matrix] = None, stats: Optional[GameStats] = None,
+                 drop_intervals: Optional[Sequence[float]] = None, line_scores: Optional[Sequence[int]] = None) -> None:
+        """Class constructor.  Gravity intervals per level (seconds, from level 1) and points per number of lines
+        cleared at once (from 0 lines) can be given for tuning, otherwise the original game's are used."""
+        self.__matrix: Matrix = matrix if matrix is not None else Matrix()
+        self.__stats: GameStats = stats if stats is not None else GameStats([])
+        self.__ticks_per_second: int = 60
+        self.__level_drop_intervals: List[float] = list(drop_intervals) if drop_intervals is not None else self.default_drop_intervals()
+        self.__level_drop_ticks: List[int] = [max(1, round(x * self.__ticks_per_second)) for x in self.__level_drop_intervals]
+        self.__line_scores: List[int] = list(line_scores) if line_scores is not None else [0, 40, 100, 300, 1200]
+        if (len(self.__level_drop_intervals) == 0) or (len(self.__line_scores) != 5):
+            raise ValueError("Need at least one drop interval and five line scores (0 to 4 lines).")
+        self.__ticks: int = 0
+        self.__drop_ticks: int = 0
+        self.__game_over: bool = False
+        self.__replay: Optional[Replay] = None
+
+    @property
+    def matrix(self) -> Matrix:
+        """Returns game matrix."""
+        return self.__matrix
+
+    @property
+    def stats(self) -> GameStats:
+        """Returns game statistics."""
+        return self.__stats
+
+    @stats.setter
+    def stats(self, value: GameStats) -> None:
+        """Sets game statistics."""
+        self.__stats = value
+
+    @property
+    def ticks_per_second(self) -> int:
+        """Returns number of ticks per second of game time."""
+        return self.__ticks_per_second
+
+    @property
+    def ticks(self) -> int:
+        """Returns number of ticks since game start."""
+        return self.__ticks
+
+    @property
+    def seed(self) -> int:
+        """Returns the piece generator seed of the current game."""
+        return self.__matrix.generator.seed
+
+    @property
+    def game_over(self) -> bool:
+        """Returns true once a new brick could not be spawned."""
+        return self.__game_over
+
+    @property
+    def replay(self) -> Optional[Replay]:
+        """Returns the recording of the current game, if recording."""
+        return self.__replay
+
+    @property
+    def level_drop_intervals(self) -> List[float]:
+        """Returns gravity interval of each level, in seconds."""
+        return self.__level_drop_intervals
+
+    @property
+    def line_scores(self) -> List[int]:
+        """Returns points scored for clearing 0 to 4 lines at once."""
+        return self.__line_scores
+
+    def __level_drop_ticks_now(self) -> int:
+        """Returns gravity interval for current level, in ticks.  Levels past the last keep its speed."""
+        return self.__level_drop_ticks[min(self.__stats.level, len(self.__level_drop_ticks)) - 1]
+
+    @staticmethod
+    def default_drop_intervals() -> List[float]:
+        """Returns the original game's gravity intervals, ten levels each 20% faster than the last."""
+        intervals = []
+        interval = 2.0
+        for _ in range(0, 10):
+            interval *= 0.8
+            intervals.append(interval)
+        return intervals
+
+    def new_game(self, stats: Optional[GameStats] = None, seed: Optional[int] = None, record: bool = False) -> None:
+        """Resets state and starts a new game.  The piece sequence restarts, using the new seed if given.
+        All player actions are recorded to a replay if requested."""
+        self.__stats = stats if stats is not None else GameStats([])
+        self.__ticks = 0
+        self.__drop_ticks = 0
+        self.__game_over = False
+        self.__matrix.new_game(seed)
+        self.__replay = Replay(self.__matrix.generator.mode, self.__matrix.generator.seed, self.__matrix.kicks) if record else None
+
+    def step(self, action: Action) -> bool:
+        """Applies a single action, including any resulting brick hit.  Returns true on game over."""
+        if self.__game_over:
+            return True
+        hit = False
+        if action == Action.TICK:
+            hit = self.tick()
+        elif action == Action.LEFT:
+            self.move_brick_left()
+        elif action == Action.RIGHT:
+            self.move_brick_right()
+        elif action == Action.DOWN:
+            self.move_brick_down()
+        elif action == Action.ROTATE:
+            self.rotate_brick()
+        elif action == Action.DROP:
+            self.drop_brick_to_bottom()
+            hit = True
+        elif action == Action.LEVEL_UP:
+            self.change_level(1)
+        elif action == Action.LEVEL_DOWN:
+            self.change_level(-1)
+        if hit:
+            self.brick_hit()
+        return self.__game_over
+
+    def run(self, actions: Iterable[Action]) -> bool:
+        """Applies a stream of actions, stopping early on game over.  Returns true on game over."""
+        for action in actions:
+            if self.step(action):
+                break
+        return self.__game_over
+
+    def tick(self) -> bool:
+        """Advances game time by one tick, dropping the brick when due.  Returns true if brick hits bottom."""
+        self.__ticks += 1
+        self.__drop_ticks += 1
+        if self.__replay is not None:
+            self.__replay.end_tick = self.__ticks
+        if (self.__matrix.brick is not None) and (self.__drop_ticks >= self.__level_drop_ticks_now()):
+            return self.__move_down()
+        return False
+
+    def move_brick_left(self) -> None:
+        """Moves brick left."""
+        self.__record(Action.LEFT)
+        self.__matrix.move_brick_left()
+
+    def move_brick_right(self) -> None:
+        """Moves brick right."""
+        self.__record(Action.RIGHT)
+        self.__matrix.move_brick_right()
+
+    def move_brick_down(self) -> bool:
+        """Moves brick down, resets gravity.  Returns true if brick hits bottom.  The brick
+        is not locked here, it comes to rest on the next gravity drop like the original game."""
+        self.__record(Action.DOWN)
+        return self.__move_down()
+
+    def rotate_brick(self) -> None:
+        """Rotates brick."""
+        self.__record(Action.ROTATE)
+        self.__matrix.rotate_brick()
+
+    def drop_brick_to_bottom(self) -> None:
+        """Drops brick straight to bottom, at once.  The landing row comes from the matrix column tops."""
+        self.__record(Action.DROP)
+        self.__matrix.drop_brick()
+        self.__move_down()
+        self.__stats.increment_score(2)
+
+    def change_level(self, change: int) -> None:
+        """Moves the level up or down (debug keys), within the levels that have a drop interval.  Recorded, so replays follow."""
+        self.__record(Action.LEVEL_UP if change > 0 else Action.LEVEL_DOWN)
+        self.__stats.level = max(1, min(self.__stats.level + change, len(self.__level_drop_intervals)))
+
+    def __move_down(self) -> bool:
+        """Moves brick down, resets gravity.  Returns true if brick hits bottom."""
+        self.__drop_ticks = 0
+        hit = self.__matrix.move_brick_down()
+        if hit:
+            self.__stats.increment_score(1)
+        return hit
+
+    def __record(self, action: Action) -> None:
+        """Records a player action, if recording."""
+        if self.__replay is not None:
+            self.__replay.record(self.__ticks, action)
+
+    def brick_hit(self) -> bool:
+        """Executed when brick hits bottom and comes to rest.  Spawns new brick.  Returns true on new brick collision (game over)."""
+        rows_to_erase = self.lock_brick()
+        if len(rows_to_erase) > 0:
+            self.__matrix.erase_spaces(rows_to_erase)
+            self.drop_grid()
+        return self.spawn_brick()
+
+    def lock_brick(self) -> List[int]:
+        """Moves resting brick to matrix and scores any filled rows.  Returns list of rows to erase."""
+        self.__matrix.add_brick_to_matrix()
+        rows_to_erase = self.__matrix.identify_solid_rows()
+        if len(rows_to_erase) > 0:
+            self.__stats.add_lines(len(rows_to_erase))
+            self.__stats.increment_score(self.__line_scores[len(rows_to_erase)])
+        return rows_to_erase
+
+    def drop_grid(self) -> None:
+        """Drops hanging pieces to resting place."""
+        self.__matrix.compact_rows()
+
+    def spawn_brick(self) -> bool:
+        """Spawns next brick.  Returns true on collision (game over)."""
+        self.__drop_ticks = 0
+        self.__game_over = self.__matrix.spawn_brick()
+        return self.__game_over
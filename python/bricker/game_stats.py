@@ -2,23 +2,28 @@
 Copyright (C) 2017-2020  John Hyland
 GNU GENERAL PUBLIC LICENSE Version 3"""
 
-from typing import List
+from typing import List, Optional
 import sys
-import os.path
+from score_store import HighScore, ScoreStore, shared_store
 
 
 class GameStats:
     """Stores current score, high scores, and other game statistics."""
 
-    def __init__(self) -> None:
-        """Class constructor."""
-        self.__high_scores: List[HighScore] = self.__load_high_scores()
+    def __init__(self, high_scores: Optional[List[HighScore]] = None, store: Optional[ScoreStore] = None) -> None:
+        """Class constructor.  High scores come from the given store, or the shared store, unless a list is
+        given, in which case nothing is saved (headless and simulated games)."""
+        self.__store: Optional[ScoreStore] = None
+        if high_scores is None:
+            self.__store = store if store is not None else shared_store()
+            high_scores = self.__store.top(10)
+        self.__high_scores: List[HighScore] = high_scores
         self.__current_score: int = 0
         self.__lines: int = 0
         self.__level: int = 1
 
     @property
-    def high_scores(self) -> List['HighScore']:
+    def high_scores(self) -> List[HighScore]:
         """Returns list of high scores."""
         return self.__high_scores
 
@@ -42,31 +47,10 @@ class GameStats:
         """Sets the current level."""
         self.__level = value
 
-    def __load_high_scores(self) -> List['HighScore']:
-        """Load high scores from file."""
-        scores = []
-        if os.path.isfile("high_scores.txt"):
-            with open("high_scores.txt", "r") as f:
-                lines = f.readlines()
-            lines = [x.strip() for x in lines]
-            for line in lines:
-                split = line.split("\t")
-                if len(split) == 2:
-                    initials = split[0]
-                    score = int(split[1])
-                    scores.append(HighScore(initials, score))
-            scores = self.__sort_scores(scores)
-        return scores
-
-    def __save_high_scores(self, scores: List['HighScore']) -> None:
-        """Save high scores to file."""
-        scores = self.__sort_scores(scores)
-        with open("high_scores.txt", "w") as text_file:
-            for x in scores:
-                text_file.write(x.initials + "\t" + str(x.score) + "\n")
-
     def is_high_score(self) -> bool:
         """Returns true if score can be placed on board."""
+        if self.__store is not None:
+            return self.__store.rank(self.__current_score) <= 10
         if len(self.__high_scores) < 10:
             return True
         lowest = sys.maxsize
@@ -76,18 +60,14 @@ class GameStats:
         return self.__current_score > lowest
 
     def add_high_score(self, initials: str) -> None:
-        """Adds new score, sorts and limits to top 10, saves to disk."""
-        self.__high_scores.append(HighScore(initials, self.__current_score))
-        self.__high_scores = self.__sort_scores(self.__high_scores)
-        self.__save_high_scores(self.__high_scores)
-
-    @staticmethod
-    def __sort_scores(scores: List['HighScore']) -> List['HighScore']:
-        """Sorts scores and returns new list.  Truncates to top ten."""
-        scores.sort(key=lambda x: x.score, reverse=True)
-        while len(scores) > 10:
-            del scores[-1]
-        return scores
+        """Adds new score to the store (or list, without one), refreshes the top 10."""
+        if self.__store is not None:
+            self.__store.add(initials, self.__current_score)
+            self.__high_scores = self.__store.top(10)
+        else:
+            self.__high_scores.append(HighScore(initials, self.__current_score))
+            self.__high_scores.sort(key=lambda x: x.score, reverse=True)
+            del self.__high_scores[10:]
 
     def add_lines(self, count: int) -> None:
         """Increments cleared lines, sets level."""
@@ -97,22 +77,3 @@ class GameStats:
     def increment_score(self, value: int) -> None:
         """Increments current score by specified value."""
         self.__current_score += value
-
-
-class HighScore:
-    """Stores a single high score."""
-
-    def __init__(self, initials: str, score: int) -> None:
-        """Class constructor."""
-        self.__initials: str = initials
-        self.__score: int = score
-
-    @property
-    def initials(self) -> str:
-        """Returns gamer's initials."""
-        return self.__initials
-
-    @property
-    def score(self) -> int:
-        """Returns high-score value."""
-        return self.__score
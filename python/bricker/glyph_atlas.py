@@ -0,0 +1,121 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Dict, FrozenSet, List, Tuple
+import pygame
+from pygame import Surface, Rect
+from pygame.font import Font
+from color import Color
+
+
+class GlyphAtlas:
+    """Text drawn from pre-rendered glyphs, for one font size and color.  Each glyph is rasterised once,
+    into a single atlas surface, and strings are laid out from glyph advances and pair kerning measured
+    with the font, then drawn with one batched Surface.blits() call.  Digits and commas (formatted numbers)
+    are loaded up front, with all their kerning pairs, so numbers take a fast path with no font calls.
+    Other characters are added as first used."""
+
+    DIGITS = "0123456789,"
+
+    def __init__(self, font: Font, color: Color) -> None:
+        """Class constructor."""
+        self.__font: Font = font
+        self.__color: Color = color
+        self.__height: int = font.size(self.DIGITS)[1]
+        self.__surface: Surface = self.__create_surface((256, self.__height))
+        self.__next_x: int = 0
+        self.__glyphs: Dict[str, Tuple[Rect, int, int]] = {}     # atlas area, offset from pen position
+        self.__advances: Dict[str, int] = {}
+        self.__kerning: Dict[str, int] = {}
+        self.__add_glyphs(self.DIGITS)
+        for first in self.DIGITS:
+            for second in self.DIGITS:
+                self.__add_kerning(first + second)
+        self.__digits: FrozenSet[str] = frozenset(self.DIGITS)
+
+    @property
+    def height(self) -> int:
+        """Returns line height, in pixels."""
+        return self.__height
+
+    @property
+    def surface(self) -> Surface:
+        """Returns the atlas surface, source of all glyphs."""
+        return self.__surface
+
+    def size(self, text: str) -> Tuple[int, int]:
+        """Returns width/height of text as drawn."""
+        positions = self.__layout(text)
+        if len(positions) == 0:
+            return 0, self.__height
+        last_x, last_char = positions[-1]
+        return last_x + self.__advances[last_char], self.__height
+
+    def render(self, text: str) -> Surface:
+        """Returns a new surface with the text drawn on a transparent background, like Font.render()."""
+        surface = self.__create_surface(self.size(text))
+        self.draw(surface, text, (0, 0))
+        return surface
+
+    def draw(self, surface: Surface, text: str, position: Tuple[int, int]) -> None:
+        """Draws text onto a surface, top-left at position.  Laid out first, as new glyphs can grow the atlas surface."""
+        x, y = position
+        positions = self.__layout(text)
+        atlas = self.__surface
+        glyphs = self.__glyphs
+        blits = []
+        for glyph_x, char in positions:
+            area, offset_x, offset_y = glyphs[char]
+            blits.append((atlas, (x + glyph_x + offset_x, y + offset_y), area))
+        surface.blits(blits, False)
+
+    def __layout(self, text: str) -> List[Tuple[int, str]]:
+        """Returns the X offset of each character.  Loads any glyphs and kerning pairs not seen before,
+        unless the text is all digits and commas."""
+        if not self.__digits.issuperset(text):
+            self.__add_glyphs(text)
+            for i in range(1, len(text)):
+                if text[i - 1:i + 1] not in self.__kerning:
+                    self.__add_kerning(text[i - 1:i + 1])
+        advances = self.__advances
+        kerning = self.__kerning
+        positions = []
+        x = 0
+        previous = ""
+        for char in text:
+            if previous:
+                x += advances[previous] + kerning[previous + char]
+            positions.append((x, char))
+            previous = char
+        return positions
+
+    def __add_glyphs(self, text: str) -> None:
+        """Rasterises any characters of text not yet in the atlas.  Only the inked part of each glyph is kept
+        (at its own height in the atlas), so no time is spent blitting transparent pixels.  The atlas surface
+        doubles in width when full."""
+        for char in text:
+            if char in self.__glyphs:
+                continue
+            glyph = self.__font.render(char, True, self.__color.value)
+            bounds = glyph.get_bounding_rect()
+            if self.__next_x + bounds.width > self.__surface.get_width():
+                surface = self.__create_surface((max(self.__surface.get_width() * 2, self.__next_x + bounds.width), self.__height))
+                surface.blit(self.__surface, (0, 0), special_flags=pygame.BLEND_RGBA_MAX)
+                self.__surface = surface
+            self.__surface.blit(glyph, (self.__next_x, bounds.y), bounds, special_flags=pygame.BLEND_RGBA_MAX)
+            self.__glyphs[char] = (Rect(self.__next_x, bounds.y, bounds.width, bounds.height), bounds.x, bounds.y)
+            self.__advances[char] = self.__font.size(char)[0]
+            self.__next_x += bounds.width
+
+    def __add_kerning(self, pair: str) -> None:
+        """Measures the kerning between a pair of characters, as the font lays them out."""
+        self.__kerning[pair] = self.__font.size(pair)[0] - self.__advances[pair[0]] - self.__advances[pair[1]]
+
+    @staticmethod
+    def __create_surface(size: Tuple[int, int]) -> Surface:
+        """Returns a new transparent surface.  Glyphs are copied in with BLEND_RGBA_MAX, so their pixels land unblended."""
+        surface = Surface(size, pygame.SRCALPHA, 32)
+        surface = surface.convert_alpha(surface)
+        surface.fill((0, 0, 0, 0))
+        return surface
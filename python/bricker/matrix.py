@@ -2,27 +2,99 @@
 Copyright (C) 2017-2020  John Hyland
 GNU GENERAL PUBLIC LICENSE Version 3"""
 
-from typing import List, Optional
-from random import randint
-from brick import Brick
-from color import Color
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+from brick import Brick, BrickState, KICKS
+from color import Color, PALETTE
+from piece_generator import GeneratorState, PieceGenerator, UniformGenerator
+
+
+class MatrixState(NamedTuple):
+    """A saved game matrix: resting spaces, bricks and place in the piece sequence.  Immutable, a few hundred
+    bytes of its own whatever the game's length, and shares nothing mutable with the matrix it came from."""
+    rows: Tuple[int, ...]           # row bitmasks, top to bottom
+    colors: bytes                   # palette indices, row by row
+    brick: Optional[BrickState]     # live brick, if any
+    next_shape_num: int             # next brick's shape, 0 if none
+    generator: GeneratorState       # place in the piece sequence
+
+
+# matrix size, 10x20 visible slots plus a border all round for collision detection
+MATRIX_WIDTH: int = 12
+MATRIX_HEIGHT: int = 22
+
+
+def full_row_mask(width: int) -> int:
+    """Returns the bitmask of a solid row, as the floor and ceiling rows and a filled line are."""
+    return (1 << width) - 1
+
+
+def empty_row_mask(width: int) -> int:
+    """Returns the bitmask of an empty row, solid only in the border columns."""
+    return 1 | (1 << (width - 1))
+
+
+def column_tops(rows: Sequence[int], width: int) -> List[int]:
+    """Returns the top solid row of each column, the floor row if empty.  Border columns are solid to the top.
+    Rows are scanned top down, only until every column has been seen."""
+    floor = len(rows) - 1
+    tops = [0] + [floor] * (width - 2) + [0]
+    unseen = full_row_mask(width) ^ empty_row_mask(width)
+    for y in range(1, floor):
+        found = rows[y] & unseen
+        while found:
+            bit = found & -found
+            tops[bit.bit_length() - 1] = y
+            found ^= bit
+        unseen &= ~rows[y]
+        if not unseen:
+            break
+    return tops
+
+
+def settled_rows(rows: Sequence[int], width: int) -> List[int]:
+    """Returns the inner rows that are not empty, top to bottom.  Once hanging pieces drop, these rows rest
+    in this order at the bottom of the matrix, and the rest are empty."""
+    empty_row = empty_row_mask(width)
+    return [y for y in range(1, len(rows) - 1) if rows[y] != empty_row]
+
+
+def clear_rows(rows: Sequence[int], width: int) -> Tuple[Tuple[int, ...], int]:
+    """Returns the rows after erasing filled rows and dropping hanging pieces, as the game does (erase_spaces()
+    then compact_rows()), and the number of rows erased."""
+    full_row = full_row_mask(width)
+    empty_row = empty_row_mask(width)
+    bottom = len(rows) - 1
+    erased = [full_row] + [empty_row if row == full_row else row for row in rows[1:bottom]] + [full_row]
+    kept = [erased[y] for y in settled_rows(erased, width)]
+    lines = sum(1 for row in rows[1:bottom] if row == full_row)
+    return tuple([full_row] + [empty_row] * ((bottom - 1) - len(kept)) + kept + [full_row]), lines
 
 
 class Matrix:
-    """Stores the 10x20 game matrix.  Contains matrix-related game logic."""
+    """Stores the 10x20 game matrix.  Contains matrix-related game logic.
+    Each row is stored as an integer bitmask, with bit X set when column X is solid.
+    Colors are stored alongside, one bytearray per row of palette indices, 0 (black) when empty.
+    The top solid row of each column is kept up to date, so a brick's landing row is found without stepping it down."""
 
-    def __init__(self) -> None:
-        """Class constructor."""
-        self.__width: int = 12     # 10 visible slots, plus border for collision detection
-        self.__height: int = 22    # 20 visible slots, plus border for collision detection
-        self.__matrix: List[List[int]] = [[0 for x in range(self.__height)] for y in range(self.__width)]
-        self.__color: List[List[Color]] = [[Color(0, 0, 0) for x in range(self.__height)] for y in range(self.__width)]
-        for x in range(0, 12):
-            self.__matrix[x][0] = 1
-            self.__matrix[x][21] = 1
-        for y in range(0, 22):
-            self.__matrix[0][y] = 1
-            self.__matrix[11][y] = 1
+    def __init__(self, generator: Optional[PieceGenerator] = None, kicks: str = "legacy") -> None:
+        """Class constructor.  Bricks are drawn from the given piece generator, or a randomly seeded uniform one,
+        and rotate with the named kick table."""
+        self.__width: int = MATRIX_WIDTH
+        self.__height: int = MATRIX_HEIGHT
+        self.__full_row: int = full_row_mask(self.__width)
+        self.__empty_row: int = empty_row_mask(self.__width)
+        self.__rows: List[int] = []
+        self.__colors: List[bytearray] = []
+        self.__tops: List[int] = []
+        self.__version: int = 0
+        self.__lock_rows: Optional[range] = None
+        self.__reset_rows()
+        self.__matrix: MatrixView = MatrixView(self.__rows, self.__width)
+        self.__color: ColorView = ColorView(self.__colors, self.__width)
+        self.__generator: PieceGenerator = generator if generator is not None else UniformGenerator()
+        self.__kicks: str = kicks
+        if kicks not in KICKS:
+            raise ValueError(f"Unknown kick table '{kicks}'")
         self.__brick: Optional[Brick] = None
         self.__next_brick: Optional[Brick] = None
 
@@ -37,15 +109,40 @@ class Matrix:
         return self.__height
 
     @property
-    def matrix(self) -> List[List[int]]:
-        """Returns game matrix."""
+    def rows(self) -> List[int]:
+        """Returns row bitmasks, top to bottom, including border rows."""
+        return self.__rows
+
+    @property
+    def colors(self) -> List[bytearray]:
+        """Returns row-major color matrix, [y][x], as palette indices."""
+        return self.__colors
+
+    @property
+    def version(self) -> int:
+        """Returns a counter that changes whenever resting spaces change (not the live brick)."""
+        return self.__version
+
+    @property
+    def matrix(self) -> 'MatrixView':
+        """Returns game matrix, as a read-only column-major [x][y] view over the row bitmasks."""
         return self.__matrix
 
     @property
-    def color(self) -> List[List[Color]]:
-        """Returns color matrix."""
+    def color(self) -> 'ColorView':
+        """Returns color matrix, as a column-major [x][y] view of Color values."""
         return self.__color
 
+    @property
+    def generator(self) -> PieceGenerator:
+        """Returns the piece generator."""
+        return self.__generator
+
+    @property
+    def kicks(self) -> str:
+        """Returns name of the kick table bricks rotate with."""
+        return self.__kicks
+
     @property
     def brick(self) -> Optional[Brick]:
         """Returns current live brick."""
@@ -56,71 +153,238 @@ class Matrix:
         """Returns next brick."""
         return self.__next_brick
 
-    def new_game(self) -> None:
-        """Resets the game."""
+    def __reset_rows(self) -> None:
+        """Clears the matrix back to an empty, bordered state.  Lists are modified in place so views stay valid."""
+        self.__rows[:] = [self.__empty_row for y in range(self.__height)]
+        self.__rows[0] = self.__full_row
+        self.__rows[self.__height - 1] = self.__full_row
+        self.__colors[:] = [bytearray(self.__width) for y in range(self.__height)]
+        self.__tops[:] = [0] + [self.__height - 1] * (self.__width - 2) + [0]
+        self.__lock_rows = None
+        self.__version += 1
+
+    def new_game(self, seed: Optional[int] = None) -> None:
+        """Resets the game.  The piece sequence restarts, using the new seed if given."""
         self.__brick = None
         self.__next_brick = None
-        self.__matrix = [[0 for x in range(self.__height)] for y in range(self.__width)]
-        self.__color = [[Color(0, 0, 0) for x in range(self.__height)] for y in range(self.__width)]
-        for x in range(0, 12):
-            self.__matrix[x][0] = 1
-            self.__matrix[x][21] = 1
-        for y in range(0, 22):
-            self.__matrix[0][y] = 1
-            self.__matrix[11][y] = 1
+        self.__reset_rows()
+        self.__generator.reset(seed)
         self.spawn_brick()
 
+    def restore(self, state: MatrixState) -> None:
+        """Puts the matrix back to a state saved by snapshot_matrix().  Rows are overwritten in place so views stay valid.
+        New brick objects are created, so anything tracking the live brick sees it change."""
+        width = self.__width
+        self.__rows[:] = state.rows
+        for y, color_row in enumerate(self.__colors):
+            color_row[:] = state.colors[y * width:(y + 1) * width]
+        self.__update_tops()
+        self.__lock_rows = None
+        self.__version += 1
+        self.__brick = None
+        if state.brick is not None:
+            self.__brick = Brick(state.brick.shape_num, self.__kicks)
+            self.__brick.restore(state.brick)
+        self.__next_brick = Brick(state.next_shape_num, self.__kicks) if state.next_shape_num > 0 else None
+        self.__generator.restore(state.generator)
+
     def spawn_brick(self) -> bool:
-        """Spawns a random new brick.  Returns true on collision (game over)."""
+        """Spawns the next brick from the generator.  Returns true on collision (game over)."""
         if self.__next_brick is None:
-            shape_num = randint(1, 7)
-            self.__next_brick = Brick(shape_num)
+            self.__next_brick = Brick(self.__generator.next_shape(), self.__kicks)
         self.__brick = self.__next_brick
-        shape_num = randint(1, 7)
-        self.__next_brick = Brick(shape_num)
-        collision = self.__brick.collision(self.__matrix)
+        self.__next_brick = Brick(self.__generator.next_shape(), self.__kicks)
+        collision = self.__brick.collision(self.__rows)
         return collision
 
     def add_brick_to_matrix(self) -> None:
         """Moves resting brick to matrix."""
         if self.__brick is not None:
-            for x in range(0, self.__brick.width):
-                for y in range(0, self.__brick.height):
-                    if self.__brick.grid[x][y] == 1:
-                        self.__matrix[x + self.__brick.x][y + self.__brick.y] = 1
-                        self.__color[x + self.__brick.x][y + self.__brick.y] = self.__brick.color
+            brick = self.__brick
+            rotation = brick.rotation_data
+            for y, mask in enumerate(rotation.masks):
+                if mask:
+                    self.__rows[y + brick.y] |= (mask << brick.x) if brick.x >= 0 else (mask >> -brick.x)
+            color = brick.color.index
+            tops = self.__tops
+            for x, y in rotation.cells:
+                self.__colors[y + brick.y][x + brick.x] = color
+                tops[x + brick.x] = min(tops[x + brick.x], max(1, y + brick.y))
+            self.__lock_rows = range(max(1, brick.y + rotation.top_space), min(self.__height - 1, brick.y + brick.height - rotation.bottom_space))
+            self.__version += 1
         self.__brick = None
 
     def move_brick_left(self) -> None:
         """Moves brick to the left."""
         if self.__brick is not None:
-            self.__brick.move_left(self.__matrix)
+            self.__brick.move_left(self.__rows)
 
     def move_brick_right(self) -> None:
         """ Moves brick to the right. """
         if self.__brick is not None:
-            self.__brick.move_right(self.__matrix)
+            self.__brick.move_right(self.__rows)
 
     def move_brick_down(self) -> bool:
         """Moves brick down.  Returns true if brick hits bottom."""
         hit = False
         if self.__brick is not None:
-            hit = self.__brick.move_down(self.__matrix)
+            hit = self.__brick.move_down(self.__rows)
         return hit
 
-    def rotate_brick(self) -> None:
-        """Rotates brick."""
-        if self.__brick is not None:
-            self.__brick.rotate(self.__matrix)
+    def rotate_brick(self) -> bool:
+        """Rotates brick.  Returns true if rotated, false if it did not fit."""
+        if self.__brick is None:
+            return False
+        return self.__brick.rotate(self.__rows)
+
+    def drop_brick(self) -> int:
+        """Moves brick straight down to where it comes to rest.  Returns number of rows dropped."""
+        if self.__brick is None:
+            return 0
+        return self.__brick.drop(self.__rows, self.__tops)
+
+    def landing_y(self) -> int:
+        """Returns the Y the brick would come to rest at if dropped, for a ghost-piece preview."""
+        if self.__brick is None:
+            return 0
+        return self.__brick.landing(self.__rows, self.__tops, self.__brick.x, self.__brick.y)
+
+    def is_brick_resting(self) -> bool:
+        """Returns true if brick cannot move any further down."""
+        if self.__brick is None:
+            return False
+        return self.__brick.collision_at(self.__rows, self.__brick.x, self.__brick.y + 1)
 
     def identify_solid_rows(self) -> List[int]:
-        """Checks matrix for solid rows, returns list of solid rows to erase."""
-        rows_to_erase = []
-        for y in range(1, 21):
-            solid = True
-            for x in range(1, 11):
-                if self.__matrix[x][y] != 1:
-                    solid = False
-            if solid:
-                rows_to_erase.append(y)
-        return rows_to_erase
+        """Checks matrix for solid rows, returns list of solid rows to erase.  Only a row the last locked brick
+        landed in can have become solid, so just those rows are checked until the rows move."""
+        full_row = self.__full_row
+        rows = self.__lock_rows if self.__lock_rows is not None else range(1, self.__height - 1)
+        return [y for y in rows if self.__rows[y] == full_row]
+
+    def erase_spaces(self, rows: List[int], x_from: int = 1, x_to: int = 10) -> None:
+        """Erases spaces within specified rows, between the two columns (inclusive)."""
+        mask = ((1 << (x_to + 1)) - 1) ^ ((1 << x_from) - 1)
+        blank = bytes((x_to + 1) - x_from)
+        for y in rows:
+            self.__rows[y] &= ~mask
+            self.__colors[y][x_from:x_to + 1] = blank
+        self.__update_tops()
+        self.__version += 1
+
+    def compact_rows(self) -> int:
+        """Drops hanging pieces to their resting place in a single pass.  Rows that are not empty keep their
+        order and settle at the bottom, empty rows move to the top.  Row objects are reordered, no spaces
+        are copied.  Returns number of rows the top of the stack dropped by."""
+        empty_row = self.__empty_row
+        bottom = self.__height - 1
+        rows = self.__rows
+        kept = settled_rows(rows, self.__width)
+        if len(kept) == 0:
+            return 0
+        top = kept[0]
+        dropped = (bottom - top) - len(kept)
+        if dropped == 0:
+            return 0
+        colors = self.__colors
+        colors[top:bottom] = [colors[y] for y in range(top, bottom) if rows[y] == empty_row] + [colors[y] for y in kept]
+        rows[top:bottom] = [empty_row] * dropped + [rows[y] for y in kept]
+        self.__update_tops()
+        self.__lock_rows = None
+        self.__version += 1
+        return dropped
+
+    def __update_tops(self) -> None:
+        """Finds the top solid row of each column again, after rows are erased or moved."""
+        self.__tops[:] = column_tops(self.__rows, self.__width)
+
+
+def snapshot_matrix(matrix: Matrix) -> MatrixState:
+    """Returns a matrix's state, to restore later (undo, look-ahead, replay seeking)."""
+    brick = matrix.brick
+    next_brick = matrix.next_brick
+    return MatrixState(
+        rows=tuple(matrix.rows),
+        colors=b"".join(matrix.colors),
+        brick=brick.snapshot() if brick is not None else None,
+        next_shape_num=next_brick.shape_num if next_brick is not None else 0,
+        generator=matrix.generator.snapshot())
+
+
+def clone_matrix(matrix: Matrix) -> Matrix:
+    """Returns an independent copy of a matrix, with its own piece generator at the same point in the sequence."""
+    clone = Matrix(matrix.generator.clone(), matrix.kicks)
+    clone.restore(snapshot_matrix(matrix))
+    return clone
+
+
+class MatrixView:
+    """Column-major, list-of-lists compatible view over the matrix row bitmasks.
+    Allows matrix[x][y] style reads for older code.  Read-only, changes go through the matrix."""
+
+    def __init__(self, rows: List[int], width: int) -> None:
+        """Class constructor."""
+        self.__columns: List[MatrixColumn] = [MatrixColumn(rows, x) for x in range(width)]
+
+    def __len__(self) -> int:
+        """Returns number of columns."""
+        return len(self.__columns)
+
+    def __getitem__(self, x: int) -> 'MatrixColumn':
+        """Returns a single column."""
+        return self.__columns[x]
+
+
+class MatrixColumn:
+    """A single column of the matrix view."""
+
+    def __init__(self, rows: List[int], x: int) -> None:
+        """Class constructor."""
+        self.__rows: List[int] = rows
+        self.__x: int = x
+
+    def __len__(self) -> int:
+        """Returns number of rows."""
+        return len(self.__rows)
+
+    def __getitem__(self, y: int) -> int:
+        """Returns 1 if space is solid, otherwise 0."""
+        return (self.__rows[y] >> self.__x) & 1
+
+
+class ColorView:
+    """Column-major, list-of-lists compatible view over the row-major color matrix.  Reads and
+    writes Color values, translated to and from palette indices."""
+
+    def __init__(self, colors: List[bytearray], width: int) -> None:
+        """Class constructor."""
+        self.__columns: List[ColorColumn] = [ColorColumn(colors, x) for x in range(width)]
+
+    def __len__(self) -> int:
+        """Returns number of columns."""
+        return len(self.__columns)
+
+    def __getitem__(self, x: int) -> 'ColorColumn':
+        """Returns a single column."""
+        return self.__columns[x]
+
+
+class ColorColumn:
+    """A single column of the color view."""
+
+    def __init__(self, colors: List[bytearray], x: int) -> None:
+        """Class constructor."""
+        self.__colors: List[bytearray] = colors
+        self.__x: int = x
+
+    def __len__(self) -> int:
+        """Returns number of rows."""
+        return len(self.__colors)
+
+    def __getitem__(self, y: int) -> Color:
+        """Returns color of space."""
+        return PALETTE[self.__colors[y][self.__x]]
+
+    def __setitem__(self, y: int, value: Color) -> None:
+        """Sets color of space."""
+        self.__colors[y][self.__x] = value.index
@@ -0,0 +1,152 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Any, Dict, List, Tuple
+from array import array
+from math import cos, sin, pi
+from random import Random
+from color import Color
+try:
+    import numpy as np
+except ImportError:     # optional, install with the "sim" extra
+    np = None           # type: ignore
+
+
+class ParticleSystem:
+    """Batched particle effects (game over explosion, line clear bursts).  Positions, velocities,
+    accelerations and tile styles are kept in parallel columns, one slot per particle, and advanced
+    together each tick with exact constant-acceleration motion.  Particles leaving the screen are
+    culled in the same pass, each hole filled by moving the last particle into it, so nothing is
+    reallocated.  With NumPy the columns are one array, updated in place over all particles at once,
+    otherwise they are plain arrays updated one particle at a time.  No drawing here, the renderer
+    blits a tile per particle by style."""
+
+    def __init__(self, screen_size: Tuple[int, int], rng: Random, margin: int = 35) -> None:
+        """Class constructor.  Particles are culled once margin pixels or more outside the screen."""
+        self.__screen_size: Tuple[int, int] = screen_size
+        self.__random: Random = rng
+        self.__margin: int = margin
+        self.__styles: List[Tuple[Color, bool]] = []
+        self.__style_nums: Dict[Tuple[Color, bool], int] = {}
+        self.__count: int = 0
+        self.__motion: Any = np.zeros((6, 256)) if np is not None else [array('d') for _ in range(6)]     # x, y, vx, vy, ax, ay
+        self.__style: Any = np.zeros(256, np.uint16) if np is not None else array('H')
+        self.__lead: float = 0.0
+
+    def __len__(self) -> int:
+        """Returns number of live particles."""
+        return self.__count
+
+    @property
+    def styles(self) -> List[Tuple[Color, bool]]:
+        """Returns (color, large) of each style number in use."""
+        return self.__styles
+
+    def clear(self) -> None:
+        """Removes all particles."""
+        self.__count = 0
+        if np is None:
+            for values in self.__motion:
+                del values[:]
+            del self.__style[:]
+
+    def emit(self, x: float, y: float, vx: float, vy: float, color: Color, ax: float = 0.0, ay: float = 0.0, large: bool = False) -> None:
+        """Adds a particle.  Position in pixels, velocity in pixels per second, acceleration in pixels per second squared.
+        Large particles are drawn as outlined matrix spaces, others as small sparks."""
+        key = (color, large)
+        style = self.__style_nums.get(key)
+        if style is None:
+            style = len(self.__styles)
+            self.__styles.append(key)
+            self.__style_nums[key] = style
+        count = self.__count
+        if np is None:
+            for values, value in zip(self.__motion, (x, y, vx, vy, ax, ay)):
+                values.append(value)
+            self.__style.append(style)
+        else:
+            if count == len(self.__style):
+                self.__motion = np.concatenate((self.__motion, np.zeros_like(self.__motion)), axis=1)
+                self.__style = np.concatenate((self.__style, np.zeros_like(self.__style)))
+            self.__motion[:, count] = (x, y, vx, vy, ax, ay)
+            self.__style[count] = style
+        self.__count = count + 1
+
+    def burst(self, x: float, y: float, color: Color, count: int, speed: float, gravity: float = 900.0) -> None:
+        """Adds count sparks flying out from a point in random directions, up to speed pixels per second, falling under gravity."""
+        rng = self.__random
+        for _ in range(0, count):
+            angle = rng.random() * 2.0 * pi
+            velocity = speed * (0.25 + (0.75 * rng.random()))
+            self.emit(x, y, velocity * cos(angle), velocity * sin(angle), color, 0.0, gravity)
+
+    def update(self, seconds: float) -> int:
+        """Advances all particles by the given time and culls those off screen.  Returns number of live particles."""
+        if self.__count > 0:
+            if np is None:
+                self.__update_columns(seconds)
+            else:
+                self.__update_arrays(seconds)
+        return self.__count
+
+    def __update_arrays(self, seconds: float) -> None:
+        """Advances and culls particles with NumPy, in place.  Surviving particles past the new end fill the holes."""
+        count = self.__count
+        motion = self.__motion[:, :count]
+        motion[0:2] += motion[2:4] * seconds
+        motion[0:2] += motion[4:6] * (0.5 * seconds * seconds)
+        motion[2:4] += motion[4:6] * seconds
+        right, bottom = self.__screen_size
+        x, y = motion[0], motion[1]
+        keep = (x > -self.__margin) & (x < right) & (y > -self.__margin) & (y < bottom)
+        live = int(np.count_nonzero(keep))
+        if live < count:
+            holes = np.flatnonzero(~keep[:live])
+            movers = np.flatnonzero(keep[live:]) + live
+            motion[:, holes] = motion[:, movers]
+            self.__style[holes] = self.__style[movers]
+            self.__count = live
+
+    def __update_columns(self, seconds: float) -> None:
+        """Advances and culls particles one at a time, in place.  The last particle is moved into each hole."""
+        half_squared = 0.5 * seconds * seconds
+        left = top = -self.__margin
+        right, bottom = self.__screen_size
+        xs, ys, vxs, vys, axs, ays = columns = self.__motion
+        styles = self.__style
+        count = self.__count
+        i = 0
+        while i < count:
+            vx, vy, ax, ay = vxs[i], vys[i], axs[i], ays[i]
+            x = xs[i] + (vx * seconds) + (ax * half_squared)
+            y = ys[i] + (vy * seconds) + (ay * half_squared)
+            if (left < x < right) and (top < y < bottom):
+                xs[i] = x
+                ys[i] = y
+                vxs[i] = vx + (ax * seconds)
+                vys[i] = vy + (ay * seconds)
+                i += 1
+                continue
+            count -= 1
+            for values in columns:
+                values[i] = values[count]
+                values.pop()
+            styles[i] = styles[count]
+            styles.pop()
+        self.__count = count
+
+    def interpolate(self, seconds: float) -> None:
+        """Sets how far past the last update particles are drawn, for drawing between ticks."""
+        self.__lead = seconds
+
+    def positions(self) -> List[Tuple[int, int, int]]:
+        """Returns the (x, y, style number) of every particle, as drawn."""
+        lead = self.__lead
+        half_squared = 0.5 * lead * lead
+        if np is not None:
+            motion = self.__motion[:, :self.__count]
+            drawn = (motion[0:2] + (motion[2:4] * lead) + (motion[4:6] * half_squared)).astype(np.int64)
+            return list(zip(drawn[0].tolist(), drawn[1].tolist(), self.__style[:self.__count].tolist()))
+        return [(int(x + (vx * lead) + (ax * half_squared)), int(y + (vy * lead) + (ay * half_squared)), style)
+                for x, y, vx, vy, ax, ay, style in zip(*self.__motion, self.__style)]
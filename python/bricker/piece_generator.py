@@ -0,0 +1,246 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Type
+from array import array
+from random import Random, SystemRandom
+
+
+def random_seed() -> int:
+    """Returns a fresh 32-bit seed from the system entropy source."""
+    return SystemRandom().getrandbits(32)
+
+
+class GeneratorState(NamedTuple):
+    """A saved point in a piece sequence: the last block of shapes generated, how far into it the sequence is,
+    and the random state once the block was generated.  Immutable, and snapshots taken within one block share
+    the block and random state, so taking one copies nothing."""
+    mode: str                       # generator mode
+    seed: int                       # seed the sequence was started with
+    drawn: int                      # shapes drawn since the sequence started
+    random: Tuple[Any, ...]         # random number generator state, after the block was generated
+    block: bytes                    # last block of shapes generated
+    position: int                   # shapes of the block already drawn
+    extra: Tuple[int, ...]          # randomizer state, if any, after the block was generated
+
+
+class PieceGenerator:
+    """Base class for seedable brick sequence generators.  Produces shape numbers 1-7.
+    Shapes are generated in blocks into an internal buffer, so single draws and bulk
+    draws always return the same sequence for the same seed.  The random state only moves
+    when a block is generated, so it is saved then, ready for any snapshot."""
+
+    mode: str = ""
+
+    def __init__(self, seed: Optional[int] = None, block_size: int = 256) -> None:
+        """Class constructor.  A random seed is chosen if none is given."""
+        self.__seed: int = seed if seed is not None else random_seed()
+        self.__block_size: int = block_size
+        self.__buffer: bytes = b""
+        self.__position: int = 0
+        self.__drawn: int = 0
+        self._random: Random = Random(self.__seed)
+        self.__random_state: Tuple[Any, ...] = self._random.getstate()
+        self.__extra: Tuple[int, ...] = self._get_state()
+
+    @property
+    def seed(self) -> int:
+        """Returns the seed the current sequence was started with."""
+        return self.__seed
+
+    @property
+    def drawn(self) -> int:
+        """Returns number of shapes drawn since the sequence started."""
+        return self.__drawn
+
+    def reset(self, seed: Optional[int] = None) -> None:
+        """Restarts the sequence, with a new seed if given, otherwise the current one."""
+        if seed is not None:
+            self.__seed = seed
+        self.__buffer = b""
+        self.__position = 0
+        self.__drawn = 0
+        self._random = Random(self.__seed)
+        self._reset_state()
+        self.__save_state()
+
+    def seek(self, seed: int, drawn: int) -> None:
+        """Moves to the point in a sequence where drawn shapes have been drawn.  Seeking backwards, or to another
+        seed, restarts the sequence and regenerates it up to that point, a block at a time."""
+        if (seed != self.__seed) or (drawn < self.__drawn):
+            self.reset(seed)
+        remaining = drawn - self.__drawn
+        filled = False
+        while remaining > 0:
+            if self.__position >= len(self.__buffer):
+                self.__buffer = bytes(self._fill(self.__block_size))
+                self.__position = 0
+                filled = True
+            skip = min(remaining, len(self.__buffer) - self.__position)
+            self.__position += skip
+            remaining -= skip
+        self.__drawn = drawn
+        if filled:
+            self.__save_state()
+
+    def snapshot(self) -> GeneratorState:
+        """Returns the generator's place in its sequence, to restore later without regenerating anything."""
+        return GeneratorState(
+            mode=self.mode,
+            seed=self.__seed,
+            drawn=self.__drawn,
+            random=self.__random_state,
+            block=self.__buffer,
+            position=self.__position,
+            extra=self.__extra)
+
+    def restore(self, state: GeneratorState) -> None:
+        """Puts the generator back to a saved place in a sequence, in constant time."""
+        if state.mode != self.mode:
+            raise ValueError(f"Cannot restore a '{state.mode}' generator state into a '{self.mode}' generator")
+        self.__seed = state.seed
+        self.__drawn = state.drawn
+        self.__buffer = state.block
+        self.__position = state.position
+        self._random.setstate(state.random)
+        self._set_state(state.extra)
+        self.__random_state = state.random
+        self.__extra = state.extra
+
+    def clone(self) -> 'PieceGenerator':
+        """Returns a new generator of the same kind, at the same point in the same sequence.  The random state and
+        buffered shapes are copied, nothing is regenerated."""
+        generator = type(self)(self.__seed, self.__block_size)
+        generator.restore(self.snapshot())
+        return generator
+
+    def next_shape(self) -> int:
+        """Returns the next shape number in the sequence."""
+        if self.__position >= len(self.__buffer):
+            self.__buffer = bytes(self._fill(self.__block_size))
+            self.__position = 0
+            self.__save_state()
+        shape_num = self.__buffer[self.__position]
+        self.__position += 1
+        self.__drawn += 1
+        return shape_num
+
+    def generate(self, count: int) -> array:
+        """Returns the next count shape numbers in the sequence, in bulk."""
+        if len(self.__buffer) - self.__position < count:
+            buffer = bytearray(self.__buffer[self.__position:])
+            while len(buffer) < count:
+                buffer.extend(self._fill(max(self.__block_size, count - len(buffer))))
+            self.__buffer = bytes(buffer)
+            self.__position = 0
+            self.__save_state()
+        shapes = array('B', self.__buffer[self.__position:self.__position + count])
+        self.__position += count
+        self.__drawn += count
+        return shapes
+
+    def __iter__(self) -> 'PieceGenerator':
+        """Returns iterator over the (endless) sequence."""
+        return self
+
+    def __next__(self) -> int:
+        """Returns the next shape number in the sequence."""
+        return self.next_shape()
+
+    def __save_state(self) -> None:
+        """Saves the random and randomizer state, once a block has been generated, for snapshots to share."""
+        self.__random_state = self._random.getstate()
+        self.__extra = self._get_state()
+
+    def _reset_state(self) -> None:
+        """Clears any randomizer state, after a reseed.  Overridden where needed."""
+
+    def _get_state(self) -> Tuple[int, ...]:
+        """Returns any randomizer state, for a snapshot.  Overridden where needed."""
+        return ()
+
+    def _set_state(self, state: Tuple[int, ...]) -> None:
+        """Puts back randomizer state from a snapshot.  Overridden where needed."""
+
+    def _fill(self, count: int) -> List[int]:
+        """Returns at least count new shape numbers.  Overridden by each randomizer."""
+        raise NotImplementedError()
+
+
+class UniformGenerator(PieceGenerator):
+    """Each shape is drawn independently with equal odds, like the original game."""
+
+    mode = "uniform"
+
+    def _fill(self, count: int) -> List[int]:
+        """Returns count independently drawn shapes."""
+        return self._random.choices(range(1, 8), k=count)
+
+
+class BagGenerator(PieceGenerator):
+    """Deals all seven shapes in a shuffled bag before refilling.  Limits droughts and floods."""
+
+    mode = "bag"
+
+    def _fill(self, count: int) -> List[int]:
+        """Returns whole shuffled bags, at least count shapes."""
+        shapes: List[int] = []
+        while len(shapes) < count:
+            bag = [1, 2, 3, 4, 5, 6, 7]
+            self._random.shuffle(bag)
+            shapes.extend(bag)
+        return shapes
+
+
+class HistoryGenerator(PieceGenerator):
+    """Remembers the last four shapes and rerolls (up to four times) any draw found in that history."""
+
+    mode = "history"
+
+    def __init__(self, seed: Optional[int] = None, block_size: int = 256) -> None:
+        """Class constructor."""
+        self.__history: List[int] = []
+        self._reset_state()
+        super().__init__(seed, block_size)
+
+    def _reset_state(self) -> None:
+        """Clears the shape history."""
+        self.__history = [7, 5, 7, 5]
+
+    def _get_state(self) -> Tuple[int, ...]:
+        """Returns the shape history."""
+        return tuple(self.__history)
+
+    def _set_state(self, state: Tuple[int, ...]) -> None:
+        """Puts back the shape history."""
+        self.__history = list(state)
+
+    def _fill(self, count: int) -> List[int]:
+        """Returns count shapes, each rerolled while found in history."""
+        shapes: List[int] = []
+        for _ in range(count):
+            shape_num = self._random.randint(1, 7)
+            for _ in range(4):
+                if shape_num not in self.__history:
+                    break
+                shape_num = self._random.randint(1, 7)
+            self.__history.pop(0)
+            self.__history.append(shape_num)
+            shapes.append(shape_num)
+        return shapes
+
+
+# randomizers by mode name
+GENERATORS: Dict[str, Type[PieceGenerator]] = {
+    UniformGenerator.mode: UniformGenerator,
+    BagGenerator.mode: BagGenerator,
+    HistoryGenerator.mode: HistoryGenerator
+}
+
+
+def create_generator(mode: str = "uniform", seed: Optional[int] = None) -> PieceGenerator:
+    """Creates a piece generator by mode name."""
+    if mode not in GENERATORS:
+        raise ValueError(f"Unknown piece generator mode '{mode}'")
+    return GENERATORS[mode](seed)
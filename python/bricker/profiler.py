@@ -0,0 +1,136 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Dict, List, Tuple
+from array import array
+from time import perf_counter
+import csv
+
+
+class FrameProfiler:
+    """Records how long each stage of a frame takes (events, logic, drawing, flip).  Keeps the
+    last few thousand frames in fixed-size ring buffers, so recording never allocates once running.
+    Stage times are accumulated between begin_frame() and end_frame(), in seconds."""
+
+    def __init__(self, capacity: int = 3600, report_interval: int = 30) -> None:
+        """Class constructor.  Capacity is in frames, the report is refreshed every report_interval frames."""
+        self.__capacity: int = capacity
+        self.__report_interval: int = report_interval
+        self.__stages: Dict[str, array] = {"frame": array('d', bytes(capacity * 8))}
+        self.__current: Dict[str, float] = {}
+        self.__frame_start: float = perf_counter()
+        self.__frame_count: int = 0
+        self.__report: Tuple[Tuple[str, float, float, float], ...] = ()
+        self.__report_frame: int = -1
+        self.__created: float = perf_counter()
+        self.__startup: Dict[str, float] = {}
+
+    @property
+    def capacity(self) -> int:
+        """Returns number of frames kept."""
+        return self.__capacity
+
+    @property
+    def frame_count(self) -> int:
+        """Returns number of frames recorded since start."""
+        return self.__frame_count
+
+    @property
+    def stages(self) -> List[str]:
+        """Returns names of all stages seen, in order of first use."""
+        return list(self.__stages)
+
+    @property
+    def startup(self) -> Dict[str, float]:
+        """Returns how long each startup phase took, in seconds, in order of completion."""
+        return dict(self.__startup)
+
+    @staticmethod
+    def time() -> float:
+        """Returns the current time, to start timing a stage."""
+        return perf_counter()
+
+    def begin_frame(self) -> None:
+        """Starts timing a new frame."""
+        self.__current.clear()
+        self.__frame_start = perf_counter()
+
+    def stop(self, stage: str, start_time: float) -> float:
+        """Adds the time since start_time to a stage of the current frame.  Returns the current
+        time, so consecutive stages can be timed by chaining calls."""
+        now = perf_counter()
+        self.__current[stage] = self.__current.get(stage, 0.0) + (now - start_time)
+        return now
+
+    def startup_phase(self, phase: str, start_time: float) -> float:
+        """Records how long a startup phase took, since start_time.  Returns the current time, for chaining.
+        Phases may be recorded from a loading thread."""
+        now = perf_counter()
+        self.__startup[phase] = now - start_time
+        return now
+
+    def startup_mark(self, phase: str) -> None:
+        """Records the time from profiler creation to now as a startup phase, for milestones such as first frame."""
+        self.__startup[phase] = perf_counter() - self.__created
+
+    def end_frame(self) -> None:
+        """Stores the current frame's stage times (zero for stages not run) into the ring buffers."""
+        index = self.__frame_count % self.__capacity
+        self.__current["frame"] = perf_counter() - self.__frame_start
+        for stage in self.__current:
+            if stage not in self.__stages:
+                self.__stages[stage] = array('d', bytes(self.__capacity * 8))
+        for stage, samples in self.__stages.items():
+            samples[index] = self.__current.get(stage, 0.0)
+        self.__frame_count += 1
+
+    def samples(self, stage: str) -> List[float]:
+        """Returns the kept samples for a stage, oldest first, in seconds."""
+        samples = self.__stages.get(stage)
+        if samples is None:
+            return []
+        if self.__frame_count < self.__capacity:
+            return samples[:self.__frame_count].tolist()
+        index = self.__frame_count % self.__capacity
+        return samples[index:].tolist() + samples[:index].tolist()
+
+    def percentiles(self, stage: str, percents: Tuple[float, ...] = (50, 95, 99)) -> List[float]:
+        """Returns percentiles (nearest rank) of a stage's kept samples, in milliseconds."""
+        samples = sorted(self.samples(stage))
+        if len(samples) == 0:
+            return [0.0 for _ in percents]
+        return [samples[min(len(samples) - 1, max(0, int(round((p / 100) * len(samples))) - 1))] * 1000 for p in percents]
+
+    def report(self, count: int = 4) -> Tuple[Tuple[str, float, float, float], ...]:
+        """Returns p50/p95/p99 (ms) of the whole frame and the slowest stages by p99, for the debug overlay.
+        Only recalculated every report_interval frames, so the result can be used as a cache key."""
+        if (self.__report_frame < 0) or (self.__frame_count - self.__report_frame >= self.__report_interval):
+            rows = []
+            for stage in self.__stages:
+                p50, p95, p99 = self.percentiles(stage)
+                rows.append((stage, round(p50, 2), round(p95, 2), round(p99, 2)))
+            frame = [row for row in rows if row[0] == "frame"]
+            slowest = sorted((row for row in rows if row[0] != "frame"), key=lambda row: row[3], reverse=True)
+            self.__report = tuple(frame + slowest[:count])
+            self.__report_frame = self.__frame_count
+        return self.__report
+
+    def save_csv(self, path: str) -> None:
+        """Writes the kept frames to a CSV file, one row per frame, stage times in milliseconds."""
+        stages = self.stages
+        columns = [self.samples(stage) for stage in stages]
+        first = max(0, self.__frame_count - self.__capacity)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame_num"] + stages)
+            for i in range(0, min(self.__frame_count, self.__capacity)):
+                writer.writerow([first + i] + [f"{column[i] * 1000:.4f}" for column in columns])
+
+    def save_startup_csv(self, path: str) -> None:
+        """Writes the startup phase times to a CSV file, one row per phase, in milliseconds."""
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["phase", "ms"])
+            for phase, seconds in self.__startup.items():
+                writer.writerow([phase, f"{seconds * 1000:.4f}"])
@@ -0,0 +1,131 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from io import BytesIO
+from pygame import Surface, Rect
+from pygame.font import Font
+from color import Colors, PALETTE
+from tile_atlas import TileAtlas
+from glyph_atlas import GlyphAtlas
+from matrix import Matrix
+
+
+class FontCache:
+    """Game fonts and their glyph atlases, each loaded on first use from one in-memory font file."""
+
+    def __init__(self, font_file: Callable[[], bytes], sizes: Dict[str, int]) -> None:
+        """Class constructor.  The font file comes from font_file, called when the first font is needed."""
+        self.__font_file: Callable[[], bytes] = font_file
+        self.__font_data: Optional[bytes] = None
+        self.__sizes: Dict[str, int] = sizes
+        self.__fonts: Dict[str, Font] = {}
+        self.__glyph_atlases: Dict[str, GlyphAtlas] = {}
+
+    def font(self, name: str) -> Font:
+        """Returns a font by name, loading it on first use, so startup only pays for the fonts the splash frame needs."""
+        font = self.__fonts.get(name)
+        if font is None:
+            if self.__font_data is None:
+                self.__font_data = self.__font_file()
+            font = Font(BytesIO(self.__font_data), self.__sizes[name])
+            self.__fonts[name] = font
+        return font
+
+    def text(self, name: str) -> GlyphAtlas:
+        """Returns the glyph atlas of a font, in white, creating it on first use."""
+        text = self.__glyph_atlases.get(name)
+        if text is None:
+            text = GlyphAtlas(self.font(name), Colors.White)
+            self.__glyph_atlases[name] = text
+        return text
+
+
+class PanelCache:
+    """Rendered side panel surfaces, least recently used dropped first."""
+
+    def __init__(self, size: int = 32) -> None:
+        """Class constructor."""
+        self.__size: int = size
+        self.__surfaces: OrderedDict[Tuple[str, Any, bool], Surface] = OrderedDict()
+
+    def get(self, key: Tuple[str, Any, bool], draw: Callable[[], Surface]) -> Surface:
+        """Returns the surface cached for a key, drawing and caching it on a miss."""
+        surface = self.__surfaces.get(key)
+        if surface is not None:
+            self.__surfaces.move_to_end(key)
+            return surface
+        surface = draw()
+        self.__surfaces[key] = surface
+        while len(self.__surfaces) > self.__size:
+            self.__surfaces.popitem(last=False)
+        return surface
+
+
+class RowTracker:
+    """Remembers the matrix rows last drawn somewhere, to find which rows changed since."""
+
+    def __init__(self) -> None:
+        """Class constructor."""
+        self.__version: int = -1
+        self.__rows: List[int] = []
+        self.__colors: List[bytes] = []
+
+    def reset(self) -> None:
+        """Forgets the rows drawn, so every row counts as changed next time."""
+        self.__version = -1
+
+    def changed_rows(self, matrix: Matrix) -> List[int]:
+        """Returns rows (inside the walls) changed since the last call, and remembers the matrix as drawn."""
+        if matrix.version == self.__version:
+            return []
+        changed = [y for y in range(1, matrix.height - 1)
+                   if (self.__version < 0) or (matrix.rows[y] != self.__rows[y]) or (matrix.colors[y] != self.__colors[y])]
+        self.__version = matrix.version
+        self.__rows = list(matrix.rows)
+        self.__colors = [bytes(row) for row in matrix.colors]
+        return changed
+
+
+class SettledLayer:
+    """Persistent matrix surface of resting spaces.  Only rows changed since the last update are repainted,
+    so keeping it current costs nothing until a brick locks or rows are cleared."""
+
+    def __init__(self, blank_grid: Surface, atlas: TileAtlas) -> None:
+        """Class constructor."""
+        self.__blank_grid: Surface = blank_grid
+        self.__atlas: TileAtlas = atlas
+        self.__surface: Surface = blank_grid.copy()
+        self.__rows: RowTracker = RowTracker()
+        self.__debug: bool = False
+
+    @property
+    def surface(self) -> Surface:
+        """Returns the layer surface, the size of the blank grid."""
+        return self.__surface
+
+    def update(self, matrix: Matrix, debug: bool) -> None:
+        """Brings the layer up to date with the matrix, repainting every row if the debug flag changed."""
+        if debug != self.__debug:
+            self.__rows.reset()
+            self.__debug = debug
+        changed_rows = self.__rows.changed_rows(matrix)
+        if len(changed_rows) == 0:
+            return
+        atlas = self.__atlas.surface
+        tiles = []
+        for y in changed_rows:
+            area = Rect(2, ((y - 1) * 33) + 2, 329, 32)
+            self.__surface.blit(self.__blank_grid, area, area)
+            color_row = matrix.colors[y]
+            for x in range(1, matrix.width - 1):
+                if color_row[x]:
+                    tiles.append((atlas, (((x - 1) * 33) + 2, ((y - 1) * 33) + 2), self.__atlas.tile(PALETTE[color_row[x]])))
+        self.__surface.blits(tiles, False)
+        if debug:
+            for y in changed_rows:
+                for x in range(1, matrix.width - 1):
+                    if (matrix.rows[y] >> x) & 1:
+                        self.__surface.fill(Colors.White.value, (((x - 1) * 33) + 17, ((y - 1) * 33) + 17, 2, 2))
@@ -2,33 +2,81 @@
 Copyright (C) 2017-2020  John Hyland
 GNU GENERAL PUBLIC LICENSE Version 3"""
 
-from typing import Tuple, List, Optional
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
 import pygame
-from pygame import Surface
-from pygame.font import Font
+from pygame import Surface, Rect
 from pygame.time import Clock
 from color import Colors
+from brick import SHAPES
+from tile_atlas import TileAtlas
+from render_cache import FontCache, PanelCache, RowTracker, SettledLayer
 from matrix import Matrix
 from game_stats import GameStats
-from exploding_space import ExplodingSpace
+from particles import ParticleSystem
+from profiler import FrameProfiler
+
+
+def load_version(path: str = "version") -> str:
+    """Returns the game version, from the first line of the version file, 1.0 if there isn't one."""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return file.readline().strip()
+    except OSError:
+        return "1.0"
+
+
+def load_font_file(path: str = "zorque.ttf") -> bytes:
+    """Returns the game font's file, read into memory for all font sizes."""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class ScreenLayout(NamedTuple):
+    """Positions of the matrix and side panels on screen."""
+    side_width: int                     # width of each side column, either side of the matrix
+    left_x: int                         # left edge of the left column's panels
+    right_x: int                        # left edge of the right column's panels
+    matrix_position: Tuple[int, int]
+    profile_rect: Rect                  # frame timings, for debug mode
+
+
+def screen_layout(screen_size: Tuple[int, int]) -> ScreenLayout:
+    """Returns the layout for a screen size, with the matrix centered between two side columns."""
+    side_width = (screen_size[0] - 333) // 2
+    left_x = ((side_width - 250) // 2) + 5
+    return ScreenLayout(side_width, left_x, side_width + 333 + left_x, (side_width, (screen_size[1] - 663) // 2), Rect(left_x, 130, 240, 75))
 
 
 class Renderer:
     """Handles surface drawing, blitting, rendering."""
 
-    def __init__(self, version: str, screen_size: Tuple[int, int], screen: Surface, clock: Clock) -> None:
-        """Class constructor."""
+    def __init__(self, version: str, screen_size: Tuple[int, int], screen: Surface, clock: Clock, profiler: Optional[FrameProfiler] = None,
+                 font_file: Callable[[], bytes] = load_font_file) -> None:
+        """Class constructor.  The font file comes from font_file, called when the first font is needed."""
         self.__version: str = version
         self.__screen_size: Tuple[int, int] = screen_size
         self.__screen: Surface = screen
         self.__clock: Clock = clock
-        self.__font_title: Font = Font("zorque.ttf", 64)
-        self.__font_large: Font = Font("zorque.ttf", 42)
-        self.__font_med: Font = Font("zorque.ttf", 28)
-        self.__font_small: Font = Font("zorque.ttf", 18)
-        self.__font_tiny: Font = Font("zorque.ttf", 12)
+        self.__profiler: FrameProfiler = profiler if profiler is not None else FrameProfiler()
+        self.__fonts: FontCache = FontCache(font_file, {"title": 64, "large": 42, "med": 28, "small": 18, "tiny": 12})
         self.__blank_grid_surface: Surface = self.draw_blank_grid()
+        self.__atlas: TileAtlas = TileAtlas([shape.color for shape in SHAPES])
         self.__debug: bool = False
+        self.__ghost: bool = True
+        self.__ghost_y: int = 0
+        self.__settled: SettledLayer = SettledLayer(self.__blank_grid_surface, self.__atlas)
+        self.__matrix_surface: Surface = self.__blank_grid_surface.copy()
+        self.__frame: Surface = Surface(screen_size).convert()
+        self.__layout: ScreenLayout = screen_layout(screen_size)
+        self.__panel_cache: PanelCache = PanelCache(32)
+        self.__full_redraw: bool = True
+        self.__panels: Dict[str, Tuple[Any, Rect]] = {}
+        self.__fps_rect: Optional[Rect] = None
+        self.__fps_drawn: bool = False
+        self.__screen_rows: RowTracker = RowTracker()
+        self.__last_brick_spaces: FrozenSet[Tuple[int, int, int]] = frozenset()
+        self.__overlay: Optional[Tuple[Any, Any]] = None
+        self.__particle_rect: Optional[Rect] = None
 
     @property
     def screen_size(self) -> Tuple[int, int]:
@@ -40,6 +88,11 @@ class Renderer:
         """Returns clock instance."""
         return self.__clock
 
+    @property
+    def profiler(self) -> FrameProfiler:
+        """Returns frame profiler, timing each drawing stage."""
+        return self.__profiler
+
     @property
     def debug(self) -> bool:
         """Returns debug flag."""
@@ -49,6 +102,24 @@ class Renderer:
     def debug(self, value: bool) -> None:
         """Sets debug flag."""
         self.__debug = value
+        self.__screen_rows.reset()
+
+    @property
+    def ghost(self) -> bool:
+        """Returns true if the live brick's landing place is previewed."""
+        return self.__ghost
+
+    @ghost.setter
+    def ghost(self, value: bool) -> None:
+        """Sets ghost-piece preview flag."""
+        self.__ghost = value
+
+    def __fps_area(self) -> Rect:
+        """Returns the area of the frames-per-second counter, sized to its font on first use."""
+        if self.__fps_rect is None:
+            height = self.__fonts.font("small").get_height()
+            self.__fps_rect = Rect(self.__layout.left_x, (self.__screen_size[1] - height) - 15, 240, height)
+        return self.__fps_rect
 
     @staticmethod
     def __create_surface(size: Tuple[int, int]) -> Surface:
@@ -62,77 +133,240 @@ class Renderer:
         """Pumps the event queue, allowing frames to be rendered outside primary event loop."""
         pygame.event.pump()
 
-    def update_frame(self, matrix: Matrix, stats: GameStats, spaces: Optional[List[ExplodingSpace]]) -> None:
-        """Draws and flips the entire screen frame."""
-        frame = self.draw_frame(matrix, stats, spaces)
-        self.__screen.blit(frame, (0, 0))
-        pygame.display.flip()
-
-    def draw_frame(self, matrix: Matrix, stats: GameStats, spaces: Optional[List[ExplodingSpace]]) -> Surface:
-        """Draws the primary game screen surface."""
+    def update_frame(self, matrix: Matrix, stats: GameStats, particles: Optional[ParticleSystem]) -> None:
+        """Updates the screen.  Only regions that changed since the last frame are redrawn and pushed to
+        the display.  The entire frame is redrawn and flipped on first use and after menus.  Particles are
+        covered by the area around them this frame and last, recomposed from the matrix and panels underneath."""
+        profiler = self.__profiler
+        if self.__full_redraw:
+            frame = self.draw_frame(matrix, stats, particles)
+            start_time = profiler.time()
+            self.__screen.blit(frame, (0, 0))
+            start_time = profiler.stop("blit", start_time)
+            pygame.display.flip()
+            profiler.stop("flip", start_time)
+            self.__full_redraw = False
+            self.__overlay = None
+            self.__panels.clear()
+            self.__fps_drawn = self.__debug
+            self.__screen_rows.reset()
+            self.__last_brick_spaces = frozenset()
+        rects = self.__update_panels(matrix, stats)
+        start_time = profiler.time()
+        rects.extend(self.__update_matrix_spaces(matrix))
+        start_time = profiler.stop("draw_matrix", start_time)
+        rects.extend(self.__update_particles(matrix, stats, particles))
+        start_time = profiler.time()
+        if len(rects) > 0:
+            pygame.display.update(rects)
+            profiler.stop("flip", start_time)
+
+    def __update_particles(self, matrix: Matrix, stats: GameStats, particles: Optional[ParticleSystem]) -> List[Rect]:
+        """Redraws the area covering particles this frame and last, directly onto the screen.  The area is recomposed
+        on the frame surface, clipped, so particles stay under the side panels.  Returns changed areas."""
+        area = self.__particle_area(particles) if particles is not None else None
+        dirty = self.__particle_rect
+        self.__particle_rect = area
+        if area is not None:
+            dirty = area.union(dirty) if dirty is not None else area
+        if dirty is None:
+            return []
+        frame = self.__frame
+        frame.set_clip(dirty)
+        self.draw_frame(matrix, stats, particles)
+        frame.set_clip(None)
+        start_time = self.__profiler.time()
+        self.__screen.blit(frame, dirty, dirty)
+        self.__profiler.stop("blit", start_time)
+        return [dirty]
+
+    def __particle_area(self, particles: ParticleSystem) -> Optional[Rect]:
+        """Returns the on-screen bounding box of all particles, None if there are none."""
+        positions = particles.positions()
+        if len(positions) == 0:
+            return None
+        size = max(area.width for area in self.__particle_tiles(particles))
+        left = min(x for x, _, _ in positions)
+        top = min(y for _, y, _ in positions)
+        right = max(x for x, _, _ in positions) + size
+        bottom = max(y for _, y, _ in positions) + size
+        area = Rect(left, top, right - left, bottom - top).clip(self.__screen.get_rect())
+        return area if (area.width > 0) and (area.height > 0) else None
+
+    def __update_panels(self, matrix: Matrix, stats: GameStats) -> List[Rect]:
+        """Redraws side panels whose values changed since last frame, directly onto the screen.  Returns changed areas."""
+        rects = []
+        high_scores = tuple((x.initials, x.score) for x in stats.high_scores)
+        next_shape = matrix.next_brick.shape_num if matrix.next_brick is not None else 0
+        profiler = self.__profiler
+        panels = (
+            ("title", None, self.draw_title, None),
+            ("controls", None, self.draw_controls, (self.__layout.left_x, 210)),
+            ("next", next_shape, lambda: self.draw_next(matrix), (self.__layout.left_x, 480)),
+            ("level", stats.level, lambda: self.draw_level(stats), (self.__layout.right_x, 36)),
+            ("lines", stats.lines, lambda: self.draw_lines(stats), (self.__layout.right_x, 156)),
+            ("current_score", stats.current_score, lambda: self.draw_current_score(stats), (self.__layout.right_x, 276)),
+            ("high_scores", high_scores, lambda: self.draw_high_scores(stats), (self.__layout.right_x, 396)))
+        for name, value, draw, position in panels:
+            key = (value, self.__debug)
+            last = self.__panels.get(name)
+            if (last is None) or (last[0] != key):
+                start_time = profiler.time()
+                surface = draw()
+                start_time = profiler.stop("draw_" + name, start_time)
+                if position is None:
+                    position = ((self.__layout.side_width - surface.get_width()) // 2, 30)
+                rect = Rect(position, surface.get_size())
+                if last is not None:
+                    rect.union_ip(last[1])
+                self.__screen.fill(Colors.Black.value, rect)
+                self.__screen.blit(surface, position)
+                profiler.stop("blit", start_time)
+                self.__panels[name] = (key, Rect(position, surface.get_size()))
+                rects.append(rect)
+        if self.__debug or self.__fps_drawn:
+            start_time = profiler.time()
+            self.__screen.fill(Colors.Black.value, self.__fps_area())
+            self.__screen.fill(Colors.Black.value, self.__layout.profile_rect)
+            if self.__debug:
+                self.__screen.blit(self.draw_fps(), self.__fps_area())
+                self.__screen.blit(self.draw_profile(), self.__layout.profile_rect)
+            self.__fps_drawn = self.__debug
+            rects.append(self.__fps_area())
+            rects.append(self.__layout.profile_rect)
+            profiler.stop("draw_fps", start_time)
+        return rects
+
+    def __update_matrix_spaces(self, matrix: Matrix) -> List[Rect]:
+        """Redraws matrix spaces that changed since last frame (resting rows and live brick), directly onto the screen.  Returns changed areas."""
+        self.__settled.update(matrix, self.__debug)
+        spaces: Set[Tuple[int, int]] = {(x, y) for y in self.__screen_rows.changed_rows(matrix) for x in range(1, matrix.width - 1)}
+        brick_spaces = self.__get_brick_spaces(matrix)
+        if brick_spaces != self.__last_brick_spaces:
+            spaces.update((x, y) for x, y, _ in brick_spaces ^ self.__last_brick_spaces)
+            self.__last_brick_spaces = brick_spaces
+        return [self.__draw_matrix_space(matrix, x, y) for x, y in spaces if (0 < x < matrix.width - 1) and (0 < y < matrix.height - 1)]
+
+    def __get_brick_spaces(self, matrix: Matrix) -> FrozenSet[Tuple[int, int, int]]:
+        """Returns matrix spaces covered by the live brick, with shape number (0 where not solid).  Includes empty grid spaces in debug mode,
+        and the ghost piece's spaces (negative shape number) when shown.  Finds the ghost piece's row for drawing."""
+        brick = matrix.brick
+        if brick is None:
+            return frozenset()
+        rotation = brick.rotation_data
+        if self.__debug:
+            spaces = {((brick.x + x), (brick.y + y), brick.shape_num * rotation.grid[x][y]) for x in range(0, brick.width) for y in range(0, brick.height)}
+        else:
+            spaces = {((brick.x + x), (brick.y + y), brick.shape_num) for x, y in rotation.cells}
+        self.__ghost_y = matrix.landing_y() if self.__ghost else brick.y
+        if self.__ghost_y > brick.y:
+            ghost = {((brick.x + x), (self.__ghost_y + y)) for x, y in rotation.cells} - {((brick.x + x), (brick.y + y)) for x, y in rotation.cells}
+            spaces.update((x, y, -brick.shape_num) for x, y in ghost)
+        return frozenset(spaces)
+
+    def __draw_matrix_space(self, matrix: Matrix, x: int, y: int) -> Rect:
+        """Draws a single matrix space directly onto the screen, including any live brick.  Returns its area."""
+        area = Rect(((x - 1) * 33) + 2, ((y - 1) * 33) + 2, 32, 32)
+        rect = area.move(self.__layout.matrix_position)
+        self.__screen.blit(self.__settled.surface, rect, area)
+        dot = Rect(rect.x + 15, rect.y + 15, 2, 2)
+        brick = matrix.brick
+        if brick is not None:
+            grid = brick.rotation_data.grid
+            grid_x = x - brick.x
+            grid_y = y - brick.y
+            ghost_y = y - self.__ghost_y
+            in_brick = (0 <= grid_x < brick.width) and (0 <= grid_y < brick.height)
+            if in_brick and (grid[grid_x][grid_y] == 1):
+                self.__screen.blit(self.__atlas.surface, rect, self.__atlas.tile(brick.color))
+                if self.__debug and ((matrix.rows[y] >> x) & 1):
+                    self.__screen.fill(Colors.White.value, dot)
+                return rect
+            if (self.__ghost_y > brick.y) and (0 <= grid_x < brick.width) and (0 <= ghost_y < brick.height) and (grid[grid_x][ghost_y] == 1):
+                self.__screen.blit(self.__atlas.surface, rect, self.__atlas.ghost_tile(brick.color))
+            if in_brick and self.__debug:
+                self.__screen.fill(Colors.White.value, dot)
+        return rect
+
+    def draw_frame(self, matrix: Matrix, stats: GameStats, particles: Optional[ParticleSystem]) -> Surface:
+        """Draws the primary game screen surface.  The returned surface is reused between frames."""
 
         # vars
-        side_width = (self.__screen_size[0] - 333) // 2
-        left_x = ((side_width - 250) // 2) + 5
-        right_x = side_width + 333 + left_x
-
-        # create new frame
-        frame = Surface(self.__screen_size)
-        frame = frame.convert(frame)
+        side_width = self.__layout.side_width
+        left_x = self.__layout.left_x
+        right_x = self.__layout.right_x
+
+        # clear frame
+        profiler = self.__profiler
+        start_time = profiler.time()
+        frame = self.__frame
         frame.fill(Colors.Black.value)
+        start_time = profiler.stop("blit", start_time)
 
         # game matrix
         matrix_surface = self.draw_matrix(matrix)
-        frame.blit(matrix_surface, (side_width, (self.__screen_size[1] - 663) // 2))
-
-        # spaces
-        if spaces is not None:
-            for space in spaces:
-                x = int(space.x)
-                y = int(space.y)
-                rect = x, y, 34, 34
-                pygame.draw.rect(frame, space.color.value, rect)
-                pygame.draw.line(frame, Colors.Black.value, (x, y), (x + 34, y))
-                pygame.draw.line(frame, Colors.Black.value, (x, y + 34), (x + 34, y + 34))
-                pygame.draw.line(frame, Colors.Black.value, (x, y), (x, y + 34))
-                pygame.draw.line(frame, Colors.Black.value, (x + 34, y), (x + 34, y + 34))
-
-        # title
-        title_surface = self.draw_title()
-        frame.blit(title_surface, ((side_width - title_surface.get_width()) // 2, 30))
-
-        # controls
-        controls_surface = self.draw_controls()
-        frame.blit(controls_surface, (left_x, 210))
-
-        # next
-        next_surface = self.draw_next(matrix)
-        frame.blit(next_surface, (left_x, 480))
-
-        # level
-        level_surface = self.draw_level(stats)
-        frame.blit(level_surface, (right_x, 36))
-
-        # lines
-        lines_surface = self.draw_lines(stats)
-        frame.blit(lines_surface, (right_x, 156))
-
-        # current score
-        current_score_surface = self.draw_current_score(stats)
-        frame.blit(current_score_surface, (right_x, 276))
-
-        # high scores
-        high_scores_surface = self.draw_high_scores(stats)
-        frame.blit(high_scores_surface, (right_x, 396))
-
-        # draw fps?
+        start_time = profiler.stop("draw_matrix", start_time)
+        frame.blit(matrix_surface, self.__layout.matrix_position)
+        start_time = profiler.stop("blit", start_time)
+
+        # particles
+        if particles is not None:
+            self.draw_particles(frame, particles)
+            start_time = profiler.stop("draw_particles", start_time)
+
+        # side panels
+        panels = (
+            ("draw_title", self.draw_title, None),
+            ("draw_controls", self.draw_controls, (left_x, 210)),
+            ("draw_next", lambda: self.draw_next(matrix), (left_x, 480)),
+            ("draw_level", lambda: self.draw_level(stats), (right_x, 36)),
+            ("draw_lines", lambda: self.draw_lines(stats), (right_x, 156)),
+            ("draw_current_score", lambda: self.draw_current_score(stats), (right_x, 276)),
+            ("draw_high_scores", lambda: self.draw_high_scores(stats), (right_x, 396)))
+        for stage, draw, position in panels:
+            surface = draw()
+            start_time = profiler.stop(stage, start_time)
+            if position is None:
+                position = ((side_width - surface.get_width()) // 2, 30)
+            frame.blit(surface, position)
+            start_time = profiler.stop("blit", start_time)
+
+        # draw fps and frame timings?
         if self.__debug:
-            fps_surface = self.__font_small.render("fps: {0:.2f}".format(self.clock.get_fps()), True, Colors.White.value)
-            frame.blit(fps_surface, (left_x, (self.__screen_size[1] - fps_surface.get_height()) - 15))
+            frame.blit(self.draw_fps(), self.__fps_area())
+            frame.blit(self.draw_profile(), self.__layout.profile_rect)
+            profiler.stop("draw_fps", start_time)
 
         # return
         return frame
 
+    def __get_panel(self, name: str, value: Any, draw: Callable[[], Surface]) -> Surface:
+        """Returns a side panel surface from the cache, keyed by panel, input value and debug flag.  Only draws
+        (rasterizes text) on a cache miss, so changed values are redrawn.  Least recently used panels are dropped."""
+        return self.__panel_cache.get((name, value, self.__debug), draw)
+
+    def draw_fps(self) -> Surface:
+        """Draws the frames-per-second surface, for debug mode."""
+        return self.__fonts.text("small").render("fps: {0:.2f}".format(self.clock.get_fps()))
+
+    def draw_profile(self) -> Surface:
+        """Draws frame timing percentiles (whole frame and slowest stages), for debug mode.  From cache until the report refreshes."""
+        report = self.__profiler.report()
+        return self.__get_panel("profile", report, lambda: self.__render_profile(report))
+
+    def __render_profile(self, report: Tuple[Tuple[str, float, float, float], ...]) -> Surface:
+        """Draws frame timing percentiles surface."""
+        lines = ["ms  p50 / p95 / p99"] + ["{0}  {1:.2f} / {2:.2f} / {3:.2f}".format(*row) for row in report]
+        text = self.__fonts.text("tiny")
+        surface = self.__create_surface((self.__layout.profile_rect.width, self.__layout.profile_rect.height))
+        y = 0
+        for line in lines:
+            if y + text.height > surface.get_height():
+                break
+            text.draw(surface, line, (0, y))
+            y += text.height
+        return surface
+
     @staticmethod
     def draw_blank_grid() -> Surface:
         """Draws the blank game matrix grid surface."""
@@ -160,9 +394,13 @@ class Renderer:
         return grid
 
     def draw_title(self) -> Surface:
+        """Draws the title surface, from cache."""
+        return self.__get_panel("title", None, self.__render_title)
+
+    def __render_title(self) -> Surface:
         """Draws the title surface."""
-        title_surface = self.__font_title.render("bricker", True, Colors.White.value)
-        version_surface = self.__font_tiny.render(f"V{self.__version}   (C) 2017-2020  JOHN HYLAND", True, Colors.White.value)
+        title_surface = self.__fonts.font("title").render("bricker", True, Colors.White.value)
+        version_surface = self.__fonts.font("tiny").render(f"V{self.__version}   (C) 2017-2020  JOHN HYLAND", True, Colors.White.value)
         surface = self.__create_surface((title_surface.get_width(), (title_surface.get_height() + version_surface.get_height())))
         if self.__debug:
             surface.fill(Colors.PortlandOrange.value)
@@ -171,22 +409,26 @@ class Renderer:
         return surface
 
     def draw_controls(self) -> Surface:
+        """Draw controls surface, from cache."""
+        return self.__get_panel("controls", None, self.__render_controls)
+
+    def __render_controls(self) -> Surface:
         """Draw controls surface."""
         width = 240
         space = 18
-        title_surface = self.__font_med.render("controls", True, Colors.White.value)
-        left_1 = self.__font_small.render("left", True, Colors.White.value)
-        left_2 = self.__font_small.render("right", True, Colors.White.value)
-        left_3 = self.__font_small.render("down", True, Colors.White.value)
-        left_4 = self.__font_small.render("rotate", True, Colors.White.value)
-        left_5 = self.__font_small.render("drop", True, Colors.White.value)
-        left_6 = self.__font_small.render("pause", True, Colors.White.value)
-        right_1 = self.__font_small.render("left", True, Colors.White.value)
-        right_2 = self.__font_small.render("right", True, Colors.White.value)
-        right_3 = self.__font_small.render("down", True, Colors.White.value)
-        right_4 = self.__font_small.render("up", True, Colors.White.value)
-        right_5 = self.__font_small.render("space", True, Colors.White.value)
-        right_6 = self.__font_small.render("esc", True, Colors.White.value)
+        title_surface = self.__fonts.font("med").render("controls", True, Colors.White.value)
+        left_1 = self.__fonts.font("small").render("left", True, Colors.White.value)
+        left_2 = self.__fonts.font("small").render("right", True, Colors.White.value)
+        left_3 = self.__fonts.font("small").render("down", True, Colors.White.value)
+        left_4 = self.__fonts.font("small").render("rotate", True, Colors.White.value)
+        left_5 = self.__fonts.font("small").render("drop", True, Colors.White.value)
+        left_6 = self.__fonts.font("small").render("pause", True, Colors.White.value)
+        right_1 = self.__fonts.font("small").render("left", True, Colors.White.value)
+        right_2 = self.__fonts.font("small").render("right", True, Colors.White.value)
+        right_3 = self.__fonts.font("small").render("down", True, Colors.White.value)
+        right_4 = self.__fonts.font("small").render("up", True, Colors.White.value)
+        right_5 = self.__fonts.font("small").render("space", True, Colors.White.value)
+        right_6 = self.__fonts.font("small").render("esc", True, Colors.White.value)
         line_height = left_1.get_height()
         surface = self.__create_surface((width, title_surface.get_height() + (line_height * 6) + space))
         if self.__debug:
@@ -207,9 +449,13 @@ class Renderer:
         return surface
 
     def draw_next(self, matrix: Matrix) -> Surface:
+        """Draw next brick surface, from cache unless its value changed."""
+        return self.__get_panel("next", matrix.next_brick.shape_num if matrix.next_brick is not None else 0, lambda: self.__render_next(matrix))
+
+    def __render_next(self, matrix: Matrix) -> Surface:
         """Draw next brick surface."""
         width = 240
-        title_surface = self.__font_med.render("next", True, Colors.White.value)
+        title_surface = self.__fonts.font("med").render("next", True, Colors.White.value)
         surface = self.__create_surface((width, 135 + title_surface.get_height()))
         if self.__debug:
             surface.fill(Colors.PortlandOrange.value)
@@ -217,103 +463,143 @@ class Renderer:
             next_brick = matrix.next_brick
             size = (next_brick.width * 32) + (next_brick.width - 1)
             brick_surface = self.__create_surface((size, size))
-            for x in range(0, next_brick.width):
-                for y in range(0, next_brick.height):
-                    if next_brick.grid[x][y] == 1:
-                        rect = (x * 33), (y * 33), 32, 32
-                        pygame.draw.rect(brick_surface, next_brick.color.value, rect)
-            surface.blit(brick_surface, ((width - size) // 2, title_surface.get_height() - (next_brick.top_space * 33) + 24))
+            area = self.__atlas.tile(next_brick.color)
+            brick_surface.blits([(self.__atlas.surface, ((x * 33), (y * 33)), area) for x, y in next_brick.rotation_data.cells], False)
+            surface.blit(brick_surface, ((width - size) // 2, title_surface.get_height() - (next_brick.rotation_data.top_space * 33) + 24))
         surface.blit(title_surface, (0, 0))
         return surface
 
     def draw_level(self, stats: GameStats) -> Surface:
+        """Draw level surface, from cache unless its value changed."""
+        return self.__get_panel("level", stats.level, lambda: self.__render_level(stats))
+
+    def __render_level(self, stats: GameStats) -> Surface:
         """Draw level surface."""
         width = 240
         space = 4
-        title_surface = self.__font_med.render("level", True, Colors.White.value)
-        level_surface = self.__font_large.render("{:,}".format(stats.level), True, Colors.White.value)
-        surface = self.__create_surface((width, title_surface.get_height() + space + level_surface.get_height()))
+        title = self.__fonts.text("med")
+        digits = self.__fonts.text("large")
+        level = "{:,}".format(stats.level)
+        surface = self.__create_surface((width, title.height + space + digits.height))
         if self.__debug:
             surface.fill(Colors.PortlandOrange.value)
-        surface.blit(title_surface, (0, 0))
-        surface.blit(level_surface, ((width - level_surface.get_width()), (title_surface.get_height() + space)))
+        title.draw(surface, "level", (0, 0))
+        digits.draw(surface, level, ((width - digits.size(level)[0]), (title.height + space)))
         return surface
 
     def draw_lines(self, stats: GameStats) -> Surface:
+        """Draw lines surface, from cache unless its value changed."""
+        return self.__get_panel("lines", stats.lines, lambda: self.__render_lines(stats))
+
+    def __render_lines(self, stats: GameStats) -> Surface:
         """Draw lines surface."""
         width = 240
         space = 4
-        title_surface = self.__font_med.render("lines", True, Colors.White.value)
-        lines_surface = self.__font_large.render("{:,}".format(stats.lines), True, Colors.White.value)
-        surface = self.__create_surface((width, title_surface.get_height() + space + lines_surface.get_height()))
+        title = self.__fonts.text("med")
+        digits = self.__fonts.text("large")
+        lines = "{:,}".format(stats.lines)
+        surface = self.__create_surface((width, title.height + space + digits.height))
         if self.__debug:
             surface.fill(Colors.PortlandOrange.value)
-        surface.blit(title_surface, (0, 0))
-        surface.blit(lines_surface, ((width - lines_surface.get_width()), (title_surface.get_height() + space)))
+        title.draw(surface, "lines", (0, 0))
+        digits.draw(surface, lines, ((width - digits.size(lines)[0]), (title.height + space)))
         return surface
 
     def draw_current_score(self, stats: GameStats) -> Surface:
+        """Draw current score surface, from cache unless its value changed."""
+        return self.__get_panel("score", stats.current_score, lambda: self.__render_current_score(stats))
+
+    def __render_current_score(self, stats: GameStats) -> Surface:
         """Draw current score surface."""
         width = 240
         space = 4
-        title_surface = self.__font_med.render("score", True, Colors.White.value)
-        score_surface = self.__font_large.render("{:,}".format(stats.current_score), True, Colors.White.value)
-        surface = self.__create_surface((width, title_surface.get_height() + space + score_surface.get_height()))
+        title = self.__fonts.text("med")
+        digits = self.__fonts.text("large")
+        score = "{:,}".format(stats.current_score)
+        surface = self.__create_surface((width, title.height + space + digits.height))
         if self.__debug:
             surface.fill(Colors.PortlandOrange.value)
-        surface.blit(title_surface, (0, 0))
-        surface.blit(score_surface, ((width - score_surface.get_width()), (title_surface.get_height() + space)))
+        title.draw(surface, "score", (0, 0))
+        digits.draw(surface, score, ((width - digits.size(score)[0]), (title.height + space)))
         return surface
 
     def draw_high_scores(self, stats: GameStats) -> Surface:
+        """Draw high score surface, from cache unless its value changed."""
+        return self.__get_panel("high_scores", tuple((x.initials, x.score) for x in stats.high_scores), lambda: self.__render_high_scores(stats))
+
+    def __render_high_scores(self, stats: GameStats) -> Surface:
         """Draw high score surface."""
         width = 240
         space = 10
-        title_surface = self.__font_med.render("high scores", True, Colors.White.value)
-        line_height = self.__font_small.get_height()
-        height = title_surface.get_height() + space + (line_height * 10)
+        title = self.__fonts.text("med")
+        text = self.__fonts.text("small")
+        line_height = text.height
+        height = title.height + space + (line_height * 10)
         surface = self.__create_surface((width, height))
         if self.__debug:
             surface.fill(Colors.PortlandOrange.value)
-        surface.blit(title_surface, (0, 0))
+        title.draw(surface, "high scores", (0, 0))
         line = 0
         for score in stats.high_scores:
-            left = self.__font_small.render(score.initials, True, Colors.White.value)
-            right = self.__font_small.render("{:,}".format(score.score), True, Colors.White.value)
-            surface.blit(left, (10, (title_surface.get_height() + space + (line * line_height))))
-            surface.blit(right, (width - right.get_width(), (title_surface.get_height() + space + (line * line_height))))
+            value = "{:,}".format(score.score)
+            text.draw(surface, score.initials, (10, (title.height + space + (line * line_height))))
+            text.draw(surface, value, (width - text.size(value)[0], (title.height + space + (line * line_height))))
             line += 1
         return surface
 
+    def __particle_tiles(self, particles: ParticleSystem) -> List[Rect]:
+        """Returns the atlas area of each particle style's tile."""
+        atlas = self.__atlas
+        return [atlas.bordered_tile(color) if large else atlas.spark_tile(color) for color, large in particles.styles]
+
+    def draw_particles(self, surface: Surface, particles: ParticleSystem) -> None:
+        """Draws all particles onto a surface, batch-blitted from the tile atlas."""
+        areas = self.__particle_tiles(particles)
+        surface.blits([(self.__atlas.surface, (x, y), areas[style]) for x, y, style in particles.positions()], False)
+
     def draw_matrix(self, matrix: Matrix) -> Surface:
-        """Draws the game matrix, once per frame."""
-        matrix_surface = self.__create_surface((333, 663))
-        matrix_surface.blit(self.__blank_grid_surface, (0, 0))
-
-        for x in range(1, matrix.width - 1):
-            for y in range(1, matrix.height - 1):
-                color = matrix.color[x][y]
-                if color != (0, 0, 0):
-                    rect = ((x - 1) * 33) + 2, ((y - 1) * 33) + 2, 32, 32
-                    pygame.draw.rect(matrix_surface, color.value, rect)
-                if self.__debug and (matrix.matrix[x][y] == 1):
-                    rect = ((x - 1) * 33) + 17, ((y - 1) * 33) + 17, 2, 2
-                    pygame.draw.rect(matrix_surface, Colors.White.value, rect)
-
-        if matrix.brick is not None:
-            for x in range(0, matrix.brick.width):
-                for y in range(0, matrix.brick.height):
-                    if matrix.brick.grid[x][y] == 1:
-                        rect = (((matrix.brick.x - 1) + x) * 33) + 2, (((matrix.brick.y - 1) + y) * 33) + 2, 32, 32
-                        pygame.draw.rect(matrix_surface, matrix.brick.color.value, rect)
-                    elif self.__debug:
-                        rect = (((matrix.brick.x - 1) + x) * 33) + 17, (((matrix.brick.y - 1) + y) * 33) + 17, 2, 2
-                        pygame.draw.rect(matrix_surface, Colors.White.value, rect)
+        """Draws the game matrix, once per frame.  Resting spaces come from the persistent settled layer,
+        so only the live brick is drawn over it.  The returned surface is reused between frames."""
+        self.__settled.update(matrix, self.__debug)
+        matrix_surface = self.__matrix_surface
+        matrix_surface.blit(self.__settled.surface, (0, 0))
+
+        brick = matrix.brick
+        if brick is not None:
+            atlas = self.__atlas.surface
+            cells = brick.rotation_data.cells
+            ghost_y = matrix.landing_y() if self.__ghost else brick.y
+            if ghost_y > brick.y:
+                area = self.__atlas.ghost_tile(brick.color)
+                matrix_surface.blits([(atlas, ((((brick.x - 1) + x) * 33) + 2, (((ghost_y - 1) + y) * 33) + 2), area) for x, y in cells], False)
+            area = self.__atlas.tile(brick.color)
+            matrix_surface.blits([(atlas, ((((brick.x - 1) + x) * 33) + 2, (((brick.y - 1) + y) * 33) + 2), area) for x, y in cells], False)
+
+        if self.__debug and (brick is not None):
+            for x in range(0, brick.width):
+                for y in range(0, brick.height):
+                    if (brick.rotation_data.grid[x][y] != 1) or ((matrix.rows[brick.y + y] >> (brick.x + x)) & 1):
+                        matrix_surface.fill(Colors.White.value, ((((brick.x - 1) + x) * 33) + 17, (((brick.y - 1) + y) * 33) + 17, 2, 2))
 
         return matrix_surface
 
+    def draw_splash(self) -> None:
+        """Draws the splash frame shown while loading: the empty matrix and the title.  Needs only the title fonts."""
+        self.__screen.fill(Colors.Black.value)
+        self.__screen.blit(self.__blank_grid_surface, self.__layout.matrix_position)
+        title = self.draw_title()
+        self.__screen.blit(title, ((self.__layout.side_width - title.get_width()) // 2, 30))
+        self.event_pump()
+        pygame.display.flip()
+        self.__full_redraw = True
+        self.__overlay = None
+
     def draw_menu(self, matrix: Matrix, stats: GameStats, menu_selection: int, in_game: bool) -> None:
-        """Draws the main menu frame."""
+        """Draws the main menu frame, unless it is already on screen."""
+        self.__draw_overlay(matrix, stats, ("menu", menu_selection, in_game), lambda: self.__render_menu(menu_selection, in_game))
+
+    def __render_menu(self, menu_selection: int, in_game: bool) -> Surface:
+        """Draws the main menu box surface."""
         width = 400
         spacing = 25
 
@@ -329,9 +615,9 @@ class Renderer:
         elif menu_selection == 3:
             quit_color = Colors.FluorescentOrange
 
-        resume_surface = self.__font_large.render("resume", True, resume_color.value)
-        new_surface = self.__font_large.render("new game", True, new_color.value)
-        quit_surface = self.__font_large.render("quit", True, quit_color.value)
+        resume_surface = self.__fonts.font("large").render("resume", True, resume_color.value)
+        new_surface = self.__fonts.font("large").render("new game", True, new_color.value)
+        quit_surface = self.__fonts.font("large").render("quit", True, quit_color.value)
 
         surface = self.__create_surface((width, (resume_surface.get_height() * 3) + (spacing * 4) + 4))
         surface.fill(Colors.Black.value)
@@ -347,26 +633,25 @@ class Renderer:
         surface.blit(new_surface, ((surface.get_width() - new_surface.get_width()) // 2, (spacing * 2) + new_surface.get_height() + 2))
         surface.blit(quit_surface, ((surface.get_width() - quit_surface.get_width()) // 2, (spacing * 3) + (quit_surface.get_height() * 2) + 2))
 
-        frame = self.draw_frame(matrix, stats, None)
-        frame.blit(surface, ((frame.get_width() - surface.get_width()) // 2, (frame.get_height() - surface.get_height()) // 2))
+        return surface
 
-        self.event_pump()
-        self.__screen.blit(frame, (0, 0))
-        pygame.display.flip()
+    def draw_initials_input(self, matrix: Matrix, stats: GameStats, chars: List[str]) -> None:
+        """Draws the high score initials input frame, unless it is already on screen."""
+        self.__draw_overlay(matrix, stats, ("initials", tuple(chars)), lambda: self.__render_initials_input(chars))
 
-    def draw_initials_input(self, matrix, stats, chars) -> None:
-        """Draws the high score initials input frame."""
+    def __render_initials_input(self, chars: List[str]) -> Surface:
+        """Draws the high score initials input box surface."""
         width = 400
         spacing = 15
         char_width = 60
         char_height = 82
 
-        line1 = self.__font_med.render("new high score!", True, Colors.White.value)
-        line2 = self.__font_med.render("enter initials:", True, Colors.White.value)
+        line1 = self.__fonts.font("med").render("new high score!", True, Colors.White.value)
+        line2 = self.__fonts.font("med").render("enter initials:", True, Colors.White.value)
 
-        char1 = self.__font_title.render(chars[0], True, Colors.FluorescentOrange.value)
-        char2 = self.__font_title.render(chars[1], True, Colors.FluorescentOrange.value)
-        char3 = self.__font_title.render(chars[2], True, Colors.FluorescentOrange.value)
+        char1 = self.__fonts.font("title").render(chars[0], True, Colors.FluorescentOrange.value)
+        char2 = self.__fonts.font("title").render(chars[1], True, Colors.FluorescentOrange.value)
+        char3 = self.__fonts.font("title").render(chars[2], True, Colors.FluorescentOrange.value)
 
         slot1 = self.__create_surface((char_width, char_height))
         slot2 = self.__create_surface((char_width, char_height))
@@ -395,9 +680,29 @@ class Renderer:
         surface.blit(line2, ((surface.get_width() - line2.get_width()) // 2, spacing + line1.get_height() + 2))
         surface.blit(initials, ((surface.get_width() - initials.get_width()) // 2, (spacing * 2) + line1.get_height() + line2.get_height() + 2))
 
-        frame = self.draw_frame(matrix, stats, None)
-        frame.blit(surface, ((frame.get_width() - surface.get_width()) // 2, (frame.get_height() - surface.get_height()) // 2))
+        return surface
 
+    def __centered(self, surface: Surface) -> Tuple[int, int]:
+        """Returns the position of a surface centered on screen."""
+        return (self.__screen_size[0] - surface.get_width()) // 2, (self.__screen_size[1] - surface.get_height()) // 2
+
+    def __draw_overlay(self, matrix: Matrix, stats: GameStats, key: Tuple[Any, ...], draw: Callable[[], Surface]) -> None:
+        """Shows a box (menu, initials input) centered over the game frame.  The frame under it is only drawn and flipped
+        on the way in, or when high scores finish loading.  After that a changed box is redrawn and pushed to the display
+        on its own, and an unchanged one costs nothing.  In debug mode the whole frame is redrawn, for live frame timings."""
         self.event_pump()
-        self.__screen.blit(frame, (0, 0))
-        pygame.display.flip()
+        background = (key[0], tuple((x.initials, x.score) for x in stats.high_scores))
+        if (self.__overlay is not None) and (self.__overlay[0] == background) and not self.__debug:
+            if self.__overlay[1] == key:
+                return
+            surface = draw()
+            rect = self.__screen.blit(surface, self.__centered(surface))
+            pygame.display.update(rect)
+        else:
+            frame = self.draw_frame(matrix, stats, None)
+            surface = draw()
+            frame.blit(surface, self.__centered(surface))
+            self.__screen.blit(frame, (0, 0))
+            pygame.display.flip()
+        self.__overlay = (background, key)
+        self.__full_redraw = True
@@ -0,0 +1,119 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Dict
+import sys
+import struct
+from array import array
+
+
+class Replay:
+    """A recorded game.  Stores the piece generator mode and seed and the kick table, then the tick
+    and action of every player input.  Gravity ticks are implied and not stored."""
+
+    # magic, format version, generator mode, kick table (from version 2), seed, end tick, record count
+    __headers: Dict[int, struct.Struct] = {
+        1: struct.Struct("<4sB8sQII"),
+        2: struct.Struct("<4sB8s8sQII")
+    }
+    __magic = b"BRKR"
+    __version = 2
+
+    def __init__(self, mode: str, seed: int, kicks: str = "legacy") -> None:
+        """Class constructor."""
+        self.__mode: str = mode
+        self.__seed: int = seed
+        self.__kicks: str = kicks
+        self.__ticks: array = array('I')
+        self.__actions: array = array('B')
+        self.__end_tick: int = 0
+
+    @property
+    def mode(self) -> str:
+        """Returns the piece generator mode."""
+        return self.__mode
+
+    @property
+    def seed(self) -> int:
+        """Returns the piece generator seed."""
+        return self.__seed
+
+    @property
+    def kicks(self) -> str:
+        """Returns the name of the kick table bricks rotate with."""
+        return self.__kicks
+
+    @property
+    def ticks(self) -> array:
+        """Returns the tick of each recorded action."""
+        return self.__ticks
+
+    @property
+    def actions(self) -> array:
+        """Returns the recorded actions."""
+        return self.__actions
+
+    @property
+    def end_tick(self) -> int:
+        """Returns the last tick of the game."""
+        return self.__end_tick
+
+    @end_tick.setter
+    def end_tick(self, value: int) -> None:
+        """Sets the last tick of the game."""
+        self.__end_tick = value
+
+    def __len__(self) -> int:
+        """Returns number of recorded actions."""
+        return len(self.__actions)
+
+    def record(self, tick: int, action: int) -> None:
+        """Appends an action."""
+        self.__ticks.append(tick)
+        self.__actions.append(action)
+        if tick > self.__end_tick:
+            self.__end_tick = tick
+
+    def to_bytes(self) -> bytes:
+        """Packs the replay into its compact binary form."""
+        ticks = array('I', self.__ticks)
+        if sys.byteorder == "big":
+            ticks.byteswap()
+        header = Replay.__headers[Replay.__version].pack(Replay.__magic, Replay.__version, self.__mode.encode("ascii"), self.__kicks.encode("ascii"),
+                                                         self.__seed, self.__end_tick, len(self.__actions))
+        return header + ticks.tobytes() + self.__actions.tobytes()
+
+    @staticmethod
+    def from_bytes(data: bytes) -> 'Replay':
+        """Unpacks a replay from its compact binary form.  Version 1 replays, from before the kick table was stored, use the original game's."""
+        if (len(data) < 5) or (data[:4] != Replay.__magic) or (data[4] not in Replay.__headers):
+            raise ValueError("Not a supported replay file")
+        header = Replay.__headers[data[4]]
+        if data[4] == 1:
+            _, _, mode, seed, end_tick, count = header.unpack_from(data, 0)
+            kicks = b"legacy"
+        else:
+            _, _, mode, kicks, seed, end_tick, count = header.unpack_from(data, 0)
+        replay = Replay(mode.rstrip(b"\0").decode("ascii"), seed, kicks.rstrip(b"\0").decode("ascii"))
+        offset = header.size
+        replay.ticks.frombytes(data[offset:offset + (count * replay.ticks.itemsize)])
+        if sys.byteorder == "big":
+            replay.ticks.byteswap()
+        offset += count * replay.ticks.itemsize
+        replay.actions.frombytes(data[offset:offset + count])
+        if (len(replay.ticks) != count) or (len(replay.actions) != count):
+            raise ValueError("Truncated replay file")
+        replay.end_tick = end_tick
+        return replay
+
+    def save(self, path: str) -> None:
+        """Saves replay to file."""
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @staticmethod
+    def load(path: str) -> 'Replay':
+        """Loads replay from file."""
+        with open(path, "rb") as f:
+            return Replay.from_bytes(f.read())
@@ -0,0 +1,182 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Iterator, Tuple, TYPE_CHECKING
+from time import perf_counter
+import argparse
+import os
+import sys
+from matrix import Matrix
+from piece_generator import create_generator
+from game_engine import GameEngine, Action
+from replay import Replay
+if TYPE_CHECKING:
+    from frame_writer import FrameWriter
+
+
+class ReplayPlayer:
+    """Plays a recorded game back through the game engine, headless or one tick at a time."""
+
+    def __init__(self, replay: Replay) -> None:
+        """Class constructor."""
+        self.__replay: Replay = replay
+
+    @property
+    def replay(self) -> Replay:
+        """Returns the replay being played."""
+        return self.__replay
+
+    def create_engine(self) -> GameEngine:
+        """Returns a new engine, with a game started from the replay's generator, seed and kick table."""
+        engine = GameEngine(Matrix(create_generator(self.__replay.mode, self.__replay.seed), self.__replay.kicks))
+        engine.new_game(seed=self.__replay.seed)
+        return engine
+
+    def play(self) -> GameEngine:
+        """Plays the whole game as fast as possible.  Returns the engine in its final state."""
+        engine = self.create_engine()
+        for _ in self.frames(engine):
+            pass
+        return engine
+
+    def frames(self, engine: GameEngine) -> Iterator[int]:
+        """Plays the game into the given engine one tick at a time, yielding the tick count after each."""
+        ticks = self.__replay.ticks
+        actions = self.__replay.actions
+        end_tick = self.__replay.end_tick
+        count = len(actions)
+        index = 0
+        while not engine.game_over:
+            while (index < count) and (ticks[index] <= engine.ticks):
+                engine.step(Action(actions[index]))
+                index += 1
+            if engine.ticks >= end_tick:
+                break
+            engine.step(Action.TICK)
+            yield engine.ticks
+
+
+def render(player: ReplayPlayer, speed: float) -> GameEngine:
+    """Plays the game on screen at the given speed multiplier.  Returns the engine in its final state."""
+
+    # pygame is only needed for rendered playback
+    import pygame
+    from pygame.time import Clock
+    from renderer import Renderer, load_version
+
+    # load version
+    version = load_version()
+
+    # init display
+    pygame.init()
+    screen_size = (1000, 700)
+    screen = pygame.display.set_mode(screen_size)
+    clock = Clock()
+    renderer = Renderer(version, screen_size, screen, clock)
+
+    # draw one frame per 60th of a second of game time, scaled by speed
+    engine = player.create_engine()
+    frames_per_tick = 1.0 / speed
+    frame_budget = 0.0
+    for _ in player.frames(engine):
+        frame_budget += frames_per_tick
+        while frame_budget >= 1.0:
+            frame_budget -= 1.0
+            clock.tick(60)
+            renderer.event_pump()
+            renderer.update_frame(engine.matrix, engine.stats, None)
+    return engine
+
+
+def record(player: ReplayPlayer, writer: 'FrameWriter', fps: int = 60) -> GameEngine:
+    """Renders the game off screen, fps frames per second of game time, as fast as possible.  Frames go
+    to the writer instead of a display, so it runs on servers (SDL dummy video driver, no window).
+    Returns the engine in its final state."""
+
+    # no window, unless a video driver was chosen
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from pygame.time import Clock
+    from renderer import Renderer, load_version
+
+    # load version
+    version = load_version()
+
+    # init off-screen display
+    pygame.init()
+    screen_size = (1000, 700)
+    screen = pygame.display.set_mode(screen_size)
+    renderer = Renderer(version, screen_size, screen, Clock())
+
+    # write the first frame, then one every 60/fps ticks of game time
+    engine = player.create_engine()
+    with writer:
+        writer.write(renderer.draw_frame(engine.matrix, engine.stats, None))
+        frames_per_tick = fps / engine.ticks_per_second
+        frame_budget = 0.0
+        for _ in player.frames(engine):
+            frame_budget += frames_per_tick
+            while frame_budget >= 1.0:
+                frame_budget -= 1.0
+                writer.write(renderer.draw_frame(engine.matrix, engine.stats, None))
+    return engine
+
+
+def create_writer(args: argparse.Namespace) -> 'FrameWriter':
+    """Returns the frame writer chosen on the command line."""
+    from frame_writer import PngWriter, RawVideoWriter
+    if args.frames is not None:
+        return PngWriter(args.frames, args.size)
+    if args.pipe is not None:
+        return RawVideoWriter.pipe(args.pipe, args.size or (1000, 700), args.fps)
+    if args.raw == "-":
+        return RawVideoWriter(sys.stdout.buffer, args.size)
+    return RawVideoWriter.open(args.raw, args.size)
+
+
+def parse_size(text: str) -> Tuple[int, int]:
+    """Returns width/height parsed from WIDTHxHEIGHT."""
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main() -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Plays back a recorded Bricker game.")
+    parser.add_argument("path", nargs="+", help="replay file(s)")
+    parser.add_argument("--speed", type=float, default=0.0, help="playback speed multiplier, 0 to play headless as fast as possible")
+    parser.add_argument("--frames", metavar="DIR", help="render off screen, writing each frame to a PNG in this directory")
+    parser.add_argument("--raw", metavar="PATH", help="render off screen, writing frames as raw RGB24 video to this file, - for standard output")
+    parser.add_argument("--pipe", metavar="COMMAND", help="render off screen, piping raw RGB24 video to this encoder command, "
+                                                          "{width}, {height} and {fps} are filled in")
+    parser.add_argument("--size", type=parse_size, metavar="WxH", help="output resolution of rendered frames, default 1000x700")
+    parser.add_argument("--fps", type=int, default=60, help="rendered frames per second of game time")
+    args = parser.parse_args()
+    outputs = [x for x in (args.frames, args.raw, args.pipe) if x is not None]
+    if len(outputs) > 1:
+        parser.error("choose one of --frames, --raw, --pipe")
+    if (len(outputs) > 0) and (len(args.path) > 1):
+        parser.error("rendering to frames takes a single replay")
+    start_time = perf_counter()
+    log = sys.stdout
+    if args.raw == "-":
+        os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"     # keep pygame's banner out of the video stream
+        log = sys.stderr
+    for path in args.path:
+        player = ReplayPlayer(Replay.load(path))
+        if len(outputs) > 0:
+            engine = record(player, create_writer(args), args.fps)
+        elif args.speed > 0:
+            engine = render(player, args.speed)
+        else:
+            engine = player.play()
+        stats = engine.stats
+        print(f"{path}\tseed={engine.seed}\tticks={engine.ticks}\tscore={stats.current_score}\tlines={stats.lines}\tlevel={stats.level}", file=log)
+    elapsed = perf_counter() - start_time
+    print(f"{len(args.path)} game(s) in {elapsed:.3f}s", file=log)
+
+
+# start main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from time import perf_counter
+from pygame.time import Clock
+
+
+class Scheduler:
+    """Fixed-timestep game loop timing.  Game time advances in whole ticks at a fixed rate, however
+    often frames are drawn, so rendering can be capped lower (or run slow) without changing game speed.
+    Time left over between ticks is exposed as alpha, for drawing motion between ticks."""
+
+    def __init__(self, clock: Clock, tick_rate: int = 60, max_fps: int = 60, max_ticks_per_frame: int = 10) -> None:
+        """Class constructor.  Frames are limited to max_fps, and at most max_ticks_per_frame ticks are run per
+        frame so a long stall (window drag, slow disk) skips game time rather than trying to catch up."""
+        self.__clock: Clock = clock
+        self.__tick_rate: int = tick_rate
+        self.__tick_interval: float = 1.0 / tick_rate
+        self.__max_fps: int = max_fps
+        self.__max_ticks_per_frame: int = max_ticks_per_frame
+        self.__last_time: float = perf_counter()
+        self.__accumulator: float = 0.0
+        self.__alpha: float = 0.0
+        self.__ticks: int = 0
+
+    @property
+    def tick_rate(self) -> int:
+        """Returns number of ticks per second of game time."""
+        return self.__tick_rate
+
+    @property
+    def tick_interval(self) -> float:
+        """Returns length of one tick, in seconds."""
+        return self.__tick_interval
+
+    @property
+    def max_fps(self) -> int:
+        """Returns frame rate cap."""
+        return self.__max_fps
+
+    @max_fps.setter
+    def max_fps(self, value: int) -> None:
+        """Sets frame rate cap."""
+        self.__max_fps = value
+
+    @property
+    def alpha(self) -> float:
+        """Returns how far game time is into the next tick, 0.0 to 1.0, for drawing between ticks."""
+        return self.__alpha
+
+    @property
+    def ticks(self) -> int:
+        """Returns number of ticks run since start."""
+        return self.__ticks
+
+    def reset(self) -> None:
+        """Restarts timing from now, so time spent outside the loop (menus) is not run as game time."""
+        self.__last_time = perf_counter()
+        self.__accumulator = 0.0
+        self.__alpha = 0.0
+
+    def next_frame(self) -> int:
+        """Waits for the next frame, within the frame rate cap.  Returns number of ticks due before drawing it."""
+        self.__clock.tick(self.__max_fps)
+        now = perf_counter()
+        self.__accumulator += now - self.__last_time
+        self.__last_time = now
+        ticks = int(self.__accumulator / self.__tick_interval)
+        if ticks > self.__max_ticks_per_frame:
+            ticks = self.__max_ticks_per_frame
+            self.__accumulator = 0.0
+        else:
+            self.__accumulator -= ticks * self.__tick_interval
+        self.__alpha = self.__accumulator / self.__tick_interval
+        self.__ticks += ticks
+        return ticks
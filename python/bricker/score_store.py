@@ -0,0 +1,228 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Any, List, Optional, Tuple
+import os
+import os.path
+import tempfile
+import time
+try:
+    import sqlite3
+except ImportError:     # some minimal Python builds leave it out
+    sqlite3 = None      # type: ignore
+
+
+class HighScore:
+    """Stores a single high score."""
+
+    def __init__(self, initials: str, score: int) -> None:
+        """Class constructor."""
+        self.__initials: str = initials
+        self.__score: int = score
+
+    @property
+    def initials(self) -> str:
+        """Returns gamer's initials."""
+        return self.__initials
+
+    @property
+    def score(self) -> int:
+        """Returns high-score value."""
+        return self.__score
+
+
+class ScoreStore:
+    """Base class for high score storage.  Keeps every score ever added, not only the top ten,
+    and answers the queries the game needs without handing back the whole history."""
+
+    def add(self, initials: str, score: int) -> None:
+        """Adds a score, atomically."""
+        raise NotImplementedError()
+
+    def top(self, count: int = 10) -> List[HighScore]:
+        """Returns the highest scores, best first.  Equal scores keep the order they were added."""
+        raise NotImplementedError()
+
+    def best(self, initials: str) -> Optional[HighScore]:
+        """Returns the best score of the given initials, or none if they have no scores."""
+        raise NotImplementedError()
+
+    def rank(self, score: int) -> int:
+        """Returns the place (from 1) a new score would take on the board."""
+        raise NotImplementedError()
+
+    def count(self) -> int:
+        """Returns number of scores stored."""
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        """Releases the store's file."""
+
+
+class SqliteScoreStore(ScoreStore):
+    """High scores in a SQLite database, indexed by score and by initials.  Every write is a transaction
+    and concurrent writers wait on SQLite's file lock, so several cabinets can share one scores file.
+    The default rollback journal is kept, not WAL, since WAL's shared memory index doesn't work when
+    the file is on a network share.  A legacy tab-separated scores file is imported the first time the
+    database is opened empty."""
+
+    def __init__(self, path: str, legacy_path: Optional[str] = None, timeout: float = 10.0) -> None:
+        """Class constructor.  Waits up to timeout seconds for other writers to finish.  The connection may be
+        handed from the thread that opened it to another (loading thread to game loop), but not used by both at once."""
+        self.__path: str = path
+        self.__connection: Any = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.__connection.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+        self.__connection.execute("PRAGMA journal_mode=DELETE")     # undoes WAL on databases from earlier versions
+        self.__connection.executescript("""
+            CREATE TABLE IF NOT EXISTS scores (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                initials TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                time REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC, id);
+            CREATE INDEX IF NOT EXISTS scores_by_initials ON scores (initials, score DESC, id);""")
+        if (legacy_path is not None) and os.path.isfile(legacy_path):
+            self.__import_legacy(legacy_path)
+
+    @property
+    def path(self) -> str:
+        """Returns database file path."""
+        return self.__path
+
+    def add(self, initials: str, score: int) -> None:
+        """Adds a score, atomically."""
+        self.__connection.execute("INSERT INTO scores (initials, score, time) VALUES (?, ?, ?)", (initials, score, time.time()))
+
+    def top(self, count: int = 10) -> List[HighScore]:
+        """Returns the highest scores, best first.  Equal scores keep the order they were added."""
+        rows = self.__connection.execute("SELECT initials, score FROM scores ORDER BY score DESC, id LIMIT ?", (count,)).fetchall()
+        return [HighScore(initials, score) for initials, score in rows]
+
+    def best(self, initials: str) -> Optional[HighScore]:
+        """Returns the best score of the given initials, or none if they have no scores."""
+        row = self.__connection.execute("SELECT initials, score FROM scores WHERE initials = ? ORDER BY score DESC, id LIMIT 1", (initials,)).fetchone()
+        return HighScore(row[0], row[1]) if row is not None else None
+
+    def rank(self, score: int) -> int:
+        """Returns the place (from 1) a new score would take on the board."""
+        return self.__connection.execute("SELECT COUNT(*) FROM scores WHERE score >= ?", (score,)).fetchone()[0] + 1
+
+    def count(self) -> int:
+        """Returns number of scores stored."""
+        return self.__connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def close(self) -> None:
+        """Closes the database."""
+        self.__connection.close()
+
+    def __import_legacy(self, legacy_path: str) -> None:
+        """Imports a tab-separated scores file into an empty database, then renames the file so it is not imported again.
+        Runs in one write transaction, so when several processes start at once only the first imports."""
+        connection = self.__connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0] == 0:
+                now = time.time()
+                connection.executemany("INSERT INTO scores (initials, score, time) VALUES (?, ?, ?)",
+                                       [(initials, score, now) for initials, score in read_text_scores(legacy_path)])
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        if os.path.isfile(legacy_path):
+            os.replace(legacy_path, legacy_path + ".imported")
+
+
+class TextScoreStore(ScoreStore):
+    """High scores in the original tab-separated text file, for when SQLite is not available.  Scores are kept
+    in memory, and the file is rewritten through a temporary file and an atomic rename, so a crash or power
+    cut leaves either the old file or the new one.  Writers are not locked against each other."""
+
+    def __init__(self, path: str) -> None:
+        """Class constructor."""
+        self.__path: str = path
+        self.__scores: List[Tuple[str, int]] = read_text_scores(path) if os.path.isfile(path) else []
+        self.__scores.sort(key=lambda x: x[1], reverse=True)
+
+    @property
+    def path(self) -> str:
+        """Returns scores file path."""
+        return self.__path
+
+    def add(self, initials: str, score: int) -> None:
+        """Adds a score, atomically."""
+        position = self.rank(score) - 1
+        self.__scores.insert(position, (initials, score))
+        directory = os.path.dirname(os.path.abspath(self.__path))
+        handle, temp_path = tempfile.mkstemp(prefix=".scores_", dir=directory)
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as f:
+                for x in self.__scores:
+                    f.write(x[0] + "\t" + str(x[1]) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.__path)
+        except BaseException:
+            del self.__scores[position]
+            if os.path.isfile(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def top(self, count: int = 10) -> List[HighScore]:
+        """Returns the highest scores, best first.  Equal scores keep the order they were added."""
+        return [HighScore(initials, score) for initials, score in self.__scores[:count]]
+
+    def best(self, initials: str) -> Optional[HighScore]:
+        """Returns the best score of the given initials, or none if they have no scores."""
+        for x in self.__scores:
+            if x[0] == initials:
+                return HighScore(x[0], x[1])
+        return None
+
+    def rank(self, score: int) -> int:
+        """Returns the place (from 1) a new score would take on the board.  Scores are sorted, so this is a binary search."""
+        low, high = 0, len(self.__scores)
+        while low < high:
+            middle = (low + high) // 2
+            if self.__scores[middle][1] >= score:
+                low = middle + 1
+            else:
+                high = middle
+        return low + 1
+
+    def count(self) -> int:
+        """Returns number of scores stored."""
+        return len(self.__scores)
+
+
+def read_text_scores(path: str) -> List[Tuple[str, int]]:
+    """Reads (initials, score) pairs from a tab-separated scores file.  Unreadable lines are skipped."""
+    scores = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            split = line.strip().split("\t")
+            if len(split) == 2:
+                try:
+                    scores.append((split[0], int(split[1])))
+                except ValueError:
+                    pass
+    return scores
+
+
+def open_store(path: Optional[str] = None) -> ScoreStore:
+    """Opens a score store.  SQLite (high_scores.db) when available, importing any old high_scores.txt, otherwise the text file."""
+    if sqlite3 is not None:
+        return SqliteScoreStore(path if path is not None else "high_scores.db", "high_scores.txt")
+    return TextScoreStore(path if path is not None else "high_scores.txt")
+
+
+_shared_store: Optional[ScoreStore] = None
+
+
+def shared_store() -> ScoreStore:
+    """Returns the score store shared by the whole process, opening it on first use."""
+    global _shared_store  # pylint: disable=global-statement
+    if _shared_store is None:
+        _shared_store = open_store()
+    return _shared_store
@@ -0,0 +1,269 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import nullcontext
+from time import perf_counter
+from math import sqrt
+import argparse
+import csv
+import json
+import os
+import sys
+from brick import KICKS
+from matrix import Matrix
+from piece_generator import create_generator, GENERATORS
+from game_engine import GameEngine, Action
+from bot import Bot
+
+
+class Settings(NamedTuple):
+    """Game rules and bot setup shared by every game of a run.  Plain values, so it pickles to worker processes."""
+    drop_intervals: Tuple[float, ...]   # gravity interval of each level, in seconds
+    line_scores: Tuple[int, ...]        # points for clearing 0 to 4 lines at once
+    mode: str = "uniform"               # piece generator mode
+    ticks_per_action: int = 6           # game ticks between bot actions, gravity keeps running meanwhile
+    max_pieces: int = 500               # games still running after this many pieces are cut short
+    lookahead: bool = True              # bot looks one brick ahead
+    kicks: str = "legacy"               # wall kick table bricks rotate with
+
+
+class GameResult(NamedTuple):
+    """Outcome of one self-play game."""
+    seed: int
+    score: int
+    lines: int
+    level: int
+    pieces: int
+    ticks: int
+    seconds: float
+    game_over: bool
+
+
+def play_game(seed: int, settings: Settings, bot: Optional[Bot] = None) -> GameResult:
+    """Plays one seeded game with the bot.  After each of its actions gravity runs ticks_per_action ticks,
+    so at high levels bricks can fall (and lock) before the bot finishes moving them, like a human player.
+    Whenever gravity moves the brick the bot plans again from where it is."""
+    start_time = perf_counter()
+    bot = bot if bot is not None else Bot(lookahead=settings.lookahead)
+    engine = GameEngine(Matrix(create_generator(settings.mode, seed), settings.kicks), drop_intervals=settings.drop_intervals, line_scores=settings.line_scores)
+    engine.new_game(seed=seed)
+    matrix = engine.matrix
+    pieces = 0
+    while (not engine.game_over) and (pieces < settings.max_pieces):
+        brick = matrix.brick
+        if brick is None:
+            break
+        actions = bot.actions(matrix)
+        while (not engine.game_over) and (matrix.brick is brick) and (len(actions) > 0):
+            engine.step(actions.pop(0))
+            if engine.game_over or (matrix.brick is not brick):
+                break
+            state = brick.snapshot()
+            for _ in range(0, settings.ticks_per_action):
+                if engine.game_over or (matrix.brick is not brick):
+                    break
+                engine.step(Action.TICK)
+            if (not engine.game_over) and (matrix.brick is brick) and (brick.snapshot() != state):
+                actions = bot.actions(matrix)
+        pieces += 1
+    stats = engine.stats
+    return GameResult(seed, stats.current_score, stats.lines, stats.level, pieces, engine.ticks, perf_counter() - start_time, engine.game_over)
+
+
+def play_games(seeds: List[int], settings: Settings) -> List[GameResult]:
+    """Plays a batch of games, sharing one bot.  Runs in a worker process."""
+    bot = Bot(lookahead=settings.lookahead)
+    return [play_game(seed, settings, bot) for seed in seeds]
+
+
+def run_games(seeds: range, settings: Settings, workers: int, batch_size: int = 20) -> Iterator[GameResult]:
+    """Plays games across a pool of worker processes, yielding results as each batch finishes (not in seed order).
+    Only a few batches per worker are queued at once, so a million seeds need not be submitted up front.
+    With one worker, games are played in this process."""
+    if workers <= 1:
+        bot = Bot(lookahead=settings.lookahead)
+        for seed in seeds:
+            yield play_game(seed, settings, bot)
+        return
+    batches: Iterator[List[int]] = (list(seeds[i:i + batch_size]) for i in range(0, len(seeds), batch_size))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: Set[Future] = set()
+        for batch in batches:
+            pending.add(executor.submit(play_games, batch, settings))
+            if len(pending) >= workers * 4:
+                break
+        while len(pending) > 0:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                more = next(batches, None)
+                if more is not None:
+                    pending.add(executor.submit(play_games, more, settings))
+                yield from future.result()
+
+
+class RunningStat:
+    """Mean, standard deviation, minimum and maximum of a stream of values, without keeping them (Welford's method)."""
+
+    def __init__(self) -> None:
+        """Class constructor."""
+        self.__count: int = 0
+        self.__mean: float = 0.0
+        self.__sum_squares: float = 0.0
+        self.__min: float = float("inf")
+        self.__max: float = float("-inf")
+
+    @property
+    def count(self) -> int:
+        """Returns number of values added."""
+        return self.__count
+
+    @property
+    def mean(self) -> float:
+        """Returns mean of values."""
+        return self.__mean
+
+    @property
+    def stdev(self) -> float:
+        """Returns sample standard deviation of values."""
+        return sqrt(self.__sum_squares / (self.__count - 1)) if self.__count > 1 else 0.0
+
+    def add(self, value: float) -> None:
+        """Adds a value."""
+        self.__count += 1
+        delta = value - self.__mean
+        self.__mean += delta / self.__count
+        self.__sum_squares += delta * (value - self.__mean)
+        self.__min = min(self.__min, value)
+        self.__max = max(self.__max, value)
+
+    def summary(self) -> Dict[str, float]:
+        """Returns statistics in their machine-readable form."""
+        if self.__count == 0:
+            return {"mean": 0.0, "stdev": 0.0, "min": 0.0, "max": 0.0}
+        return {"mean": self.__mean, "stdev": self.stdev, "min": self.__min, "max": self.__max}
+
+
+class Report:
+    """Aggregates game results as they stream in."""
+
+    FIELDS = ("score", "lines", "level", "pieces", "ticks", "seconds")
+
+    def __init__(self, settings: Settings) -> None:
+        """Class constructor."""
+        self.__settings: Settings = settings
+        self.__stats: Dict[str, RunningStat] = {field: RunningStat() for field in self.FIELDS}
+        self.__levels: Dict[int, int] = {}
+        self.__game_overs: int = 0
+        self.__start_time: float = perf_counter()
+
+    @property
+    def count(self) -> int:
+        """Returns number of games added."""
+        return self.__stats["score"].count
+
+    @property
+    def elapsed(self) -> float:
+        """Returns wall time since the report was started, in seconds."""
+        return perf_counter() - self.__start_time
+
+    def add(self, result: GameResult) -> None:
+        """Adds the result of a game."""
+        for field in self.FIELDS:
+            self.__stats[field].add(getattr(result, field))
+        self.__levels[result.level] = self.__levels.get(result.level, 0) + 1
+        if result.game_over:
+            self.__game_overs += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """Returns the aggregated report in its machine-readable form."""
+        elapsed = self.elapsed
+        return {
+            "settings": self.__settings._asdict(),
+            "games": self.count,
+            "game_overs": self.__game_overs,
+            "wall_seconds": elapsed,
+            "games_per_second": self.count / elapsed if elapsed > 0 else 0.0,
+            "stats": {field: stat.summary() for field, stat in self.__stats.items()},
+            "levels": {str(level): self.__levels[level] for level in sorted(self.__levels)}
+        }
+
+    def progress(self) -> str:
+        """Returns a one line progress summary."""
+        elapsed = self.elapsed
+        return (f"{self.count:>10,} games{self.count / elapsed if elapsed > 0 else 0.0:>10,.1f} /s   "
+                f"score {self.__stats['score'].mean:>10,.1f}   lines {self.__stats['lines'].mean:>7,.1f}   "
+                f"level {self.__stats['level'].mean:>5.2f}   game over {self.__game_overs / max(1, self.count):>6.1%}")
+
+    def text(self) -> str:
+        """Returns the aggregated report as text."""
+        lines = [f"{'':<10}{'mean':>14}{'stdev':>14}{'min':>14}{'max':>14}"]
+        for field, stat in self.__stats.items():
+            summary = stat.summary()
+            lines.append(f"{field:<10}" + "".join(f"{summary[key]:>14,.3f}" for key in ("mean", "stdev", "min", "max")))
+        lines.append("levels    " + "  ".join(f"{level}: {self.__levels[level]:,}" for level in sorted(self.__levels)))
+        lines.append(self.progress())
+        return "\n".join(lines)
+
+
+def parse_list(text: str, kind: type) -> Tuple[Any, ...]:
+    """Returns a comma-separated list of values."""
+    return tuple(kind(value) for value in text.split(","))
+
+
+def main() -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Plays seeded Bricker games with the computer player, across all CPU cores.")
+    parser.add_argument("games", type=int, help="number of games to play")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game, each game after uses the next")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes, default one per CPU core")
+    parser.add_argument("--batch", type=int, default=20, help="games per task sent to a worker")
+    parser.add_argument("--mode", default="uniform", choices=list(GENERATORS), help="piece generator mode")
+    parser.add_argument("--kicks", default="legacy", choices=list(KICKS), help="wall kick table: the original game's, or SRS")
+    parser.add_argument("--drop-intervals", metavar="SECONDS,...", help="gravity interval of each level, default the game's")
+    parser.add_argument("--line-scores", metavar="POINTS,...", help="points for clearing 0,1,2,3,4 lines at once, default 0,40,100,300,1200")
+    parser.add_argument("--ticks-per-action", type=int, default=6, help="game ticks between bot actions, sixty per second")
+    parser.add_argument("--max-pieces", type=int, default=500, help="pieces per game before it is cut short")
+    parser.add_argument("--no-lookahead", action="store_true", help="bot ignores the next brick (faster, weaker)")
+    parser.add_argument("--csv", metavar="PATH", help="write each game's result to this file as it finishes")
+    parser.add_argument("--output", metavar="JSON", help="write the aggregated report to this file")
+    parser.add_argument("--progress", type=int, default=1000, help="print progress every this many games, 0 for none")
+    args = parser.parse_args()
+    try:
+        settings = Settings(
+            drop_intervals=parse_list(args.drop_intervals, float) if args.drop_intervals else tuple(GameEngine.default_drop_intervals()),
+            line_scores=parse_list(args.line_scores, int) if args.line_scores else (0, 40, 100, 300, 1200),
+            mode=args.mode,
+            ticks_per_action=args.ticks_per_action,
+            max_pieces=args.max_pieces,
+            lookahead=not args.no_lookahead,
+            kicks=args.kicks)
+    except ValueError as ex:
+        parser.error(str(ex))
+    if (len(settings.drop_intervals) == 0) or (len(settings.line_scores) != 5):
+        parser.error("Need at least one drop interval and five line scores (0 to 4 lines).")
+    report = Report(settings)
+    with open(args.csv, "w", newline="", encoding="utf-8") if args.csv is not None else nullcontext() as csv_file:
+        writer = csv.writer(csv_file) if csv_file is not None else None
+        if writer is not None:
+            writer.writerow(GameResult._fields)
+        try:
+            for result in run_games(range(args.seed, args.seed + args.games), settings, args.workers, args.batch):
+                report.add(result)
+                if writer is not None:
+                    writer.writerow(result)
+                if (args.progress > 0) and (report.count % args.progress == 0):
+                    print(report.progress(), file=sys.stderr, flush=True)
+        except KeyboardInterrupt:
+            print("Interrupted, reporting games finished so far.", file=sys.stderr)
+    print(report.text())
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report.summary(), f, indent=2)
+
+
+# start main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Any, List, Optional
+import pytest
+from game_engine import GameEngine, Action
+from matrix import Matrix
+from piece_generator import create_generator
+from batch_engine import BatchEngine
+from bot import Bot
+
+np = pytest.importorskip("numpy")
+
+
+def new_games(mode: str, kicks: str, seeds: List[int], drop_intervals: Optional[List[float]] = None,
+              line_scores: Optional[List[int]] = None) -> List[GameEngine]:
+    """Returns a GameEngine per seed, each with a new game started."""
+    engines = []
+    for seed in seeds:
+        engine = GameEngine(Matrix(create_generator(mode, seed), kicks), drop_intervals=drop_intervals, line_scores=line_scores)
+        engine.new_game(seed=seed)
+        engines.append(engine)
+    return engines
+
+
+def assert_boards_match(batch: BatchEngine, engines: List[GameEngine]) -> None:
+    """Each batch board holds the same game as its GameEngine."""
+    for k, engine in enumerate(engines):
+        matrix = engine.matrix
+        brick = matrix.brick
+        assert brick is not None and matrix.next_brick is not None
+        assert list(batch.rows[k]) == matrix.rows
+        assert bool(batch.game_over[k]) == engine.game_over
+        assert (batch.scores[k], batch.lines[k], batch.levels[k], batch.ticks[k]) == \
+            (engine.stats.current_score, engine.stats.lines, engine.stats.level, engine.ticks)
+        assert (batch.shape_nums[k], batch.rotations[k], batch.x[k], batch.y[k]) == (brick.shape_num, brick.rotation, brick.x, brick.y)
+        assert batch.next_shape_nums[k] == matrix.next_brick.shape_num
+
+
+@pytest.mark.parametrize("mode,kicks,block_size", [("uniform", "legacy", 256), ("bag", "srs", 256), ("history", "legacy", 3), ("bag", "srs", 1)])
+def test_matches_game_engine(mode: str, kicks: str, block_size: int) -> None:
+    """For the same seeds and random actions, every board plays out as a GameEngine would."""
+    seeds = list(range(100, 140))
+    batch = BatchEngine(len(seeds), mode, block_size=block_size, kicks=kicks)
+    batch.new_game(seeds)
+    engines = new_games(mode, kicks, seeds)
+    assert_boards_match(batch, engines)
+    rng: Any = np.random.default_rng(1)
+    for step in range(1500):
+        actions = rng.choice(6, size=len(seeds), p=[0.45, 0.12, 0.12, 0.08, 0.15, 0.08])
+        batch.step(actions)
+        for engine, action in zip(engines, actions):
+            engine.step(Action(int(action)))
+        if step % 25 == 0:
+            assert_boards_match(batch, engines)
+    assert_boards_match(batch, engines)
+    assert batch.pieces.sum() > 10 * len(seeds)
+
+
+@pytest.mark.parametrize("kicks", ["legacy", "srs"])
+def test_matches_game_engine_clearing_lines(kicks: str) -> None:
+    """Boards played by the bot, with fast gravity, match through line clears and level changes."""
+    seeds = list(range(7, 19))
+    drop_intervals = [0.1, 0.05, 0.02]
+    line_scores = [5, 40, 100, 300, 1200]
+    batch = BatchEngine(len(seeds), "bag", drop_intervals, line_scores, kicks=kicks)
+    batch.new_game(seeds)
+    engines = new_games("bag", kicks, seeds, drop_intervals, line_scores)
+    bot = Bot(lookahead=False)
+    plans: List[List[Action]] = [[] for _ in seeds]
+    bricks: List[Any] = [None] * len(seeds)
+    rng: Any = np.random.default_rng(3)
+    for _ in range(3000):
+        actions = np.zeros(len(seeds), np.int64)
+        for k, engine in enumerate(engines):
+            if engine.game_over:
+                continue
+            if engine.matrix.brick is not bricks[k]:
+                bricks[k] = engine.matrix.brick
+                plans[k] = bot.actions(engine.matrix)
+            if plans[k] and rng.random() < 0.5:
+                actions[k] = plans[k].pop(0)
+        batch.step(actions)
+        for engine, action in zip(engines, actions):
+            engine.step(Action(int(action)))
+        assert_boards_match(batch, engines)
+    assert batch.lines.min() > 0
+    assert batch.levels.max() > 1
+
+
+def test_seed_count_checked() -> None:
+    """new_game needs one seed per board."""
+    with pytest.raises(ValueError):
+        BatchEngine(3).new_game([1, 2])
+
+
+def test_unknown_kicks() -> None:
+    """Unknown kick table names are refused."""
+    with pytest.raises(ValueError):
+        BatchEngine(3, kicks="nope")
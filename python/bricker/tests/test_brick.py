@@ -0,0 +1,167 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Tuple
+from random import Random
+import pytest
+from brick import Brick, BrickState, SHAPES, KICKS, SRS_KICKS, SRS_SPAWNS, SRS_TESTS, build_shape
+
+
+WIDTH = 12
+HEIGHT = 22
+
+
+def empty_rows() -> List[int]:
+    """Returns bordered matrix rows with nothing in them."""
+    return [(1 << WIDTH) - 1] + [1 | (1 << (WIDTH - 1))] * (HEIGHT - 2) + [(1 << WIDTH) - 1]
+
+
+def random_rows(rng: Random, fill: float = 0.4) -> List[int]:
+    """Returns bordered matrix rows, the top few empty and the rest randomly filled."""
+    rows = [(1 << WIDTH) - 1]
+    for y in range(1, HEIGHT - 1):
+        row = 1 | (1 << (WIDTH - 1))
+        if y > 4:
+            for x in range(1, WIDTH - 1):
+                if rng.random() < fill:
+                    row |= 1 << x
+        rows.append(row)
+    rows.append((1 << WIDTH) - 1)
+    return rows
+
+
+def baseline_grid(shape_num: int, rotations: int) -> List[List[int]]:
+    """Returns the original game's column-major [x][y] brick grid, rotated clockwise as it did."""
+    shape = SHAPES[shape_num - 1]
+    grid = [[0] * shape.size for _ in range(shape.size)]
+    for x, y in shape.rotations[0].cells:
+        grid[x][y] = 1
+    for _ in range(rotations):
+        rotated = [[0] * shape.size for _ in range(shape.size)]
+        for x in range(shape.size):
+            for y in range(shape.size):
+                rotated[(shape.size - 1) - y][x] = grid[x][y]
+        grid = rotated
+    return grid
+
+
+def baseline_collision(grid: List[List[int]], rows: List[int], left: int, top: int) -> bool:
+    """The original game's collision test over the [x][y] grid.  Its negative indices wrapped round to the solid
+    border, so spaces off the matrix count as solid."""
+    for x, column in enumerate(grid):
+        for y, solid in enumerate(column):
+            if solid:
+                matrix_x, matrix_y = left + x, top + y
+                if not ((0 <= matrix_x < WIDTH) and (0 <= matrix_y < HEIGHT)) or ((rows[matrix_y] >> matrix_x) & 1):
+                    return True
+    return False
+
+
+def positions(grid: List[List[int]]) -> List[Tuple[int, int]]:
+    """Returns every brick position on and just off the matrix, short of the right border's far side
+    (which bricks never reach, and where the original game raised IndexError)."""
+    right = max(x for x, column in enumerate(grid) if any(column))
+    return [(x, y) for x in range(-len(grid), WIDTH - right) for y in range(-len(grid), HEIGHT + 1)]
+
+
+@pytest.mark.parametrize("shape_num", range(1, 8))
+def test_collision_matches_baseline(shape_num: int) -> None:
+    """Bitmask collision agrees with the original grid walk, in every rotation and position."""
+    rng = Random(shape_num)
+    for _ in range(5):
+        rows = random_rows(rng)
+        for rotation in range(4):
+            grid = baseline_grid(shape_num, rotation)
+            brick = Brick(shape_num)
+            for x, y in positions(grid):
+                brick.restore(BrickState(shape_num, rotation, x, y))
+                assert brick.collision(rows) == baseline_collision(grid, rows, x, y), (rotation, x, y)
+
+
+def baseline_rotate(grid: List[List[int]], rows: List[int], left: int, top: int) -> Tuple[int, int, bool]:
+    """The original game's rotation kicks, for a grid already rotated: up to two rows down, two up, two columns
+    left, two right.  Returns the position it ended at and whether that is free (it didn't undo a failed rotation)."""
+    for x, y in ((0, 0), (0, 1), (0, 2), (0, -1), (0, -2), (-1, 0), (-2, 0), (1, 0), (2, 0)):
+        if not baseline_collision(grid, rows, left + x, top + y):
+            return left + x, top + y, True
+    return left, top, False
+
+
+@pytest.mark.parametrize("shape_num", range(1, 8))
+def test_rotation_states_match_baseline(shape_num: int) -> None:
+    """Each precomputed rotation state holds the cells the original game's grid rotation produced."""
+    brick = Brick(shape_num)
+    for rotation in range(4):
+        grid = baseline_grid(shape_num, rotation)
+        assert sorted(brick.rotation_data.cells) == sorted((x, y) for x, column in enumerate(grid) for y, solid in enumerate(column) if solid)
+        assert brick.rotate(random_rows(Random(0), 0.0))
+
+
+@pytest.mark.parametrize("shape_num", range(1, 8))
+def test_rotate_matches_baseline(shape_num: int) -> None:
+    """Rotating with the original game's kick table ends where the original game did.  Where no kick is free
+    the rotation is undone, which the original game didn't do."""
+    rng = Random(100 + shape_num)
+    brick = Brick(shape_num, "legacy")
+    for _ in range(5):
+        rows = random_rows(rng, 0.3)
+        for rotation in range(4):
+            grid = baseline_grid(shape_num, rotation + 1)
+            for x, y in positions(baseline_grid(shape_num, rotation)):
+                state = BrickState(shape_num, rotation, x, y)
+                brick.restore(state)
+                if brick.collision(rows):
+                    continue
+                expected_x, expected_y, rotated = baseline_rotate(grid, rows, x, y)
+                assert brick.rotate(rows) == rotated
+                if rotated:
+                    assert brick.snapshot() == BrickState(shape_num, (rotation + 1) & 3, expected_x, expected_y)
+                else:
+                    assert brick.snapshot() == state
+
+
+@pytest.mark.parametrize("kicks", sorted(KICKS))
+@pytest.mark.parametrize("shape_num", range(1, 8))
+def test_full_turn_on_empty_board(shape_num: int, kicks: str) -> None:
+    """On an empty board every brick rotates at spawn, and a few rows lower goes 0, R, 2, L and back to
+    where it started, with each kick table."""
+    rows = empty_rows()
+    brick = Brick(shape_num, kicks)
+    start = brick.snapshot()
+    for rotation in range(4):
+        assert brick.rotate(rows)
+        assert brick.rotation == (rotation + 1) & 3
+    assert not brick.collision(rows)
+    brick.restore(start)
+    for _ in range(4):
+        assert not brick.move_down(rows)
+    start = brick.snapshot()
+    for _ in range(4):
+        assert brick.rotate(rows)
+        assert not brick.collision(rows)
+    assert brick.snapshot() == start
+
+
+@pytest.mark.parametrize("shape_num", sorted(SRS_SPAWNS))
+def test_srs_kicks_match_standard(shape_num: int) -> None:
+    """In open space the SRS table's first test puts the brick on the standard SRS cells, each rotation state
+    the same translation from them, and the later tests are the standard tests relative to the first."""
+    tests, cells = SRS_SPAWNS[shape_num]
+    shape = SHAPES[shape_num - 1]
+    standard = build_shape(shape_num, shape.size, shape.color, cells)
+    rows = empty_rows()
+    brick = Brick(shape_num, "srs")
+    for _ in range(4):
+        brick.move_down(rows)
+    translations = set()
+    for rotation in range(4):
+        assert brick.rotate(rows)
+        placed = sorted((x + brick.x, y + brick.y) for x, y in brick.rotation_data.cells)
+        expected = sorted(standard.rotations[(rotation + 1) & 3].cells)
+        translations.add(tuple((px - ex, py - ey) for (px, py), (ex, ey) in zip(placed, expected)))
+    assert len(translations) == 1
+    assert len(set(next(iter(translations)))) == 1
+    for before, offsets in enumerate(SRS_KICKS[shape_num - 1]):
+        first_x, first_y = offsets[0]
+        assert tuple((x - first_x, y - first_y) for x, y in offsets) == SRS_TESTS[tests][before]
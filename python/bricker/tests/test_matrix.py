@@ -0,0 +1,120 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from random import Random
+from typing import List, Optional, Tuple
+import pytest
+from game_engine import GameEngine, Action
+from matrix import Matrix, clear_rows, clone_matrix, column_tops, empty_row_mask, full_row_mask, snapshot_matrix
+from piece_generator import create_generator, GENERATORS
+
+ACTIONS = [Action.TICK] * 4 + [Action.LEFT, Action.RIGHT, Action.LEFT, Action.RIGHT, Action.ROTATE, Action.DROP]
+
+MatrixTrace = Tuple[List[int], List[bytes], int, Optional[Tuple[int, int, int, int]], Optional[int], List[int]]
+
+
+def state(matrix: Matrix) -> MatrixTrace:
+    """Everything a game can see of the matrix, including the pieces still to come."""
+    brick = matrix.brick
+    next_brick = matrix.next_brick
+    return (list(matrix.rows), [bytes(row) for row in matrix.colors], matrix.landing_y(),
+            (brick.shape_num, brick.rotation, brick.x, brick.y) if brick is not None else None,
+            next_brick.shape_num if next_brick is not None else None,
+            list(matrix.generator.clone().generate(20)))
+
+
+def play(engine: GameEngine, actions: List[Action]) -> List[MatrixTrace]:
+    """Steps the engine through the actions, returning the matrix state after each one."""
+    trace = []
+    for action in actions:
+        engine.step(action)
+        trace.append(state(engine.matrix))
+        if engine.game_over:
+            break
+    return trace
+
+
+def started_game(mode: str, seed: int, kicks: str = "legacy") -> Tuple[GameEngine, List[Action]]:
+    """Returns a game part way through, with the actions to carry on with."""
+    rng = Random(seed)
+    actions = [rng.choice(ACTIONS) for _ in range(600)]
+    engine = GameEngine(Matrix(create_generator(mode, seed), kicks))
+    engine.new_game(seed=seed)
+    play(engine, actions[:100])
+    return engine, actions[100:]
+
+
+@pytest.mark.parametrize("mode", sorted(GENERATORS))
+def test_clone_matches_and_is_independent(mode: str) -> None:
+    """A clone starts in the same state, plays out the same way and does not share state with the original."""
+    for seed in range(20):
+        engine, actions = started_game(mode, seed, "srs")
+        clone = clone_matrix(engine.matrix)
+        assert clone.kicks == "srs"
+        assert state(clone) == state(engine.matrix)
+        before = state(engine.matrix)
+        clone_trace = play(GameEngine(clone), actions)
+        assert state(engine.matrix) == before
+        assert play(GameEngine(engine.matrix), actions) == clone_trace
+
+
+@pytest.mark.parametrize("mode", sorted(GENERATORS))
+def test_restore_replays_the_same(mode: str) -> None:
+    """After a restore the same actions give the same states, piece sequence included.  Fresh engines are used
+    each time, so only the matrix's own state carries over."""
+    for seed in range(20):
+        engine, actions = started_game(mode, seed)
+        snapshot = snapshot_matrix(engine.matrix)
+        before = state(engine.matrix)
+        trace = play(GameEngine(engine.matrix), actions)
+        engine.matrix.restore(snapshot)
+        assert state(engine.matrix) == before
+        assert play(GameEngine(engine.matrix), actions) == trace
+
+
+def test_restore_keeps_views() -> None:
+    """Restoring overwrites the matrix in place, so views taken earlier still see the live state."""
+    engine, actions = started_game("bag", 7)
+    matrix = engine.matrix
+    rows, colors, view = matrix.rows, matrix.colors, matrix.matrix
+    snapshot = snapshot_matrix(matrix)
+    version = matrix.version
+    play(engine, actions)
+    matrix.restore(snapshot)
+    assert matrix.version > version
+    assert rows is matrix.rows and colors is matrix.colors and view is matrix.matrix
+    assert tuple(rows) == snapshot.rows
+    assert b"".join(colors) == snapshot.colors
+    assert [[view[x][y] for x in range(matrix.width)] for y in range(matrix.height)] == \
+        [[(row >> x) & 1 for x in range(matrix.width)] for row in snapshot.rows]
+
+
+def test_clear_rows_matches_matrix() -> None:
+    """clear_rows(), which the bot plans with, leaves the rows the game does after erasing and compacting,
+    and column_tops() finds the top of each column."""
+    rng = Random(5)
+    matrix = Matrix()
+    matrix.new_game(5)
+    full_row = full_row_mask(matrix.width)
+    empty_row = empty_row_mask(matrix.width)
+    for _ in range(300):
+        rows = [full_row]
+        for y in range(1, matrix.height - 1):
+            kind = rng.random()
+            if (y < 6) or (kind < 0.2):
+                rows.append(empty_row)
+            elif kind < 0.45:
+                rows.append(full_row)
+            else:
+                rows.append(empty_row | (rng.getrandbits(matrix.width) & full_row))
+        rows.append(full_row)
+        matrix.restore(snapshot_matrix(matrix)._replace(rows=tuple(rows), brick=None))
+        expected, lines = clear_rows(rows, matrix.width)
+        solid = matrix.identify_solid_rows()
+        assert len(solid) == lines
+        matrix.erase_spaces(solid)
+        matrix.compact_rows()
+        assert tuple(matrix.rows) == expected
+        assert column_tops(rows, matrix.width)[1:-1] == \
+            [min([y for y in range(1, matrix.height - 1) if (rows[y] >> x) & 1] + [matrix.height - 1]) for x in range(1, matrix.width - 1)]
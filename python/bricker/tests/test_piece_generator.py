@@ -0,0 +1,93 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from collections import Counter
+import pytest
+from piece_generator import GENERATORS, create_generator
+
+
+@pytest.mark.parametrize("mode", list(GENERATORS))
+def test_same_seed_same_sequence(mode: str) -> None:
+    """Two generators with one seed deal the same shapes, whether drawn one at a time or in bulk."""
+    single = create_generator(mode, 1234)
+    bulk = create_generator(mode, 1234)
+    shapes = [single.next_shape() for _ in range(1000)]
+    assert list(bulk.generate(300)) + list(bulk.generate(700)) == shapes
+    assert set(shapes) == set(range(1, 8))
+    assert shapes != list(create_generator(mode, 1235).generate(1000))
+
+
+@pytest.mark.parametrize("mode", list(GENERATORS))
+def test_reset_restarts_sequence(mode: str) -> None:
+    """Resetting replays the sequence from the start, with the same seed or a new one."""
+    generator = create_generator(mode, 7)
+    first = [generator.next_shape() for _ in range(600)]
+    generator.reset()
+    assert [generator.next_shape() for _ in range(600)] == first
+    generator.reset(8)
+    assert [generator.next_shape() for _ in range(600)] == list(create_generator(mode, 8).generate(600))
+    assert generator.drawn == 600
+
+
+@pytest.mark.parametrize("mode", list(GENERATORS))
+def test_seek(mode: str) -> None:
+    """Seeking forwards, backwards or to another seed lands on the shape drawn at that point."""
+    shapes = list(create_generator(mode, 99).generate(2000))
+    generator = create_generator(mode, 5)
+    for drawn in (0, 1, 255, 256, 1500, 700, 3, 1999):
+        generator.seek(99, drawn)
+        assert generator.drawn == drawn
+        assert generator.next_shape() == shapes[drawn]
+
+
+@pytest.mark.parametrize("mode", list(GENERATORS))
+def test_snapshot_restore_and_clone(mode: str) -> None:
+    """A restored snapshot, or a clone, continues the sequence exactly where it was taken."""
+    generator = create_generator(mode, 42)
+    generator.generate(300)
+    state = generator.snapshot()
+    clone = generator.clone()
+    ahead = [generator.next_shape() for _ in range(1000)]
+    assert [clone.next_shape() for _ in range(1000)] == ahead
+    generator.restore(state)
+    assert generator.drawn == 300
+    assert [generator.next_shape() for _ in range(1000)] == ahead
+    with pytest.raises(ValueError):
+        create_generator("bag" if mode != "bag" else "uniform", 42).restore(state)
+
+
+@pytest.mark.parametrize("mode", list(GENERATORS))
+def test_snapshots_anywhere_in_a_block(mode: str) -> None:
+    """Snapshots taken before the first draw, at block edges and after seeking restore to the same place, and
+    snapshots within one block share its random state rather than copying it."""
+    shapes = create_generator(mode, 9).generate(2000)
+    generator = create_generator(mode, 9)
+    states = [generator.snapshot()]
+    for drawn in (1, 2, 255, 256, 257, 600, 1500):
+        generator.seek(9, drawn)
+        states.append(generator.snapshot())
+        generator.generate(7)
+        states.append(generator.snapshot())
+    for state in states:
+        restored = create_generator(mode, 1)
+        restored.restore(state)
+        assert restored.drawn == state.drawn
+        assert list(restored.generate(300)) == list(shapes[state.drawn:state.drawn + 300])
+    generator.seek(9, 1000)
+    first = generator.snapshot()
+    generator.next_shape()
+    assert generator.snapshot().random is first.random
+
+
+def test_bag_deals_every_shape_per_bag() -> None:
+    """Each run of seven shapes from the start of a bag sequence holds all seven."""
+    shapes = list(create_generator("bag", 3).generate(7 * 100))
+    for start in range(0, len(shapes), 7):
+        assert Counter(shapes[start:start + 7]) == Counter(range(1, 8))
+
+
+def test_unknown_mode() -> None:
+    """Unknown generator modes are refused."""
+    with pytest.raises(ValueError):
+        create_generator("shuffle", 1)
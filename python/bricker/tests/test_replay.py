@@ -0,0 +1,57 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from random import Random
+import struct
+import pytest
+from game_engine import GameEngine, Action
+from matrix import Matrix
+from piece_generator import create_generator
+from replay import Replay
+from replay_player import ReplayPlayer
+
+
+def record_game(mode: str, seed: int, kicks: str, max_ticks: int = 3000) -> GameEngine:
+    """Plays a recorded game of random actions, debug level changes included."""
+    engine = GameEngine(Matrix(create_generator(mode, seed), kicks))
+    engine.new_game(seed=seed, record=True)
+    rng = Random(seed)
+    choices = [Action.TICK] * 8 + [Action.LEFT, Action.RIGHT, Action.DOWN, Action.ROTATE, Action.ROTATE, Action.DROP, Action.LEVEL_UP, Action.LEVEL_DOWN]
+    while (not engine.game_over) and (engine.ticks < max_ticks):
+        engine.step(rng.choice(choices))
+    return engine
+
+
+@pytest.mark.parametrize("mode,kicks", [("uniform", "legacy"), ("bag", "srs"), ("history", "srs")])
+def test_round_trip(mode: str, kicks: str, tmp_path) -> None:
+    """A saved and loaded replay plays back to the same board, score, level and tick count."""
+    for seed in range(10):
+        engine = record_game(mode, seed, kicks)
+        assert engine.replay is not None
+        path = str(tmp_path / f"{seed}.brkr")
+        engine.replay.save(path)
+        replay = Replay.load(path)
+        assert (replay.mode, replay.seed, replay.kicks, replay.end_tick) == (mode, seed, kicks, engine.ticks)
+        assert list(replay.actions) == list(engine.replay.actions)
+        played = ReplayPlayer(replay).play()
+        assert played.matrix.rows == engine.matrix.rows
+        assert (played.stats.current_score, played.stats.lines, played.stats.level) == (engine.stats.current_score, engine.stats.lines, engine.stats.level)
+        assert (played.ticks, played.game_over) == (engine.ticks, engine.game_over)
+
+
+def test_version_1_loads_with_legacy_kicks() -> None:
+    """Replays from before the kick table was stored load, with the original game's kicks."""
+    data = struct.pack("<4sB8sQII", b"BRKR", 1, b"bag", 77, 120, 2) + struct.pack("<II", 5, 9) + bytes([Action.LEFT, Action.DROP])
+    replay = Replay.from_bytes(data)
+    assert (replay.mode, replay.seed, replay.kicks, replay.end_tick) == ("bag", 77, "legacy", 120)
+    assert list(replay.ticks) == [5, 9]
+    assert list(replay.actions) == [Action.LEFT, Action.DROP]
+
+
+def test_bad_data_refused() -> None:
+    """Unknown formats and truncated files raise ValueError."""
+    data = record_game("uniform", 3, "legacy").replay.to_bytes()  # type: ignore
+    for bad in (b"", b"BRKR", b"NOPE" + data[4:], data[:4] + b"\x09" + data[5:], data[:-1]):
+        with pytest.raises(ValueError):
+            Replay.from_bytes(bad)
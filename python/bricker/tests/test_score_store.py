@@ -0,0 +1,89 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Tuple
+import os
+import pytest
+import score_store
+from score_store import ScoreStore, SqliteScoreStore, TextScoreStore
+
+SCORES = [("AAA", 50), ("BBB", 100), ("CCC", 50), ("DDD", 75), ("EEE", 100), ("FFF", 10)]
+
+sqlite = pytest.mark.skipif(score_store.sqlite3 is None, reason="needs sqlite3")
+
+
+def board(store: ScoreStore) -> List[Tuple[str, int]]:
+    """Returns the store's top scores as (initials, score) pairs."""
+    return [(x.initials, x.score) for x in store.top(20)]
+
+
+@sqlite
+def test_legacy_import(tmp_path) -> None:
+    """A legacy scores file is imported into a new database once, then renamed out of the way."""
+    legacy = tmp_path / "high_scores.txt"
+    legacy.write_text("AAA\t50\nbroken line\nBBB\t100\nCCC\tnope\nDDD\t75\n", encoding="utf-8")
+    path = str(tmp_path / "high_scores.db")
+    store = SqliteScoreStore(path, str(legacy))
+    assert board(store) == [("BBB", 100), ("DDD", 75), ("AAA", 50)]
+    store.close()
+    assert not legacy.exists()
+    assert (tmp_path / "high_scores.txt.imported").exists()
+
+    legacy.write_text("ZZZ\t999\n", encoding="utf-8")
+    store = SqliteScoreStore(path, str(legacy))
+    assert store.count() == 3
+    assert store.best("ZZZ") is None
+    store.close()
+
+
+@pytest.mark.parametrize("kind", [pytest.param("sqlite", marks=sqlite), "text"])
+def test_ties_keep_order_added(kind: str, tmp_path) -> None:
+    """Equal scores keep the order they were added, and a new score ranks below the scores it ties with."""
+    if kind == "sqlite":
+        store: ScoreStore = SqliteScoreStore(str(tmp_path / "scores.db"))
+    else:
+        store = TextScoreStore(str(tmp_path / "scores.txt"))
+    for initials, score in SCORES:
+        assert store.rank(score) == len([x for x in SCORES[:store.count()] if x[1] >= score]) + 1
+        store.add(initials, score)
+    assert board(store) == [("BBB", 100), ("EEE", 100), ("DDD", 75), ("AAA", 50), ("CCC", 50), ("FFF", 10)]
+    assert [store.rank(score) for score in (101, 100, 75, 60, 50, 10, 0)] == [1, 3, 4, 4, 6, 7, 7]
+    assert (store.best("CCC").score, store.best("XXX")) == (50, None)     # type: ignore
+    store.close()
+
+
+@sqlite
+def test_stores_agree(tmp_path) -> None:
+    """The text file store, as reloaded from its file, orders scores the same as the database."""
+    database = SqliteScoreStore(str(tmp_path / "scores.db"))
+    text = TextScoreStore(str(tmp_path / "scores.txt"))
+    for initials, score in SCORES * 3:
+        database.add(initials, score)
+        text.add(initials, score)
+    reloaded = TextScoreStore(str(tmp_path / "scores.txt"))
+    assert board(database) == board(text) == board(reloaded)
+    assert [database.rank(score) for score in range(0, 120, 5)] == [text.rank(score) for score in range(0, 120, 5)]
+    database.close()
+
+
+def test_text_add_rolls_back(tmp_path, monkeypatch) -> None:
+    """A failed write leaves the file, the scores in memory and the directory as they were."""
+    path = tmp_path / "scores.txt"
+    store = TextScoreStore(str(path))
+    store.add("AAA", 50)
+    store.add("BBB", 20)
+    before = path.read_bytes()
+
+    def failing_replace(source: str, target: str) -> None:
+        raise OSError("disk full")
+    monkeypatch.setattr(os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        store.add("CCC", 30)
+    monkeypatch.undo()
+
+    assert path.read_bytes() == before
+    assert board(store) == [("AAA", 50), ("BBB", 20)]
+    assert sorted(os.listdir(tmp_path)) == ["scores.txt"]
+    store.add("DDD", 40)
+    assert board(TextScoreStore(str(path))) == [("AAA", 50), ("DDD", 40), ("BBB", 20)]
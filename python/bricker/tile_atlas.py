@@ -0,0 +1,63 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Dict, List
+from pygame import Surface, Rect
+from color import Colors, Color
+
+
+class TileAtlas:
+    """Pre-rendered matrix space tiles, one per brick color, packed into a single surface.
+    Lets a whole matrix or brick be drawn with one batched Surface.blits() call."""
+
+    def __init__(self, colors: List[Color]) -> None:
+        """Class constructor.  Renders a plain 32x32 tile, an outlined exploding-space tile, a small spark tile and
+        a hollow ghost-piece tile per color."""
+        self.__tile_size: int = 32
+        self.__bordered_size: int = 35     # 34x34 space plus the 1px black outline drawn around it
+        self.__spark_size: int = 6
+        self.__ghost_y: int = self.__tile_size + self.__bordered_size + self.__spark_size
+        self.__surface: Surface = Surface((len(colors) * self.__bordered_size, self.__ghost_y + self.__tile_size))
+        self.__surface = self.__surface.convert(self.__surface)
+        self.__surface.fill(Colors.Black.value)
+        self.__tiles: Dict[Color, Rect] = {}
+        self.__bordered_tiles: Dict[Color, Rect] = {}
+        self.__spark_tiles: Dict[Color, Rect] = {}
+        self.__ghost_tiles: Dict[Color, Rect] = {}
+        for i, color in enumerate(colors):
+            x = i * self.__bordered_size
+            tile = Rect(x, 0, self.__tile_size, self.__tile_size)
+            self.__surface.fill(color.value, tile)
+            self.__tiles[color] = tile
+            bordered = Rect(x, self.__tile_size, self.__bordered_size, self.__bordered_size)
+            self.__surface.fill(color.value, bordered.inflate(-2, -2))
+            self.__bordered_tiles[color] = bordered
+            spark = Rect(x, self.__tile_size + self.__bordered_size, self.__spark_size, self.__spark_size)
+            self.__surface.fill(color.value, spark)
+            self.__spark_tiles[color] = spark
+            ghost = Rect(x, self.__ghost_y, self.__tile_size, self.__tile_size)
+            self.__surface.fill(color.value, ghost)
+            self.__surface.fill(Colors.Black.value, ghost.inflate(-4, -4))
+            self.__ghost_tiles[color] = ghost
+
+    @property
+    def surface(self) -> Surface:
+        """Returns the atlas surface, source of all tiles."""
+        return self.__surface
+
+    def tile(self, color: Color) -> Rect:
+        """Returns atlas area of the 32x32 tile for a color."""
+        return self.__tiles[color]
+
+    def bordered_tile(self, color: Color) -> Rect:
+        """Returns atlas area of the outlined exploding-space tile for a color."""
+        return self.__bordered_tiles[color]
+
+    def spark_tile(self, color: Color) -> Rect:
+        """Returns atlas area of the small particle tile for a color."""
+        return self.__spark_tiles[color]
+
+    def ghost_tile(self, color: Color) -> Rect:
+        """Returns atlas area of the hollow 32x32 ghost-piece tile for a color, outlined 2px."""
+        return self.__ghost_tiles[color]